@@ -0,0 +1,441 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+期货持仓分析系统 - akshare录制/回放模块
+- record: 正常请求akshare，同时把每次调用的响应（或异常）和耗时录制到磁盘
+- replay: 不访问网络，按调用参数回放录制的响应，并按配置注入延迟、网络错误、限流和挂起
+替换的是akshare模块上的接口函数，所有以 ak.xxx 方式调用的代码无需修改即可离线运行。
+
+用法：
+    FUTURES_AKSHARE_BACKEND=record streamlit run streamlit_app.py   # 使用时顺便录制
+    python akshare_backend.py record --date 20250110                 # 录制一个交易日
+    python akshare_backend.py bench --date 20250110 --workers 16 --failure-rate 0.05
+作者：7haoge
+邮箱：953534947@qq.com
+"""
+
+import argparse
+import contextlib
+import functools
+import hashlib
+import importlib
+import inspect
+import json
+import os
+import pickle
+import random
+import shutil
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import akshare as ak
+
+from config import AKSHARE_BACKEND_CONFIG
+
+LIVE = "live"
+RECORD = "record"
+REPLAY = "replay"
+
+
+class RecordingNotFoundError(LookupError):
+    """回放时没有对应调用参数的录制"""
+
+
+class AkshareBackend:
+    """
+    akshare接口的录制/回放后端
+    录制文件：<录制目录>/<接口名>/<参数摘要>.pkl，内容为参数、响应或异常、原始耗时。
+    """
+
+    def __init__(self, mode: str, recordings_dir: str = None, replay_config: Dict[str, Any] = None):
+        """
+        初始化后端
+
+        :param mode: record/replay
+        :param recordings_dir: 录制目录（默认读取AKSHARE_BACKEND_CONFIG）
+        :param replay_config: 回放注入参数（默认读取AKSHARE_BACKEND_CONFIG）
+        """
+        self.mode = mode
+        self.root = Path(recordings_dir or AKSHARE_BACKEND_CONFIG["recordings_dir"])
+        self.replay_config = dict(AKSHARE_BACKEND_CONFIG["replay"], **(replay_config or {}))
+        self.random = random.Random(self.replay_config.get("seed"))
+        self.counters = defaultdict(lambda: defaultdict(int))
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _call_key(func: Callable, args: tuple, kwargs: dict) -> str:
+        """按绑定后的参数计算调用摘要（位置参数和关键字参数等价）"""
+        try:
+            bound = inspect.signature(func).bind(*args, **kwargs)
+            bound.apply_defaults()
+            arguments = dict(bound.arguments)
+        except (TypeError, ValueError):
+            arguments = {"args": args, "kwargs": kwargs}
+        text = json.dumps(arguments, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.md5(text.encode("utf-8")).hexdigest()
+
+    def _path(self, func_name: str, key: str) -> Path:
+        """录制文件路径"""
+        return self.root / func_name / f"{key}.pkl"
+
+    def _count(self, func_name: str, event: str):
+        """计数"""
+        with self._lock:
+            self.counters[func_name][event] += 1
+
+    def _save(self, path: Path, entry: Dict[str, Any]):
+        """原子写入录制文件"""
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            print(f"  ⚠️ 录制保存失败: {str(e)[:50]}")
+
+    def record(self, func: Callable, func_name: str, *args, **kwargs) -> Any:
+        """调用真实接口并录制响应（异常同样录制后原样抛出）"""
+        path = self._path(func_name, self._call_key(func, args, kwargs))
+        entry = {"func": func_name, "args": args, "kwargs": kwargs}
+        start_time = time.monotonic()
+        try:
+            result = func(*args, **kwargs)
+            entry["result"] = result
+            return result
+        except Exception as e:
+            entry["error"] = e
+            raise
+        finally:
+            entry["latency"] = time.monotonic() - start_time
+            self._save(path, entry)
+            self._count(func_name, "recorded")
+
+    def _latency(self, func_name: str, recorded: float) -> float:
+        """注入的延迟：配置范围内的随机值，配置为"recorded"时使用录制时的耗时"""
+        latency = self.replay_config.get("latency_overrides", {}).get(func_name,
+                                                                      self.replay_config["latency"])
+        if latency == "recorded":
+            return recorded
+        low, high = latency
+        with self._lock:
+            return self.random.uniform(low, high)
+
+    def _roll(self, name: str) -> bool:
+        """按配置概率判断是否注入该故障"""
+        rate = self.replay_config.get(name, 0.0)
+        if not rate:
+            return False
+        with self._lock:
+            return self.random.random() < rate
+
+    def replay(self, func: Callable, func_name: str, *args, **kwargs) -> Any:
+        """回放录制的响应，并注入延迟和故障"""
+        self._count(func_name, "calls")
+
+        if self._roll("hang_rate"):
+            self._count(func_name, "hangs")
+            time.sleep(self.replay_config["hang_seconds"])
+            raise TimeoutError(f"{func_name} 注入的挂起")
+
+        path = self._path(func_name, self._call_key(func, args, kwargs))
+        try:
+            with open(path, 'rb') as f:
+                entry = pickle.load(f)
+        except FileNotFoundError:
+            self._count(func_name, "missing")
+            raise RecordingNotFoundError(f"{func_name} 没有该参数的录制: args={args} kwargs={kwargs}")
+
+        time.sleep(self._latency(func_name, entry.get("latency", 0.0)))
+
+        if self._roll("rate_limit_rate"):
+            self._count(func_name, "rate_limited")
+            raise RuntimeError(f"{func_name} 注入的限流: 429 Too Many Requests")
+        if self._roll("failure_rate"):
+            self._count(func_name, "failures")
+            raise ConnectionError(f"{func_name} 注入的网络错误")
+
+        self._count(func_name, "replayed")
+        if "error" in entry:
+            raise entry["error"]
+        return entry["result"]
+
+    def wrap(self, func: Callable, func_name: str) -> Callable:
+        """包装接口函数（保留函数名，限速器按函数名区分上游）"""
+        handler = self.record if self.mode == RECORD else self.replay
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            return handler(func, func_name, *args, **kwargs)
+
+        wrapper.__wrapped_backend__ = self
+        return wrapper
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """各接口的调用统计"""
+        with self._lock:
+            return {name: dict(events) for name, events in self.counters.items()}
+
+
+_backend: Optional[AkshareBackend] = None
+_originals: Dict[str, Callable] = {}
+_install_lock = threading.Lock()
+
+
+def get_backend_mode() -> str:
+    """配置的后端模式（环境变量优先）"""
+    return os.environ.get(AKSHARE_BACKEND_CONFIG["mode_env"]) or AKSHARE_BACKEND_CONFIG["mode"]
+
+
+def install_backend(mode: str = None, recordings_dir: str = None,
+                    replay_config: Dict[str, Any] = None) -> Optional[AkshareBackend]:
+    """
+    替换akshare模块上的接口函数（live模式下恢复原始函数）
+
+    :param mode: live/record/replay（默认读取配置/环境变量）
+    :param recordings_dir: 录制目录
+    :param replay_config: 回放注入参数覆盖
+    :return: 当前后端，live模式返回None
+    """
+    global _backend
+    mode = mode or get_backend_mode()
+    if mode not in (LIVE, RECORD, REPLAY):
+        raise ValueError(f"未知的akshare后端模式: {mode}")
+
+    with _install_lock:
+        for func_name, func in _originals.items():
+            setattr(ak, func_name, func)
+        _originals.clear()
+        _backend = None
+        if mode == LIVE:
+            return None
+
+        _backend = AkshareBackend(mode, recordings_dir, replay_config)
+        for func_name in AKSHARE_BACKEND_CONFIG["functions"]:
+            func = getattr(ak, func_name, None)
+            if func is None:
+                continue
+            _originals[func_name] = func
+            setattr(ak, func_name, _backend.wrap(func, func_name))
+        print(f"akshare后端: {mode}（录制目录: {_backend.root}）")
+        return _backend
+
+
+def get_backend() -> Optional[AkshareBackend]:
+    """当前后端（live模式为None）"""
+    return _backend
+
+
+# 获取流程中按配置目录创建的进程级单例（模块, 全局变量, 重置值工厂）
+_RUN_SINGLETONS = [
+    ("position_store", "_position_lake", lambda: None),
+    ("position_db", "_position_database", lambda: None),
+    ("seat_history", "_seat_history", lambda: None),
+    ("dominant_contract_index", "_contract_index", lambda: None),
+    ("response_cache", "_position_cache", lambda: None),
+    ("response_cache", "_basis_cache", lambda: None),
+    ("response_cache", "_daily_cache", lambda: None),
+    ("circuit_breaker", "_registry", lambda: None),
+    ("fetch_manifest", "_manifests", dict),
+]
+
+
+@contextlib.contextmanager
+def _isolated_run(work_dir: str, fetch_overrides: Dict[str, Any] = None):
+    """
+    在临时目录中隔离运行获取流程
+
+    缓存、数据湖、席位历史和SQLite库都指向work_dir，进程级单例在运行期间重新创建；
+    退出时恢复所有被修改的配置项和单例，不影响真实数据目录和同进程的后续调用。
+
+    :param work_dir: 临时工作目录
+    :param fetch_overrides: 运行期间覆盖的FETCH_CONFIG项
+    """
+    from config import CACHE_CONFIG, FETCH_CONFIG, STORAGE_CONFIG
+
+    overrides = [
+        (CACHE_CONFIG, {"cache_dir": os.path.join(work_dir, "cache")}),
+        (STORAGE_CONFIG, {
+            "lake_dir": os.path.join(work_dir, "lake"),
+            "seat_history_dir": os.path.join(work_dir, "seat_history"),
+            "database_path": os.path.join(work_dir, "positions.db"),
+        }),
+        (FETCH_CONFIG, fetch_overrides or {}),
+    ]
+    saved_config = [(config, {key: config[key] for key in values}) for config, values in overrides]
+    saved_singletons = []
+    for module_name, attr, reset in _RUN_SINGLETONS:
+        module = importlib.import_module(module_name)
+        saved_singletons.append((module, attr, getattr(module, attr)))
+        setattr(module, attr, reset())
+    for config, values in overrides:
+        config.update(values)
+    try:
+        yield
+    finally:
+        for config, values in saved_config:
+            config.update(values)
+        for module, attr, value in saved_singletons:
+            setattr(module, attr, value)
+
+
+def _restore_backend(previous: Optional[AkshareBackend]):
+    """恢复录制/压测之前安装的后端"""
+    if previous is None:
+        install_backend(LIVE)
+    else:
+        install_backend(previous.mode, str(previous.root), previous.replay_config)
+
+
+def _run_pipeline(trade_date: str, data_dir: str) -> Dict[str, float]:
+    """运行一次 基差 -> 持仓 -> 行情 获取流程，返回各阶段耗时"""
+    from dominant_contract_index import get_contract_index
+    from futures_analyzer import FuturesDataManager
+
+    timings = {}
+    manager = FuturesDataManager(data_dir)
+
+    start_time = time.monotonic()
+    timings["contracts"] = float(len(get_contract_index().get_contracts(trade_date)))
+    timings["basis"] = time.monotonic() - start_time
+
+    start_time = time.monotonic()
+    timings["positions_ok"] = float(manager.fetch_position_data(trade_date))
+    timings["positions"] = time.monotonic() - start_time
+
+    start_time = time.monotonic()
+    price_data = manager.fetch_price_data(trade_date)
+    timings["prices_rows"] = float(len(price_data))
+    timings["prices"] = time.monotonic() - start_time
+    return timings
+
+
+def record_trade_date(trade_date: str, recordings_dir: str = None):
+    """
+    录制一个交易日：完整获取流程 + 各交易所持仓排名表（对冲的备用数据源）
+    使用临时工作目录（缓存、数据湖、数据库），确保每个接口都真正发起请求且不写入真实数据。
+    """
+    from config import HEDGE_CONFIG
+
+    previous = get_backend()
+    backend = install_backend(RECORD, recordings_dir)
+    work_dir = tempfile.mkdtemp(prefix="akshare_record_")
+    try:
+        with _isolated_run(work_dir):
+            _run_pipeline(trade_date, os.path.join(work_dir, "data"))
+            for exchange_name, func_name in HEDGE_CONFIG["alternate_sources"].items():
+                try:
+                    getattr(ak, func_name)(date=trade_date)
+                except Exception as e:
+                    print(f"  ⚠️ {exchange_name} 持仓排名表录制失败: {str(e)[:50]}")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+        _restore_backend(previous)
+    print(f"录制完成: {backend.stats()}")
+
+
+def benchmark(trade_date: str, runs: int = 1, workers: int = None, recordings_dir: str = None,
+              replay_config: Dict[str, Any] = None) -> List[Dict[str, float]]:
+    """
+    离线压测：回放录制的响应运行获取流程
+
+    每次压测使用独立的临时工作目录（缓存、数据湖、数据库）；runs>1时后续轮次复用同一缓存，
+    可比较冷/热缓存耗时。结束后恢复所有被覆盖的配置、单例和之前的后端。
+
+    :param trade_date: 交易日期 YYYYMMDD
+    :param runs: 运行轮数
+    :param workers: 持仓并发请求数（覆盖FETCH_CONFIG）
+    :return: 每轮的各阶段耗时
+    """
+    from rate_limiter import get_all_limiter_stats
+
+    previous = get_backend()
+    backend = install_backend(REPLAY, recordings_dir, replay_config)
+    work_dir = tempfile.mkdtemp(prefix="akshare_bench_")
+
+    results = []
+    try:
+        with _isolated_run(work_dir, {"max_workers": workers} if workers else None):
+            for run in range(1, runs + 1):
+                timings = _run_pipeline(trade_date, os.path.join(work_dir, "data"))
+                results.append(timings)
+                print(f"第{run}轮: 基差 {timings['basis']:.1f}秒, 持仓 {timings['positions']:.1f}秒, "
+                      f"行情 {timings['prices']:.1f}秒")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+        _restore_backend(previous)
+
+    print("\n接口统计:")
+    for func_name, events in sorted(backend.stats().items()):
+        print(f"  {func_name}: {events}")
+    print("\n限速器统计:")
+    for host, stats in get_all_limiter_stats().items():
+        print(f"  {host}: {stats}")
+    return results
+
+
+def main():
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description="akshare录制/回放与离线压测")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    record_parser = subparsers.add_parser("record", help="录制一个交易日的接口响应")
+    record_parser.add_argument("--date", required=True, help="交易日期 YYYYMMDD")
+    record_parser.add_argument("--dir", help="录制目录")
+
+    bench_parser = subparsers.add_parser("bench", help="回放录制的响应进行压测")
+    bench_parser.add_argument("--date", required=True, help="交易日期 YYYYMMDD")
+    bench_parser.add_argument("--dir", help="录制目录")
+    bench_parser.add_argument("--runs", type=int, default=1, help="运行轮数（第2轮起为热缓存）")
+    bench_parser.add_argument("--workers", type=int, help="持仓并发请求数")
+    bench_parser.add_argument("--latency", nargs=2, type=float, metavar=("MIN", "MAX"), help="注入延迟范围（秒）")
+    bench_parser.add_argument("--recorded-latency", action="store_true", help="使用录制时的真实耗时")
+    bench_parser.add_argument("--failure-rate", type=float, help="注入网络错误的概率")
+    bench_parser.add_argument("--rate-limit-rate", type=float, help="注入限流错误的概率")
+    bench_parser.add_argument("--hang-rate", type=float, help="注入挂起的概率")
+    bench_parser.add_argument("--hang-seconds", type=float, help="挂起时长（秒）")
+    bench_parser.add_argument("--seed", type=int, help="随机种子")
+    args = parser.parse_args()
+
+    if args.command == "record":
+        record_trade_date(args.date, args.dir)
+        return
+
+    replay_config = {
+        name: value for name, value in {
+            "failure_rate": args.failure_rate,
+            "rate_limit_rate": args.rate_limit_rate,
+            "hang_rate": args.hang_rate,
+            "hang_seconds": args.hang_seconds,
+            "seed": args.seed,
+        }.items() if value is not None
+    }
+    if args.recorded_latency:
+        replay_config["latency"] = "recorded"
+        replay_config["latency_overrides"] = {}
+    elif args.latency:
+        replay_config["latency"] = tuple(args.latency)
+        replay_config["latency_overrides"] = {}
+    benchmark(args.date, args.runs, args.workers, args.dir, replay_config)
+
+
+__all__ = [
+    'AkshareBackend',
+    'RecordingNotFoundError',
+    'get_backend',
+    'get_backend_mode',
+    'install_backend',
+    'record_trade_date',
+    'benchmark',
+    'LIVE',
+    'RECORD',
+    'REPLAY'
+]
+
+
+if __name__ == "__main__":
+    main()
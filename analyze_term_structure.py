@@ -4,6 +4,8 @@ import os
 import numpy as np
 from datetime import datetime
 
+from response_cache import fetch_futures_daily
+
 def get_futures_data(start_date, end_date):
     """
     获取期货行情数据
@@ -33,8 +35,8 @@ def get_futures_data(start_date, end_date):
         
         print(f"\n正在获取{name}数据...")
         try:
-            # 获取数据
-            df = ak.get_futures_daily(start_date=start_date, end_date=end_date, market=market)
+            # 获取数据（区间模式一次请求，按交易日缓存）
+            df = fetch_futures_daily(market, start_date, end_date)
             
             # 保存到 Excel 文件
             save_path = os.path.join(save_dir, f"{name}_{start_date}_{end_date}.xlsx")
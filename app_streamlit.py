@@ -9,6 +9,8 @@ from plotly.subplots import make_subplots
 import plotly.express as px
 import io
 import akshare as ak  # 新增导入
+from response_cache import fetch_futures_daily
+from strategy_kernels import RETAIL_COLUMNS, require_result, retail_seat_stats
 
 # 设置页面配置
 st.set_page_config(
@@ -75,7 +77,7 @@ def get_futures_price_data(date_str):
         all_data = []
         for exchange in exchanges:
             try:
-                df = ak.get_futures_daily(start_date=date_str, end_date=date_str, market=exchange["market"])
+                df = fetch_futures_daily(exchange["market"], date_str, date_str)
                 if not df.empty:
                     df['exchange'] = exchange["name"]
                     all_data.append(df)
@@ -141,32 +143,26 @@ def analyze_term_structure_with_prices(df):
         return []
 
 # 家人席位反向操作策略分析函数
-def analyze_retail_reverse_strategy(df):
-    """分析家人席位反向操作策略"""
-    retail_seats = ["东方财富", "平安期货", "徽商期货"]
-    
+RETAIL_SEATS = ["东方财富", "平安期货", "徽商期货"]
+
+def analyze_retail_reverse_strategy(df, stats=None):
+    """分析家人席位反向操作策略（stats为retail_seat_stats批量统计的结果，不传时单独统计）"""
     try:
         # 统计家人席位的多空变化（合并同一席位）
-        seat_stats = {name: {'long_chg': 0, 'short_chg': 0, 'long_pos': 0, 'short_pos': 0} for name in retail_seats}
-        
-        for _, row in df.iterrows():
-            if row['long_party_name'] in retail_seats:
-                seat_stats[row['long_party_name']]['long_chg'] += row['long_open_interest_chg'] if pd.notna(row['long_open_interest_chg']) else 0
-                seat_stats[row['long_party_name']]['long_pos'] += row['long_open_interest'] if pd.notna(row['long_open_interest']) else 0
-            if row['short_party_name'] in retail_seats:
-                seat_stats[row['short_party_name']]['short_chg'] += row['short_open_interest_chg'] if pd.notna(row['short_open_interest_chg']) else 0
-                seat_stats[row['short_party_name']]['short_pos'] += row['short_open_interest'] if pd.notna(row['short_open_interest']) else 0
+        if stats is None:
+            stats = retail_seat_stats({'contract': df}, RETAIL_SEATS)['contract']
+        stats = require_result(stats, RETAIL_COLUMNS)
 
         # 只保留有变化的席位
         seat_details = []
-        for seat, stats in seat_stats.items():
-            if stats['long_chg'] != 0 or stats['short_chg'] != 0:
+        for seat, seat_stats in stats['seats'].items():
+            if seat_stats['long_chg'] != 0 or seat_stats['short_chg'] != 0:
                 seat_details.append({
                     'seat_name': seat, 
-                    'long_chg': stats['long_chg'], 
-                    'short_chg': stats['short_chg'],
-                    'long_pos': stats['long_pos'],
-                    'short_pos': stats['short_pos']
+                    'long_chg': seat_stats['long_chg'], 
+                    'short_chg': seat_stats['short_chg'],
+                    'long_pos': seat_stats['long_pos'],
+                    'short_pos': seat_stats['short_pos']
                 })
 
         if not seat_details:
@@ -179,8 +175,8 @@ def analyze_retail_reverse_strategy(df):
         total_short_pos = sum([seat['short_pos'] for seat in seat_details])
         
         # 计算总持仓
-        df_total_long = df['long_open_interest'].sum()
-        df_total_short = df['short_open_interest'].sum()
+        df_total_long = stats['total_long']
+        df_total_short = stats['total_short']
 
         if total_long_chg > 0 and total_short_chg <= 0:
             # 家人席位多单增加，看空
@@ -462,27 +458,32 @@ def main():
                 retail_long_signals = []
                 retail_short_signals = []
                 
-                for contract, data in results.items():
-                    if 'raw_data' in data:
-                        df = data['raw_data']
-                        signal, reason, strength, seat_details = analyze_retail_reverse_strategy(df)
-                        
-                        if signal == '看多':
-                            retail_long_signals.append({
-                                'contract': contract,
-                                'strength': strength,
-                                'reason': reason,
-                                'seat_details': seat_details,
-                                'raw_df': df
-                            })
-                        elif signal == '看空':
-                            retail_short_signals.append({
-                                'contract': contract,
-                                'strength': strength,
-                                'reason': reason,
-                                'seat_details': seat_details,
-                                'raw_df': df
-                            })
+                # 所有合约一次统计家人席位
+                raw_frames = {contract: data['raw_data'] for contract, data in results.items() if 'raw_data' in data}
+                try:
+                    retail_stats = retail_seat_stats(raw_frames, RETAIL_SEATS)
+                except Exception:
+                    retail_stats = {}
+                
+                for contract, df in raw_frames.items():
+                    signal, reason, strength, seat_details = analyze_retail_reverse_strategy(df, retail_stats.get(contract))
+                    
+                    if signal == '看多':
+                        retail_long_signals.append({
+                            'contract': contract,
+                            'strength': strength,
+                            'reason': reason,
+                            'seat_details': seat_details,
+                            'raw_df': df
+                        })
+                    elif signal == '看空':
+                        retail_short_signals.append({
+                            'contract': contract,
+                            'strength': strength,
+                            'reason': reason,
+                            'seat_details': seat_details,
+                            'raw_df': df
+                        })
                 
                 # 按强度排序（从大到小）
                 retail_long_signals = sorted(retail_long_signals, key=lambda x: float(x.get('strength', 0)), reverse=True)
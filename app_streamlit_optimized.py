@@ -12,6 +12,7 @@ import akshare as ak
 import time
 import threading
 from concurrent.futures import ThreadPoolExecutor, as_completed
+from response_cache import fetch_futures_daily
 
 # 设置页面配置
 st.set_page_config(
@@ -82,7 +83,7 @@ def get_futures_price_data_optimized(date_str):
                 status_text.text(f"正在获取{exchange['name']}数据...")
                 progress_bar.progress((i + 1) / len(exchanges))
                 
-                df = ak.get_futures_daily(start_date=date_str, end_date=date_str, market=exchange["market"])
+                df = fetch_futures_daily(exchange["market"], date_str, date_str)
                 if not df.empty:
                     df['exchange'] = exchange["name"]
                     all_data.append(df)
@@ -0,0 +1,357 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+异步持仓数据获取引擎
+在受管线程池中执行阻塞的akshare调用，提供信号量限流、单次调用期限和取消支持，
+同一个事件循环可同时服务Streamlit应用、Flask接口和批量回补任务。
+IntegratedDataFetcher / SinaPositionFetcher 的同步接口是它的薄封装。
+"""
+
+import asyncio
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+import akshare as ak
+import pandas as pd
+
+from config import FETCH_CONFIG
+from circuit_breaker import CircuitBreakerRegistry, CircuitOpenError, get_circuit_breakers
+from fetch_manifest import FetchManifest, DONE, FAILED
+from rate_limiter import rate_limited_call
+from retry_policy import RetryBudget
+
+# 每个合约需要获取的持仓类型
+POSITION_TYPES = ["成交量", "多单持仓", "空单持仓"]
+
+# 主数据源接口（熔断键：交易所:接口函数名）
+POSITION_SOURCE = "futures_hold_pos_sina"
+
+# 进程级共享线程池（所有事件循环、所有获取器共用）
+_shared_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def get_shared_executor() -> ThreadPoolExecutor:
+    """获取进程级共享线程池"""
+    global _shared_executor
+    with _executor_lock:
+        if _shared_executor is None:
+            _shared_executor = ThreadPoolExecutor(
+                max_workers=FETCH_CONFIG["executor_workers"],
+                thread_name_prefix="akshare-fetch"
+            )
+        return _shared_executor
+
+
+def position_breaker_key(exchange_name: str) -> str:
+    """交易所主数据源的熔断键"""
+    return CircuitBreakerRegistry.make_key(exchange_name, POSITION_SOURCE)
+
+
+def record_position_timeout(exchange_name: str, error: BaseException = None):
+    """交易所获取超过期限：计入主数据源的熔断失败次数（熔断已打开时不重复计入，以免推迟探测）"""
+    breakers = get_circuit_breakers()
+    key = position_breaker_key(exchange_name)
+    if breakers.allow(key):
+        breakers.record_failure(key, error)
+
+
+def run_sync(coro):
+    """
+    在同步代码中运行协程
+    当前线程没有运行中的事件循环时直接asyncio.run，否则在独立线程中运行并等待结果
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+
+    result = {}
+
+    def runner():
+        try:
+            result['value'] = asyncio.run(coro)
+        except BaseException as e:
+            result['error'] = e
+
+    thread = threading.Thread(target=runner, name="async-fetch-runner")
+    thread.start()
+    thread.join()
+
+    if 'error' in result:
+        raise result['error']
+    return result.get('value')
+
+
+class AsyncPositionFetcher:
+    """
+    异步持仓数据获取器
+    - fetcher: 提供 resolve_main_contract / fetch_single_position_data /
+      convert_to_exchange_format 的同步获取器（IntegratedDataFetcher 或 SinaPositionFetcher）
+    - 阻塞调用在共享线程池中执行，并发数由每个事件循环一个的信号量限制
+    - 传入manifest时逐条记录获取状态，续传时已完成的条目直接读取缓存
+    - 一个实例对应一次获取运行，所有请求的重试共享同一个重试预算
+    - 主数据源熔断打开的交易所直接抛出CircuitOpenError，并在后台以单次请求重新探测
+    """
+
+    def __init__(self, fetcher, max_concurrency: int = None, call_timeout: float = None,
+                 executor: ThreadPoolExecutor = None, manifest: FetchManifest = None,
+                 budget: RetryBudget = None):
+        """
+        初始化异步获取器
+
+        Args:
+            fetcher: 同步获取器实例
+            max_concurrency: 最大并发请求数（默认取获取器的max_workers或FETCH_CONFIG）
+            call_timeout: 单次调用期限（秒，默认读取FETCH_CONFIG）
+            executor: 执行阻塞调用的线程池（默认进程级共享线程池）
+            manifest: 获取清单（默认不记录）
+            budget: 本次运行的重试预算（默认新建）
+        """
+        self.fetcher = fetcher
+        self.max_concurrency = max(1, max_concurrency
+                                   or getattr(fetcher, 'max_workers', None)
+                                   or FETCH_CONFIG["max_workers"])
+        self.call_timeout = call_timeout or FETCH_CONFIG["call_timeout"]
+        self.executor = executor or get_shared_executor()
+        self.manifest = manifest
+        self.budget = budget or RetryBudget()
+        self.timed_out_calls: List[Tuple[str, str, str]] = []
+        self._semaphores = weakref.WeakKeyDictionary()
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        """获取当前事件循环对应的信号量"""
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._semaphores[loop] = semaphore
+        return semaphore
+
+    async def run_blocking(self, func: Callable, *args, timeout: float = None, **kwargs) -> Any:
+        """
+        在线程池中执行阻塞调用（受信号量限制并带期限）
+
+        超过期限抛出asyncio.TimeoutError；被取消时等待方立即返回，
+        已开始执行的线程会自然结束，结果被丢弃。
+        """
+        loop = asyncio.get_running_loop()
+        async with self._get_semaphore():
+            future = loop.run_in_executor(self.executor, partial(func, *args, **kwargs))
+            return await asyncio.wait_for(future, timeout or self.call_timeout)
+
+    async def fetch_position(self, contract: str, trade_date: str, symbol: str,
+                             position_type: str, allow_expired: bool = False) -> Optional[pd.DataFrame]:
+        """获取单个合约单一持仓类型的数据，超时返回None"""
+        try:
+            return await self.run_blocking(
+                self.fetcher.fetch_single_position_data,
+                contract, trade_date, symbol, position_type, allow_expired, self.budget
+            )
+        except asyncio.TimeoutError:
+            self.timed_out_calls.append((contract, position_type, trade_date))
+            print(f"    获取{contract} {position_type}超时({self.call_timeout:.0f}秒)")
+            return None
+
+    def probe_exchange(self, exchange_name: str, trade_date: str) -> Optional[pd.DataFrame]:
+        """
+        熔断探测：只请求交易所第一个品种主力合约的成交量排名（不读缓存、不重试、不记录清单）
+        """
+        symbol = self.fetcher.exchange_symbols[exchange_name][0]
+        contract = self.fetcher.resolve_main_contract(symbol, trade_date)
+        if not contract:
+            return None
+        return rate_limited_call(ak.futures_hold_pos_sina, symbol=POSITION_TYPES[0],
+                                 contract=contract, date=trade_date)
+
+    def _resolve_contracts(self, symbols: List[str], trade_date: str) -> Dict[str, str]:
+        """确定各品种主力合约（在线程池中执行）"""
+        symbol_names = getattr(self.fetcher, 'symbol_names', {})
+        contracts = {}
+
+        for symbol in symbols:
+            try:
+                main_contract = self.fetcher.resolve_main_contract(symbol, trade_date)
+            except Exception as e:
+                print(f"  {symbol} ({symbol_names.get(symbol, symbol)}) - 主力合约获取异常: {str(e)[:30]} ❌")
+                continue
+
+            if not main_contract:
+                print(f"  {symbol} ({symbol_names.get(symbol, symbol)}) - 无法确定主力合约 ❌")
+                continue
+
+            contracts[symbol] = main_contract
+
+        return contracts
+
+    async def fetch_exchange(self, exchange_name: str, trade_date: str) -> Dict[str, pd.DataFrame]:
+        """
+        获取指定交易所的所有品种持仓数据
+
+        Args:
+            exchange_name: 交易所名称
+            trade_date: 交易日期 YYYYMMDD
+
+        Returns:
+            按品种分组的数据字典（convert_to_exchange_format的输出）
+
+        Raises:
+            CircuitOpenError: 主数据源近期超时（熔断打开）
+        """
+        print(f"\n正在获取{exchange_name}数据（异步引擎，并发数{self.max_concurrency}）...")
+
+        exchange_symbols = self.fetcher.exchange_symbols
+        if exchange_name not in exchange_symbols:
+            print(f"  未知交易所: {exchange_name}")
+            return {}
+
+        # 近期超时的数据源直接跳过，并在后台重新探测
+        breakers = get_circuit_breakers()
+        breaker_key = position_breaker_key(exchange_name)
+        if not breakers.allow(breaker_key):
+            breakers.probe_in_background(breaker_key, self.probe_exchange, exchange_name, trade_date)
+            raise CircuitOpenError(f"{exchange_name} 数据源近期超时，已直接跳过（后台重新探测中）")
+
+        symbols = exchange_symbols[exchange_name]
+        symbol_names = getattr(self.fetcher, 'symbol_names', {})
+
+        # 先确定所有品种的主力合约（可能需要获取基差数据，放在线程池中执行）
+        loop = asyncio.get_running_loop()
+        contracts = await loop.run_in_executor(
+            self.executor, self._resolve_contracts, symbols, trade_date
+        )
+
+        manifest = self.manifest
+        if manifest is not None:
+            for symbol, contract in contracts.items():
+                manifest.prepare(exchange_name, symbol, contract, POSITION_TYPES)
+            missing = len(manifest.missing(exchange_name))
+            if missing < len(contracts) * len(POSITION_TYPES):
+                print(f"  续传上次未完成的获取：待获取 {missing} 项")
+
+        symbol_results = {symbol: {} for symbol in contracts}
+        pending = {symbol: len(POSITION_TYPES) for symbol in contracts}
+        success_count = 0
+
+        async def fetch_task(symbol: str, position_type: str):
+            # 清单中已完成的条目即使缓存已过期也直接复用（交易日结算后不复用结算前写入的缓存）
+            done = manifest is not None and manifest.status(exchange_name, symbol, position_type) == DONE
+            df = await self.fetch_position(contracts[symbol], trade_date, symbol, position_type,
+                                           allow_expired=done)
+            if manifest is not None:
+                manifest.mark(exchange_name, symbol, position_type, DONE if df is not None else FAILED)
+            return symbol, position_type, df
+
+        tasks = [
+            asyncio.ensure_future(fetch_task(symbol, position_type))
+            for symbol in contracts
+            for position_type in POSITION_TYPES
+        ]
+
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                try:
+                    symbol, position_type, df = await next_done
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    print(f"    获取持仓数据失败: {str(e)[:50]}")
+                    continue
+
+                if df is not None:
+                    symbol_results[symbol][position_type] = df
+
+                pending[symbol] -= 1
+                if pending[symbol] == 0:
+                    status = "✅" if symbol_results[symbol] else "❌"
+                    if symbol_results[symbol]:
+                        success_count += 1
+                    print(f"  {symbol} ({symbol_names.get(symbol, symbol)}) - {contracts[symbol]} {status}")
+        finally:
+            # 被取消或超过期限时，取消尚未完成的请求
+            for task in tasks:
+                task.cancel()
+
+        # 按原品种顺序组装，保持与串行获取一致的输出
+        all_data = []
+        for symbol in contracts:
+            for position_type in POSITION_TYPES:
+                if position_type in symbol_results[symbol]:
+                    all_data.append(symbol_results[symbol][position_type])
+
+        print(f"  {exchange_name}数据获取完成: {success_count}/{len(symbols)} 个品种成功")
+
+        if manifest is not None:
+            manifest.finish(exchange_name)
+
+        data = self.fetcher.convert_to_exchange_format(all_data, exchange_name)
+        if data:
+            breakers.record_success(breaker_key)
+        return data
+
+    async def iter_exchanges(self, trade_date: str, exchanges: List[str] = None,
+                             deadlines: Dict[str, float] = None,
+                             ) -> AsyncIterator[Tuple[str, Dict[str, pd.DataFrame], Optional[BaseException]]]:
+        """
+        并发获取多个交易所，按完成顺序产出 (交易所, 数据字典, 异常)
+
+        Args:
+            trade_date: 交易日期 YYYYMMDD
+            exchanges: 交易所列表（默认全部）
+            deadlines: 交易所 -> 期限（秒），超过期限的交易所以TimeoutError产出并被取消，
+                并计入主数据源的熔断失败次数
+        """
+        exchanges = list(self.fetcher.exchange_symbols) if exchanges is None else exchanges
+        deadlines = deadlines or {}
+
+        async def exchange_task(exchange_name: str):
+            try:
+                data = await asyncio.wait_for(
+                    self.fetch_exchange(exchange_name, trade_date),
+                    deadlines.get(exchange_name)
+                )
+                return exchange_name, data, None
+            except asyncio.TimeoutError:
+                error = TimeoutError(f"{exchange_name} 获取超时({deadlines[exchange_name]:.0f}秒)")
+                record_position_timeout(exchange_name, error)
+                return exchange_name, {}, error
+            except Exception as e:
+                return exchange_name, {}, e
+
+        tasks = [asyncio.ensure_future(exchange_task(name)) for name in exchanges]
+
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def fetch_all(self, trade_date: str, exchanges: List[str] = None,
+                        deadlines: Dict[str, float] = None) -> Dict[str, Dict[str, pd.DataFrame]]:
+        """
+        并发获取多个交易所的持仓数据
+
+        Returns:
+            交易所 -> 按品种分组的数据字典（失败或超时的交易所为空字典）
+        """
+        results = {}
+        async for exchange_name, data, error in self.iter_exchanges(trade_date, exchanges, deadlines):
+            if error is not None:
+                print(f"    ❌ {exchange_name} 数据获取失败: {str(error)[:50]}")
+            results[exchange_name] = data
+        return results
+
+
+__all__ = [
+    'AsyncPositionFetcher',
+    'POSITION_SOURCE',
+    'POSITION_TYPES',
+    'get_shared_executor',
+    'position_breaker_key',
+    'record_position_timeout',
+    'run_sync'
+]
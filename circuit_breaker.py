@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+期货持仓分析系统 - 熔断模块
+按 交易所+接口函数 记录数据源状态（closed/open/half_open）并持久化，跨进程、跨运行共享：
+近期超时的数据源立即跳过，由后台线程定期重新探测，恢复后自动关闭熔断。
+作者：7haoge
+邮箱：953534947@qq.com
+"""
+
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+from config import CACHE_CONFIG, CIRCUIT_BREAKER_CONFIG
+from deadline import call_with_deadline
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """数据源处于熔断状态，请求被直接跳过"""
+
+
+class CircuitBreakerRegistry:
+    """
+    熔断状态表
+    每次读取前按文件修改时间重新加载，其他进程的更新立即可见；写入为原子替换。
+    """
+
+    def __init__(self, state_file: str = None):
+        """
+        初始化状态表
+
+        :param state_file: 状态文件路径（默认读取CIRCUIT_BREAKER_CONFIG）
+        """
+        self.path = Path(state_file or os.path.join(CACHE_CONFIG["cache_dir"],
+                                                    CIRCUIT_BREAKER_CONFIG["state_file"]))
+        self.states: Dict[str, Dict[str, Any]] = {}
+        self._mtime = None
+        self._lock = threading.RLock()
+        self._probing = set()
+
+    @staticmethod
+    def make_key(exchange_name: str, func: Any) -> str:
+        """熔断键：交易所:接口函数名"""
+        func_name = func if isinstance(func, str) else getattr(func, '__name__', repr(func))
+        return f"{exchange_name}:{func_name}"
+
+    def _reload(self):
+        """文件有更新时重新加载（调用方持有锁）"""
+        try:
+            mtime = self.path.stat().st_mtime_ns
+        except FileNotFoundError:
+            return
+        if mtime == self._mtime:
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self.states = json.load(f)
+            self._mtime = mtime
+        except Exception as e:
+            print(f"  ⚠️ 熔断状态读取失败: {str(e)[:50]}")
+
+    def _save(self):
+        """原子写入状态文件（调用方持有锁）"""
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.states, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.path)
+            self._mtime = self.path.stat().st_mtime_ns
+        except Exception as e:
+            print(f"  ⚠️ 熔断状态保存失败: {str(e)[:50]}")
+
+    def _update(self, key: str, **fields):
+        """更新单个数据源的状态并写入磁盘"""
+        with self._lock:
+            self._reload()
+            state = self.states.setdefault(key, {"state": CLOSED, "failures": 0})
+            state.update(fields)
+            state["updated_at"] = time.time()
+            self._save()
+
+    def state(self, key: str) -> Dict[str, Any]:
+        """数据源当前状态（探测超过期限的half_open按open处理）"""
+        with self._lock:
+            self._reload()
+            state = dict(self.states.get(key, {"state": CLOSED, "failures": 0}))
+
+        if (state["state"] == HALF_OPEN and
+                time.time() - state.get("probe_started_at", 0) > CIRCUIT_BREAKER_CONFIG["probe_timeout"]):
+            state["state"] = OPEN
+        return state
+
+    def allow(self, key: str) -> bool:
+        """是否允许请求该数据源（熔断打开或正在探测时返回False）"""
+        return self.state(key)["state"] == CLOSED
+
+    def record_success(self, key: str):
+        """记录成功：关闭熔断"""
+        state = self.state(key)
+        if state["state"] != CLOSED or state.get("failures"):
+            self._update(key, state=CLOSED, failures=0)
+
+    def record_failure(self, key: str, error: Any = None):
+        """记录超时/失败：连续次数达到阈值时打开熔断"""
+        state = self.state(key)
+        failures = state.get("failures", 0) + 1
+        if failures >= CIRCUIT_BREAKER_CONFIG["failure_threshold"]:
+            self._update(key, state=OPEN, failures=failures, opened_at=time.time(),
+                         last_probe_at=time.time(), last_error=str(error)[:200] if error else None)
+        else:
+            self._update(key, failures=failures)
+
+    def probe_in_background(self, key: str, func: Callable, *args, **kwargs) -> bool:
+        """
+        熔断打开且距上次探测超过probe_interval时，在后台线程中重新探测
+
+        探测在期限内返回非空结果即关闭熔断，否则保持打开。
+
+        :return: 是否启动了探测
+        """
+        state = self.state(key)
+        if state["state"] != OPEN:
+            return False
+        if time.time() - state.get("last_probe_at", 0) < CIRCUIT_BREAKER_CONFIG["probe_interval"]:
+            return False
+
+        with self._lock:
+            if key in self._probing:
+                return False
+            self._probing.add(key)
+        self._update(key, state=HALF_OPEN, probe_started_at=time.time())
+
+        def probe():
+            try:
+                result = call_with_deadline(func, *args, timeout=CIRCUIT_BREAKER_CONFIG["probe_timeout"],
+                                            name=f"probe-{key}", **kwargs)
+                if _has_data(result):
+                    self._update(key, state=CLOSED, failures=0)
+                    print(f"  ✅ {key} 探测成功，已恢复")
+                    return
+                error = "探测无数据"
+            except Exception as e:
+                error = e
+            finally:
+                with self._lock:
+                    self._probing.discard(key)
+            self._update(key, state=OPEN, last_probe_at=time.time(), last_error=str(error)[:200])
+
+        threading.Thread(target=probe, name=f"probe-{key}", daemon=True).start()
+        return True
+
+    def all_states(self) -> Dict[str, Dict[str, Any]]:
+        """所有数据源的状态"""
+        with self._lock:
+            self._reload()
+            keys = list(self.states)
+        return {key: self.state(key) for key in keys}
+
+
+def _has_data(result: Any) -> bool:
+    """结果是否包含数据（DataFrame非空、字典非空）"""
+    if result is None:
+        return False
+    if hasattr(result, 'empty'):
+        return not result.empty
+    return bool(result)
+
+
+_registry: Optional[CircuitBreakerRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_circuit_breakers() -> CircuitBreakerRegistry:
+    """获取进程级共享熔断状态表"""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = CircuitBreakerRegistry()
+        return _registry
+
+
+__all__ = [
+    'CircuitBreakerRegistry',
+    'CircuitOpenError',
+    'get_circuit_breakers',
+    'CLOSED',
+    'OPEN',
+    'HALF_OPEN'
+]
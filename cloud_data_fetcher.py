@@ -19,6 +19,14 @@ from typing import Dict, List, Optional, Any
 import warnings
 warnings.filterwarnings('ignore')
 
+from rate_limiter import rate_limited_call
+from deadline import DeadlineBudget, DeadlineExceeded, call_with_deadline
+from config import HEDGE_CONFIG
+from circuit_breaker import CircuitOpenError, get_circuit_breakers
+from retry_policy import RetryBudget, get_retry_policy
+from response_cache import fetch_futures_daily
+from position_store import save_positions
+
 class CloudDataFetcher:
     """云端数据获取器 - 专门处理云端环境的数据获取问题"""
     
@@ -26,8 +34,11 @@ class CloudDataFetcher:
         self.session = self.create_session()
         self.max_retries = 3
         self.timeout = 30
-        self.delay_between_requests = 2  # 请求间隔
-        
+        self.call_timeout = 20  # 单次请求期限（秒）
+        self.retry_policy = get_retry_policy()
+        # 请求间隔与出错退避由rate_limiter中的进程级共享限速器统一控制
+        # 重试预算按每次获取创建并逐层传入（cloud_fetcher为进程级共享实例，预算不放在实例上）
+    
     def create_session(self):
         """创建优化的请求会话"""
         session = requests.Session()
@@ -40,64 +51,78 @@ class CloudDataFetcher:
         })
         return session
     
-    def safe_akshare_call(self, func, *args, **kwargs):
-        """安全的akshare调用，包含重试机制和超时控制"""
-        for attempt in range(self.max_retries):
-            try:
-                # 添加延迟避免请求过快
-                if attempt > 0:
-                    time.sleep(self.delay_between_requests * attempt)
-                
-                # 使用更短的超时时间，特别是对于广期所
-                import signal
-                
-                def timeout_handler(signum, frame):
-                    raise TimeoutError("请求超时")
-                
-                # 设置超时信号（仅在非Windows系统）
-                try:
-                    signal.signal(signal.SIGALRM, timeout_handler)
-                    signal.alarm(20)  # 20秒超时
-                except:
-                    pass  # Windows系统不支持SIGALRM
-                
-                result = func(*args, **kwargs)
-                
-                # 取消超时信号
-                try:
-                    signal.alarm(0)
-                except:
-                    pass
-                
-                if result is not None:
-                    return result
-                    
-            except TimeoutError:
-                st.warning(f"请求超时 (尝试 {attempt + 1}/{self.max_retries})")
-                if attempt == self.max_retries - 1:
-                    st.error("多次超时，跳过此数据源")
-                continue
-                
-            except Exception as e:
-                error_msg = str(e)
-                if attempt == self.max_retries - 1:
-                    st.warning(f"数据获取失败 (尝试 {attempt + 1}/{self.max_retries}): {error_msg}")
-                else:
-                    st.info(f"重试中... (尝试 {attempt + 1}/{self.max_retries})")
-                
-                # 特定错误的处理
-                if "timeout" in error_msg.lower():
-                    time.sleep(5)  # 超时错误等待更长时间
-                elif "rate limit" in error_msg.lower():
-                    time.sleep(10)  # 频率限制等待更长时间
-                elif "connection" in error_msg.lower():
-                    time.sleep(3)  # 连接错误等待
-                    
+    def safe_akshare_call(self, func, *args, budget: DeadlineBudget = None,
+                          retry_budget: RetryBudget = None, **kwargs):
+        """
+        安全的akshare调用，包含重试机制和超时控制（经共享限速器）
+        
+        重试遵循统一重试策略，max_retries为尝试次数上限；传入retry_budget时同一次获取的
+        所有调用共享该重试预算（不传则只受max_retries限制）。
+        超时控制基于线程，可在任意线程中并发调用；传入budget时所有重试共享该批次预算，
+        超过期限的调用记录在budget.expired_calls中。
+        """
+        def attempt():
+            return call_with_deadline(
+                rate_limited_call, func, *args,
+                timeout=self.call_timeout, budget=budget,
+                name=getattr(func, '__name__', None), **kwargs
+            )
+        
+        def on_retry(attempt_count, error, delay):
+            if isinstance(error, DeadlineExceeded):
+                st.warning(f"请求超时 (尝试 {attempt_count}/{self.max_retries})")
+            else:
+                st.info(f"重试中... (尝试 {attempt_count}/{self.max_retries})")
+        
+        # 统一重试策略：指数退避+随机抖动，按错误类型决定次数，受本次获取的重试预算限制
+        try:
+            return self.retry_policy.call(
+                attempt,
+                budget=retry_budget,
+                max_attempts=self.max_retries,
+                retry_if_result=lambda result: result is None,
+                on_retry=on_retry
+            )
+        except DeadlineExceeded:
+            if budget is not None and budget.exhausted():
+                st.error(f"{budget.name}超过总期限({budget.total:.0f}秒)，跳过此数据源")
+            else:
+                st.error("多次超时，跳过此数据源")
+        except Exception as e:
+            st.warning(f"数据获取失败: {str(e)}")
+        
         return None
     
+    def guarded_akshare_call(self, exchange_name: str, func, *args, budget: DeadlineBudget = None,
+                             retry_budget: RetryBudget = None, **kwargs):
+        """
+        经熔断保护的akshare调用（按 交易所+接口函数 区分）
+        
+        近期超时的数据源直接抛出CircuitOpenError，不再等待，并在后台重新探测；
+        本次调用超时则打开熔断，成功返回则关闭熔断。
+        """
+        breakers = get_circuit_breakers()
+        key = breakers.make_key(exchange_name, func)
+        
+        if not breakers.allow(key):
+            breakers.probe_in_background(key, rate_limited_call, func, *args, **kwargs)
+            raise CircuitOpenError(f"{exchange_name} 数据源近期超时，已直接跳过（后台重新探测中）")
+        
+        budget = budget or DeadlineBudget(self.timeout, exchange_name)
+        result = self.safe_akshare_call(func, *args, budget=budget, retry_budget=retry_budget, **kwargs)
+        
+        if result is not None and (not hasattr(result, 'empty') or not result.empty):
+            breakers.record_success(key)
+        elif budget.expired_calls:
+            breakers.record_failure(key, f"{budget.expired_calls[-1].name} 超过期限（预算{budget.total:.0f}秒）")
+        
+        return result
+    
     def fetch_position_data_with_fallback(self, trade_date: str, progress_callback=None) -> bool:
         """获取持仓数据，包含备用方案"""
         
+        retry_budget = RetryBudget()  # 本次获取的重试预算
+        
         # 尝试导入akshare
         try:
             import akshare as ak
@@ -167,23 +192,24 @@ class CloudDataFetcher:
                     original_retries = self.max_retries
                     self.max_retries = 2  # 广期所只重试2次
                 
-                # 使用安全调用
+                # 使用安全调用（所有重试共享交易所的期限预算，近期超时的数据源直接跳过）
                 start_time = time.time()
-                data_dict = self.safe_akshare_call(exchange['func'], **exchange['args'])
+                budget = DeadlineBudget(exchange['timeout'], exchange['name'])
+                try:
+                    data_dict = self.guarded_akshare_call(
+                        exchange['name'], exchange['func'], budget=budget,
+                        retry_budget=retry_budget, **exchange['args']
+                    )
+                finally:
+                    # 恢复原始重试次数
+                    if exchange['name'] == '广期所':
+                        self.max_retries = original_retries
                 end_time = time.time()
                 
-                # 恢复原始重试次数
-                if exchange['name'] == '广期所':
-                    self.max_retries = original_retries
-                
                 if data_dict:
                     # 保存数据
-                    save_path = os.path.join(data_dir, exchange['filename'])
-                    with pd.ExcelWriter(save_path, engine='openpyxl') as writer:
-                        for sheet_name, df in data_dict.items():
-                            # 清理sheet名称
-                            clean_name = sheet_name[:31].replace("/", "-").replace("*", "")
-                            df.to_excel(writer, sheet_name=clean_name, index=False)
+                    save_positions(data_dict, data_dir, exchange['filename'],
+                                   trade_date=trade_date, exchange_name=exchange['name'])
                     
                     st.success(f"✅ {exchange['name']} 数据获取成功 (耗时: {end_time - start_time:.1f}秒)")
                     success_count += 1
@@ -200,12 +226,6 @@ class CloudDataFetcher:
                 else:
                     st.warning(f"⚠️ {exchange['name']} 数据获取失败: {error_msg}")
                 continue
-            
-            # 添加请求间隔，广期所后等待更长时间
-            if exchange['name'] == '广期所':
-                time.sleep(self.delay_between_requests * 2)
-            else:
-                time.sleep(self.delay_between_requests)
         
         if progress_callback:
             progress_callback("持仓数据获取完成", 0.6)
@@ -241,6 +261,7 @@ class CloudDataFetcher:
         
         all_data = []
         success_count = 0
+        retry_budget = RetryBudget()  # 本次获取的重试预算
         
         for i, exchange in enumerate(price_exchanges):
             if progress_callback:
@@ -256,59 +277,20 @@ class CloudDataFetcher:
                 # 对广期所使用增强的超时控制
                 if exchange['name'] == '广期所':
                     st.info("⚠️ 广期所数据获取中，如遇问题将自动跳过...")
-                    
-                    try:
-                        # 使用线程和严格超时控制
-                        import threading
-                        import queue
-                        
-                        result_queue = queue.Queue()
-                        
-                        def fetch_gfex_data():
-                            try:
-                                result = self.safe_akshare_call(
-                                    ak.get_futures_daily,
-                                    start_date=trade_date,
-                                    end_date=trade_date,
-                                    market=exchange["market"]
-                                )
-                                result_queue.put(('success', result))
-                            except Exception as e:
-                                result_queue.put(('error', str(e)))
-                        
-                        # 启动获取线程
-                        fetch_thread = threading.Thread(target=fetch_gfex_data)
-                        fetch_thread.daemon = True
-                        fetch_thread.start()
-                        
-                        # 等待结果，使用配置的超时时间
-                        fetch_thread.join(timeout=exchange.get('timeout', 15))
-                        
-                        if fetch_thread.is_alive():
-                            # 超时了，自动跳过
-                            st.warning(f"⚠️ {exchange['name']} 数据获取超时({exchange.get('timeout', 15)}秒)，自动跳过")
-                            continue
-                        
-                        # 获取结果
-                        try:
-                            status, df = result_queue.get_nowait()
-                            if status == 'error':
-                                raise Exception(df)
-                        except queue.Empty:
-                            st.warning(f"⚠️ {exchange['name']} 数据获取无响应，自动跳过")
-                            continue
-                            
-                    except Exception as e:
-                        st.warning(f"⚠️ {exchange['name']} 数据获取失败，自动跳过: {str(e)}")
-                        continue
-                else:
-                    # 其他交易所使用标准获取方式
-                    df = self.safe_akshare_call(
-                        ak.get_futures_daily,
-                        start_date=trade_date,
-                        end_date=trade_date,
-                        market=exchange["market"]
+                
+                # 优先读取逐日缓存；网络请求的所有重试共享交易所的期限预算，超过期限自动跳过
+                budget = DeadlineBudget(exchange.get('timeout', 30), exchange['name'])
+                df = fetch_futures_daily(
+                    exchange["market"], trade_date, trade_date,
+                    fetch=lambda **kwargs: self.guarded_akshare_call(
+                        exchange['name'], ak.get_futures_daily, budget=budget,
+                        retry_budget=retry_budget, **kwargs
                     )
+                )
+                
+                if budget.expired_calls and (df is None or df.empty):
+                    st.warning(f"⚠️ {exchange['name']} 数据获取超时({budget.total:.0f}秒)，自动跳过")
+                    continue
                 
                 end_time = time.time()
                 elapsed_time = end_time - start_time
@@ -326,9 +308,6 @@ class CloudDataFetcher:
                 elapsed_time = time.time() - start_time if 'start_time' in locals() else 0
                 st.warning(f"⚠️ {exchange['name']} 行情数据获取失败，跳过: {error_msg}")
                 continue
-            
-            # 添加请求间隔
-            time.sleep(self.delay_between_requests)
         
         if progress_callback:
             progress_callback("行情数据获取完成", 0.8)
@@ -356,7 +335,6 @@ class CloudDataFetcher:
         
         for exchange_name in ['大商所', '中金所', '郑商所', '上期所', '广期所']:
             filename = f"{exchange_name}持仓.xlsx"
-            save_path = os.path.join(data_dir, filename)
             
             # 创建演示数据
             demo_data = {}
@@ -378,9 +356,7 @@ class CloudDataFetcher:
                 demo_data[contract] = pd.DataFrame(data)
             
             # 保存演示数据
-            with pd.ExcelWriter(save_path, engine='openpyxl') as writer:
-                for sheet_name, df in demo_data.items():
-                    df.to_excel(writer, sheet_name=sheet_name, index=False)
+            save_positions(demo_data, data_dir, filename)
         
         st.info("✅ 演示数据创建完成，您可以体验系统功能")
         return True
@@ -435,6 +411,8 @@ class CloudDataFetcher:
     def fetch_position_data_skip_gfex(self, trade_date: str, progress_callback=None) -> bool:
         """获取持仓数据，跳过广期所（云端环境专用）"""
         
+        retry_budget = RetryBudget()  # 本次获取的重试预算
+        
         # 尝试导入akshare
         try:
             import akshare as ak
@@ -489,17 +467,14 @@ class CloudDataFetcher:
                 
                 # 使用安全调用
                 start_time = time.time()
-                data_dict = self.safe_akshare_call(exchange['func'], **exchange['args'])
+                data_dict = self.safe_akshare_call(exchange['func'], retry_budget=retry_budget,
+                                                   **exchange['args'])
                 end_time = time.time()
                 
                 if data_dict:
                     # 保存数据
-                    save_path = os.path.join(data_dir, exchange['filename'])
-                    with pd.ExcelWriter(save_path, engine='openpyxl') as writer:
-                        for sheet_name, df in data_dict.items():
-                            # 清理sheet名称
-                            clean_name = sheet_name[:31].replace("/", "-").replace("*", "")
-                            df.to_excel(writer, sheet_name=clean_name, index=False)
+                    save_positions(data_dict, data_dir, exchange['filename'],
+                                   trade_date=trade_date, exchange_name=exchange['name'])
                     
                     st.success(f"✅ {exchange['name']} 数据获取成功 (耗时: {end_time - start_time:.1f}秒)")
                     success_count += 1
@@ -509,16 +484,10 @@ class CloudDataFetcher:
             except Exception as e:
                 st.warning(f"⚠️ {exchange['name']} 数据获取失败: {str(e)}")
                 continue
-            
-            # 添加请求间隔
-            time.sleep(self.delay_between_requests)
         
         # 创建空的广期所文件以保持兼容性
-        gfex_path = os.path.join(data_dir, "广期所持仓.xlsx")
         empty_data = {'空数据': pd.DataFrame({'说明': ['广期所数据已跳过']})}
-        with pd.ExcelWriter(gfex_path, engine='openpyxl') as writer:
-            for sheet_name, df in empty_data.items():
-                df.to_excel(writer, sheet_name=sheet_name, index=False)
+        save_positions(empty_data, data_dir, "广期所持仓.xlsx")
         
         if progress_callback:
             progress_callback("持仓数据获取完成（已跳过广期所）", 0.6)
@@ -534,7 +503,7 @@ class CloudDataFetcher:
             return False
 
     def fetch_position_data_with_auto_skip(self, trade_date: str, progress_callback=None) -> bool:
-        """获取持仓数据，使用集成数据获取器（交易席位方法）"""
+        """获取持仓数据，使用集成数据获取器（交易席位方法），各获取路径自行创建本次的重试预算"""
         
         # 尝试导入akshare
         try:
@@ -575,8 +544,76 @@ class CloudDataFetcher:
         # 使用在线模式初始化
         fetcher = IntegratedDataFetcher("data", online_mode=True)
         
+        # 本次运行的重试预算（cloud_fetcher为进程级共享实例，预算不放在实例上）
+        budget = RetryBudget()
+        
+        # 对冲模式：主数据源迟迟未返回时并行请求交易所排名表
+        if HEDGE_CONFIG["enabled"]:
+            return self._fetch_with_hedging(fetcher, trade_date, progress_callback, budget)
+        
         # 使用集成获取器的统一接口
-        return fetcher.fetch_all_exchanges_data(trade_date, progress_callback)
+        return fetcher.fetch_all_exchanges_data(trade_date, progress_callback, budget)
+    
+    def _fetch_with_hedging(self, fetcher, trade_date: str, progress_callback=None,
+                            budget: RetryBudget = None) -> bool:
+        """对冲获取各交易所持仓数据：采用主数据源与交易所排名表中先完成的完整结果"""
+        from async_position_fetcher import run_sync
+        from fetch_manifest import get_fetch_manifest
+        from hedged_fetch import HedgedPositionFetcher, PRIMARY
+        from parallel_fetch import get_exchange_deadline
+        
+        st.info("⚡ 对冲模式：主数据源超过历史耗时分位数未返回时，并行请求交易所排名表")
+        
+        filenames = {
+            "大商所": "大商所持仓.xlsx",
+            "中金所": "中金所持仓.xlsx",
+            "郑商所": "郑商所持仓.xlsx",
+            "上期所": "上期所持仓.xlsx",
+            "广期所": "广期所持仓.xlsx"
+        }
+        total_exchanges = len(filenames)
+        deadlines = {name: get_exchange_deadline("position", name) for name in filenames}
+        
+        # 预先构建主力合约索引
+        fetcher.contract_index.get_contracts(trade_date)
+        
+        # 获取清单记录主数据源每个品种×持仓类型的状态，中断后重新获取时只请求缺失部分
+        hedged = HedgedPositionFetcher(fetcher, budget=budget, manifest=get_fetch_manifest(trade_date))
+        
+        async def fetch_and_save():
+            success_count = 0
+            completed = 0
+            async for exchange_name, source, data_dict, error in hedged.iter_exchanges(
+                    trade_date, list(filenames), deadlines):
+                completed += 1
+                if progress_callback:
+                    progress_callback(f"{exchange_name} 数据获取完成", completed / total_exchanges * 0.6)
+                
+                if error is not None:
+                    st.warning(f"⚠️ {exchange_name} 数据获取失败: {str(error)[:50]}")
+                elif data_dict:
+                    fetcher.save_to_excel(data_dict, filenames[exchange_name], trade_date, exchange_name)
+                    source_name = "新浪持仓" if source == PRIMARY else "交易所排名表"
+                    st.success(f"✅ {exchange_name} 数据获取成功（{source_name}）")
+                    success_count += 1
+                else:
+                    st.warning(f"⚠️ {exchange_name} 数据获取失败，但不影响其他交易所")
+            return success_count
+        
+        success_count = run_sync(fetch_and_save())
+        
+        if progress_callback:
+            progress_callback("持仓数据获取完成", 0.6)
+        
+        if success_count >= 3:
+            st.info(f"✅ 成功获取 {success_count}/{total_exchanges} 个交易所数据")
+            return True
+        elif success_count > 0:
+            st.warning(f"⚠️ 仅获取到 {success_count}/{total_exchanges} 个交易所数据")
+            return True
+        else:
+            st.error("❌ 所有交易所数据获取失败")
+            return False
     
     def _fetch_with_sina_fetcher(self, trade_date: str, progress_callback=None) -> bool:
         """使用新浪获取器获取数据"""
@@ -585,6 +622,7 @@ class CloudDataFetcher:
         st.info("🌟 使用新浪持仓数据获取器（更稳定）")
         
         fetcher = SinaPositionFetcher("data")
+        budget = RetryBudget()  # 各交易所共享本次运行的重试预算
         success_count = 0
         total_exchanges = 5
         
@@ -606,11 +644,11 @@ class CloudDataFetcher:
                 st.info(f"🔄 正在获取 {exchange_name} 数据（新浪API）...")
                 
                 # 使用新浪获取器
-                data_dict = fetcher.fetch_exchange_data(exchange_name, trade_date)
+                data_dict = fetcher.fetch_exchange_data(exchange_name, trade_date, budget)
                 
                 if data_dict:
                     # 保存数据
-                    fetcher.save_to_excel(data_dict, filenames[exchange_name])
+                    fetcher.save_to_excel(data_dict, filenames[exchange_name], trade_date, exchange_name)
                     st.success(f"✅ {exchange_name} 数据获取成功")
                     success_count += 1
                 else:
@@ -639,6 +677,7 @@ class CloudDataFetcher:
         
         st.info("📊 使用传统方法获取数据")
         
+        retry_budget = RetryBudget()  # 本次获取的重试预算
         success_count = 0
         total_exchanges = 5
         
@@ -713,68 +752,38 @@ class CloudDataFetcher:
                     self.max_retries = 1  # 广期所只尝试1次
                     
                     try:
-                        # 使用线程和超时控制
-                        import threading
-                        import queue
-                        
-                        result_queue = queue.Queue()
-                        
-                        def fetch_data():
-                            try:
-                                result = self.safe_akshare_call(exchange_func, **exchange['args'])
-                                result_queue.put(('success', result))
-                            except Exception as e:
-                                result_queue.put(('error', str(e)))
-                        
-                        # 启动获取线程
-                        fetch_thread = threading.Thread(target=fetch_data)
-                        fetch_thread.daemon = True
-                        fetch_thread.start()
-                        
-                        # 等待结果，最多等待20秒
-                        fetch_thread.join(timeout=20)
+                        # 最多等待交易所期限，超时自动跳过
+                        budget = DeadlineBudget(exchange['timeout'], exchange['name'])
+                        data_dict = self.guarded_akshare_call(
+                            exchange['name'], exchange_func, budget=budget,
+                            retry_budget=retry_budget, **exchange['args']
+                        )
                         
-                        if fetch_thread.is_alive():
-                            # 超时了，自动跳过
+                        if budget.expired_calls and not data_dict:
                             st.warning("⚠️ 广期所数据获取超时，自动跳过以避免卡顿")
-                            self.max_retries = original_retries
                             
                             # 创建空的广期所文件以保持兼容性
-                            gfex_path = os.path.join(data_dir, exchange['filename'])
                             empty_data = {'跳过说明': pd.DataFrame({'说明': ['广期所数据获取超时，已自动跳过']})}
-                            with pd.ExcelWriter(gfex_path, engine='openpyxl') as writer:
-                                for sheet_name, df in empty_data.items():
-                                    df.to_excel(writer, sheet_name=sheet_name, index=False)
+                            save_positions(empty_data, data_dir, exchange['filename'])
                             
                             continue
-                        
-                        # 获取结果
-                        try:
-                            status, data_dict = result_queue.get_nowait()
-                            if status == 'error':
-                                raise Exception(data_dict)
-                        except queue.Empty:
-                            st.warning("⚠️ 广期所数据获取无响应，自动跳过")
-                            self.max_retries = original_retries
-                            continue
-                            
                     finally:
                         self.max_retries = original_retries
                 else:
                     # 其他交易所使用正常的获取方式
-                    data_dict = self.safe_akshare_call(exchange_func, **exchange['args'])
+                    budget = DeadlineBudget(exchange['timeout'], exchange['name'])
+                    data_dict = self.guarded_akshare_call(
+                        exchange['name'], exchange_func, budget=budget,
+                        retry_budget=retry_budget, **exchange['args']
+                    )
                 
                 end_time = time.time()
                 elapsed_time = end_time - start_time
                 
                 if data_dict:
                     # 保存数据
-                    save_path = os.path.join(data_dir, exchange['filename'])
-                    with pd.ExcelWriter(save_path, engine='openpyxl') as writer:
-                        for sheet_name, df in data_dict.items():
-                            # 清理sheet名称
-                            clean_name = sheet_name[:31].replace("/", "-").replace("*", "")
-                            df.to_excel(writer, sheet_name=clean_name, index=False)
+                    save_positions(data_dict, data_dir, exchange['filename'],
+                                   trade_date=trade_date, exchange_name=exchange['name'])
                     
                     st.success(f"✅ {exchange['name']} 数据获取成功 (耗时: {elapsed_time:.1f}秒)")
                     success_count += 1
@@ -792,17 +801,11 @@ class CloudDataFetcher:
                     st.warning(f"⚠️ {exchange['name']} 数据获取失败，已自动跳过: {error_msg}")
                     
                     # 创建空的广期所文件
-                    gfex_path = os.path.join(data_dir, exchange['filename'])
                     empty_data = {'跳过说明': pd.DataFrame({'说明': [f'广期所数据获取失败: {error_msg}']})}
-                    with pd.ExcelWriter(gfex_path, engine='openpyxl') as writer:
-                        for sheet_name, df in empty_data.items():
-                            df.to_excel(writer, sheet_name=sheet_name, index=False)
+                    save_positions(empty_data, data_dir, exchange['filename'])
                 else:
                     st.warning(f"⚠️ {exchange['name']} 数据获取失败: {error_msg}")
                 continue
-            
-            # 添加请求间隔
-            time.sleep(self.delay_between_requests)
         
         if progress_callback:
             progress_callback("持仓数据获取完成", 0.6)
@@ -23,6 +23,166 @@ DATA_CONFIG = {
     "timeout": 30,      # 网络超时时间（秒）
 }
 
+# 数据获取并发配置
+FETCH_CONFIG = {
+    "max_workers": 8,             # 品种×持仓类型并发请求数
+    "executor_workers": 32,       # 异步引擎共享线程池大小（所有会话共用）
+    "call_timeout": 30,           # 单次akshare调用期限（秒）
+    # 交易所级并发获取的期限（秒），超时的交易所被放弃，不阻塞其他交易所
+    "position_deadlines": {"default": 300, "广期所": 60},
+    "price_deadlines": {"default": 30, "广期所": 15},
+}
+
+# 对冲请求配置（主数据源迟迟未返回时并行请求备用数据源，先完成者胜出）
+HEDGE_CONFIG = {
+    "enabled": True,
+    "percentile": 95,             # 以主数据源历史耗时的该分位数作为对冲延迟
+    "default_delay": 30,          # 样本不足时的对冲延迟（秒）
+    "min_delay": 5,               # 对冲延迟下限（秒）
+    "min_samples": 5,             # 启用分位数估计所需的最少样本数
+    "window": 50,                 # 每个数据源保留的最近耗时样本数
+    "min_coverage": 0.8,          # 结果覆盖交易所品种的比例达到该值才视为完整（可赢得对冲）
+    # 各交易所的备用数据源（交易所持仓排名表）
+    "alternate_sources": {
+        "大商所": "get_dce_rank_table",
+        "中金所": "get_cffex_rank_table",
+        "郑商所": "get_czce_rank_table",
+        "上期所": "get_shfe_rank_table",
+        "广期所": "futures_gfex_position_rank",
+    },
+}
+
+# 熔断配置（按 交易所+接口函数 区分，状态持久化，跨进程、跨运行共享）
+CIRCUIT_BREAKER_CONFIG = {
+    "failure_threshold": 1,       # 连续超时次数达到该值即熔断
+    "probe_interval": 300,        # 熔断后每隔多久在后台重新探测一次（秒）
+    "probe_timeout": 60,          # 后台探测期限（秒），超过仍未结束视为探测失败
+    "state_file": "circuit_breakers.json",  # 状态文件（位于缓存目录下）
+}
+
+# 统一重试策略（指数退避+随机抖动，按错误类型区分，每次运行共享重试预算）
+RETRY_CONFIG = {
+    "max_attempts": 3,            # 默认最多尝试次数（含首次）
+    "base_delay": 0.5,            # 首次重试的退避上限（秒）
+    "multiplier": 2.0,            # 退避倍数
+    "max_delay": 8.0,             # 单次退避上限（秒）
+    # 按错误类型覆盖默认参数
+    "rules": {
+        "timeout": {"max_attempts": 2},                       # 超时：已等待过期限，只重试一次
+        "rate_limit": {"max_attempts": 4, "base_delay": 2.0},  # 被限流：退避更久
+        "network": {},                                        # 连接错误：默认策略
+        "empty": {"max_attempts": 2},                         # 返回空数据：可能为非交易日，只重试一次
+        "data": {"max_attempts": 1},                          # 解析错误（合约不存在等）：不重试
+    },
+    # 每次运行的重试预算，用完后不再重试（首次请求不受影响）
+    "budget": {
+        "max_retries": 60,
+        "max_retry_seconds": 60,
+    },
+}
+
+# 限速配置（进程级共享令牌桶，按上游主机/API函数区分）
+RATE_LIMIT_CONFIG = {
+    "default": {
+        "rate": 2.0,               # 初始速率（次/秒）
+        "burst": 4,                # 令牌桶容量
+        "min_rate": 0.2,           # 最低速率
+        "max_rate": 10.0,          # 最高速率
+        "fast_latency": 1.0,       # 响应快于该值（秒）时放宽速率
+        "increase_step": 0.2,      # 每次放宽的速率增量
+        "decrease_factor": 0.5,    # 出错时速率乘以该系数
+        "error_cooldown": 1.0,     # 出错后的基础暂停时间（秒）
+        "max_cooldown": 30.0,      # 最长暂停时间（秒）
+    },
+    # API函数 -> 上游主机（同一主机共享一个限速器）
+    "api_hosts": {
+        "futures_hold_pos_sina": "sina",
+        "futures_spot_price": "100ppi",
+        "get_futures_daily": "exchange_daily",
+        "get_dce_rank_table": "dce",
+        "futures_dce_position_rank": "dce",
+        "get_cffex_rank_table": "cffex",
+        "futures_cffex_position_rank": "cffex",
+        "get_czce_rank_table": "czce",
+        "futures_czce_position_rank": "czce",
+        "get_shfe_rank_table": "shfe",
+        "futures_shfe_position_rank": "shfe",
+        "futures_gfex_position_rank": "gfex",
+    },
+    # 各上游的参数覆盖
+    "limits": {
+        "sina": {"rate": 4.0, "burst": 8, "max_rate": 16.0},
+        "gfex": {"rate": 0.5, "burst": 1, "max_rate": 2.0},
+    },
+}
+
+# 响应缓存配置
+CACHE_CONFIG = {
+    "cache_dir": "cache",          # 持久化缓存根目录
+    "settlement_time": "17:00",    # 交易所公布持仓排名的时间，此后写入的数据不再变化
+    "intraday_ttl": 600,           # 结算前写入的当日数据的有效期（秒）
+}
+
+# 持仓数据存储配置
+STORAGE_CONFIG = {
+    "excel_export": False,          # 是否同时导出Excel（兼容需要打开xlsx的用户）
+    "compression": "snappy",        # Parquet压缩算法
+    "lake_dir": "data/lake",        # 按日期分区的数据湖根目录
+    "min_exchanges": 3,             # 某日至少存储该数量交易所的最终数据才直接读取，否则重新获取
+    "seat_history_dir": "data/seat_history",  # 逐日席位排名历史（Arrow IPC，内存映射读取）
+    "database_path": "data/positions.db",     # 席位排名查询库（SQLite）
+    "lazy_cache_size": 64,          # 按需加载持仓数据时保留的合约数（LRU）
+}
+
+# 品种分组（席位查询按组汇总，如“黑色”）
+SYMBOL_GROUPS = {
+    "黑色": ["RB", "HC", "I", "J", "JM", "SF", "SM", "SS"],
+    "有色": ["CU", "AL", "ZN", "PB", "NI", "SN"],
+    "贵金属": ["AU", "AG"],
+    "能化": ["BU", "FU", "LU", "MA", "TA", "PX", "EG", "EB", "PP", "L", "V", "PG", "SA", "FG", "UR", "RU", "NR", "SP", "PF", "PR"],
+    "农产品": ["A", "B", "C", "M", "Y", "P", "OI", "RM", "CF", "CY", "SR", "JD", "LH"],
+    "新能源": ["LC", "SI", "PS"],
+    "股指": ["IF", "IH", "IC", "IM"],
+    "国债": ["T", "TF", "TS", "TL"],
+}
+
+# akshare数据源后端配置（录制/回放，用于离线压测和调优）
+AKSHARE_BACKEND_CONFIG = {
+    "mode": "live",                 # live: 直连; record: 直连并录制响应; replay: 只回放录制的响应
+    "mode_env": "FUTURES_AKSHARE_BACKEND",  # 覆盖mode的环境变量
+    "recordings_dir": "recordings", # 录制文件目录
+    "functions": [                  # 录制/回放的接口
+        "futures_hold_pos_sina",
+        "futures_spot_price",
+        "get_futures_daily",
+        "get_dce_rank_table",
+        "get_cffex_rank_table",
+        "get_czce_rank_table",
+        "get_shfe_rank_table",
+        "futures_gfex_position_rank",
+    ],
+    # 回放时注入的延迟和故障
+    "replay": {
+        "latency": (0.2, 1.0),      # 每次调用的延迟范围（秒，均匀分布）
+        "latency_overrides": {      # 接口 -> 延迟范围
+            "futures_gfex_position_rank": (2.0, 6.0),
+        },
+        "failure_rate": 0.0,        # 注入网络错误的概率
+        "rate_limit_rate": 0.0,     # 注入限流错误（429）的概率
+        "hang_rate": 0.0,           # 注入挂起（长时间无响应）的概率
+        "hang_seconds": 120,        # 挂起时长（秒）
+        "seed": None,               # 随机种子（固定后可复现）
+    },
+}
+
+# 预热调度配置（交易所公布持仓排名后提前完成当日分析）
+PREWARM_CONFIG = {
+    "run_times": ["16:30", "17:30"],  # 每个交易日的预热时间（结算前的运行只预热数据缓存，分析结果在结算后才缓存）
+    "results_dir": "analysis",        # 分析结果目录（位于缓存目录下）
+    "data_dir": "data",               # 预热使用的持仓数据目录
+    "check_interval": 60,             # 调度循环的最长休眠时间（秒）
+}
+
 # 交易所配置
 EXCHANGE_CONFIG = {
     "大商所": {
@@ -80,6 +240,13 @@ STRATEGY_CONFIG = {
     }
 }
 
+# 多日期并行分析配置（进程池）
+PARALLEL_ANALYSIS_CONFIG = {
+    "max_workers": None,            # 工作进程数（None为CPU核数）
+    "start_method": "spawn",        # 进程启动方式（spawn不继承父进程的线程和锁，各平台行为一致）
+    "tasks_per_worker": 2,          # 每个工作进程排队的交易日数（限制主进程已读取未分析的数据量）
+}
+
 # 显示配置
 DISPLAY_CONFIG = {
     "max_signals_per_strategy": 10,  # 每个策略最大显示信号数
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+期货持仓分析系统 - 调用期限模块
+线程安全的超时控制：可在任意线程或线程池中使用，支持单次调用期限和批次总预算，
+并记录超过期限的调用。替代只能在主线程使用、且全进程共享的SIGALRM。
+作者：7haoge
+邮箱：953534947@qq.com
+"""
+
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from dataclasses import dataclass, field
+from typing import Any, Callable, Deque, List, Optional
+
+from config import FETCH_CONFIG
+
+
+class DeadlineExceeded(TimeoutError):
+    """调用超过期限"""
+
+
+@dataclass
+class ExpiredCall:
+    """超过期限的调用记录"""
+    name: str
+    timeout: float
+    elapsed: float
+    budget: Optional[str] = None
+    expired_at: float = field(default_factory=time.time)
+
+
+# 进程内最近超过期限的调用（供诊断展示）
+_recent_expired: Deque[ExpiredCall] = deque(maxlen=200)
+_recent_lock = threading.Lock()
+
+
+def _call_name(func: Callable) -> str:
+    """调用名称（用于记录）"""
+    return getattr(func, '__name__', repr(func))
+
+
+class DeadlineBudget:
+    """
+    批次期限预算
+    同一批次内的调用共享总时间预算，每次调用的期限取 单次期限 与 剩余预算 的较小值；
+    批次内超过期限的调用记录在expired_calls中。
+    """
+
+    def __init__(self, total: float, name: str = ""):
+        """
+        初始化预算
+
+        :param total: 批次总预算（秒）
+        :param name: 批次名称（如交易所名称）
+        """
+        self.total = total
+        self.name = name
+        self.start_time = time.monotonic()
+        self.expired_calls: List[ExpiredCall] = []
+        self._lock = threading.Lock()
+
+    def remaining(self) -> float:
+        """剩余预算（秒）"""
+        return max(0.0, self.total - (time.monotonic() - self.start_time))
+
+    def exhausted(self) -> bool:
+        """预算是否已用完"""
+        return self.remaining() <= 0
+
+    def record(self, call: ExpiredCall):
+        """记录超过期限的调用"""
+        with self._lock:
+            self.expired_calls.append(call)
+
+    def call(self, func: Callable, *args, timeout: float = None, **kwargs) -> Any:
+        """在本预算内执行调用"""
+        return call_with_deadline(func, *args, timeout=timeout, budget=self, **kwargs)
+
+
+def call_with_deadline(func: Callable, *args, timeout: float = None,
+                       budget: DeadlineBudget = None, name: str = None, **kwargs) -> Any:
+    """
+    在期限内执行阻塞调用
+
+    调用在独立的守护线程中执行，调用方最多等待期限长度；超过期限时抛出DeadlineExceeded，
+    仍在执行的线程被放弃（结束后结果丢弃），不影响其他线程中的调用。
+
+    :param func: 被调用函数
+    :param timeout: 单次调用期限（秒，默认读取FETCH_CONFIG）
+    :param budget: 所属批次预算
+    :param name: 调用名称（默认取函数名）
+    :return: 函数返回值
+    """
+    timeout = timeout or FETCH_CONFIG["call_timeout"]
+    if budget is not None:
+        timeout = min(timeout, budget.remaining())
+    name = name or _call_name(func)
+
+    if timeout <= 0:
+        _record_expired(ExpiredCall(name, 0.0, 0.0, budget.name if budget else None), budget)
+        raise DeadlineExceeded(f"{name} 批次预算已用完")
+
+    future: Future = Future()
+
+    def runner():
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            future.set_result(func(*args, **kwargs))
+        except BaseException as e:
+            future.set_exception(e)
+
+    start_time = time.monotonic()
+    threading.Thread(target=runner, name=f"deadline-{name}", daemon=True).start()
+
+    try:
+        return future.result(timeout=timeout)
+    except FutureTimeoutError:
+        if future.done():
+            # 函数自身抛出的TimeoutError
+            raise
+        elapsed = time.monotonic() - start_time
+        _record_expired(ExpiredCall(name, timeout, elapsed, budget.name if budget else None), budget)
+        raise DeadlineExceeded(f"{name} 超过期限({timeout:.0f}秒)")
+
+
+def _record_expired(call: ExpiredCall, budget: Optional[DeadlineBudget]):
+    """记录超过期限的调用"""
+    if budget is not None:
+        budget.record(call)
+    with _recent_lock:
+        _recent_expired.append(call)
+
+
+def get_recent_expired_calls() -> List[ExpiredCall]:
+    """获取进程内最近超过期限的调用"""
+    with _recent_lock:
+        return list(_recent_expired)
+
+
+__all__ = [
+    'DeadlineBudget',
+    'DeadlineExceeded',
+    'ExpiredCall',
+    'call_with_deadline',
+    'get_recent_expired_calls'
+]
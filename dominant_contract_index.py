@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+期货持仓分析系统 - 主力合约索引模块
+每个交易日的基差数据一次向量化处理为 品种 -> 主力合约 映射，持久化后按O(1)查询；
+支持按日期区间批量构建，多日任务在发起持仓请求前即可确定全部主力合约。
+作者：7haoge
+邮箱：953534947@qq.com
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+from config import FETCH_CONFIG
+from response_cache import ResponseCache, fetch_spot_price
+from utils import get_trading_dates
+
+# 基差数据中可能的品种列名与主力合约列名（按优先级）
+SYMBOL_COLUMNS = ['var', 'symbol']
+CONTRACT_COLUMNS = ['dominant_contract', '主力合约', 'main_contract']
+
+
+def fix_contract_codes(contracts: pd.Series) -> pd.Series:
+    """
+    批量修复合约代码格式：数字部分只有3位时在前面补2（如 RB501 -> RB2501）
+
+    :param contracts: 合约代码序列
+    :return: 修复后的合约代码序列
+    """
+    parts = contracts.str.upper().str.extract(r'^([A-Za-z]+)(\d+)')
+    short = parts[1].str.len() == 3
+    return contracts.where(~short, parts[0] + '2' + parts[1])
+
+
+def build_dominant_contracts(basis_df: pd.DataFrame) -> Dict[str, str]:
+    """
+    从基差数据向量化构建 品种 -> 主力合约 映射
+
+    :param basis_df: futures_spot_price返回的基差数据
+    :return: 品种 -> 主力合约
+    """
+    if basis_df is None or basis_df.empty:
+        return {}
+
+    symbol_col = next((col for col in SYMBOL_COLUMNS if col in basis_df.columns), None)
+    contract_cols = [col for col in CONTRACT_COLUMNS if col in basis_df.columns]
+    if symbol_col is None or not contract_cols:
+        return {}
+
+    # 每个品种取第一行，依次取第一个有效的主力合约列
+    df = basis_df.drop_duplicates(subset=symbol_col, keep='first')
+    contracts = pd.Series(pd.NA, index=df.index, dtype=object)
+    for col in contract_cols:
+        values = df[col].astype(str).str.strip()
+        valid = (values != '') & (values != 'nan') & contracts.isna()
+        contracts = contracts.where(~valid, values)
+
+    found = contracts.notna()
+    fixed = fix_contract_codes(contracts[found].astype(str))
+    return dict(zip(df.loc[found, symbol_col].astype(str), fixed))
+
+
+class DominantContractIndex:
+    """
+    交易日 -> 品种 -> 主力合约 索引
+    - 进程内按日期缓存映射，查询为两次字典查找
+    - 已结算交易日的映射持久化到磁盘，跨进程共享；未结算的当日映射每次由基差缓存重建
+    """
+
+    def __init__(self, cache_dir: str = None):
+        """
+        初始化索引
+
+        :param cache_dir: 缓存根目录（默认读取CACHE_CONFIG）
+        """
+        self._store = ResponseCache("dominant_contracts", cache_dir=cache_dir)
+        self._index: Dict[str, Dict[str, str]] = {}
+        self._lock = threading.Lock()
+
+    def get_contracts(self, date_str: str) -> Dict[str, str]:
+        """
+        获取指定交易日的 品种 -> 主力合约 映射（按需构建）
+
+        :param date_str: 交易日期 YYYYMMDD
+        :return: 品种 -> 主力合约，基差数据不可用时为空字典
+        """
+        with self._lock:
+            contracts = self._index.get(date_str)
+        if contracts is not None:
+            return contracts
+
+        stored = self._store.get(date_str)
+        if stored is not None:
+            contracts = dict(zip(stored['symbol'], stored['contract']))
+        else:
+            contracts = build_dominant_contracts(fetch_spot_price(date_str))
+            if contracts and self._store.is_settled(date_str):
+                self._store.put(
+                    pd.DataFrame({'symbol': list(contracts), 'contract': list(contracts.values())}),
+                    date_str
+                )
+
+        # 只在进程内保留不会再变化的映射
+        if contracts and self._store.is_settled(date_str):
+            with self._lock:
+                self._index[date_str] = contracts
+        return contracts
+
+    def lookup(self, symbol: str, date_str: str) -> Optional[str]:
+        """
+        查询品种在指定交易日的主力合约
+
+        :param symbol: 品种代码
+        :param date_str: 交易日期 YYYYMMDD
+        :return: 主力合约代码，未知时返回None
+        """
+        return self.get_contracts(date_str).get(symbol)
+
+    def build_range(self, start_date: str, end_date: str,
+                    max_workers: int = None) -> Dict[str, Dict[str, str]]:
+        """
+        批量构建日期区间内所有交易日的映射（基差数据并发获取，经共享限速器）
+
+        :param start_date: 开始日期 YYYYMMDD
+        :param end_date: 结束日期 YYYYMMDD
+        :param max_workers: 并发数（默认读取FETCH_CONFIG）
+        :return: 交易日 -> 品种 -> 主力合约（无基差数据的日期为空字典）
+        """
+        dates: List[str] = get_trading_dates(start_date, end_date)
+        if not dates:
+            return {}
+
+        workers = max(1, min(max_workers or FETCH_CONFIG["max_workers"], len(dates)))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return dict(zip(dates, executor.map(self.get_contracts, dates)))
+
+
+_contract_index: Optional[DominantContractIndex] = None
+_contract_index_lock = threading.Lock()
+
+
+def get_contract_index() -> DominantContractIndex:
+    """获取进程级共享主力合约索引"""
+    global _contract_index
+    with _contract_index_lock:
+        if _contract_index is None:
+            _contract_index = DominantContractIndex()
+        return _contract_index
+
+
+__all__ = [
+    'DominantContractIndex',
+    'build_dominant_contracts',
+    'fix_contract_codes',
+    'get_contract_index'
+]
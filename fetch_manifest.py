@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+期货持仓分析系统 - 获取清单模块
+记录一次获取任务中每个 交易所/品种/持仓类型 的状态（pending/done/failed）。
+中断后重新获取同一交易日时，已完成的条目直接读取响应缓存，只请求缺失或失败的部分。
+作者：7haoge
+邮箱：953534947@qq.com
+"""
+
+import json
+import os
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Set, Tuple
+
+from config import CACHE_CONFIG
+
+PENDING = "pending"
+DONE = "done"
+FAILED = "failed"
+
+
+class FetchManifest:
+    """
+    单个交易日的获取清单
+    结构：交易所 -> 品种 -> {"contract": 主力合约, 持仓类型: 状态}
+    每次状态变化都原子写入磁盘；某交易所全部完成后其条目被移除，清单为空时删除文件。
+    同一进程内各交易所应共用get_fetch_manifest返回的实例；写入前重新读取文件，
+    本实例未改动的交易所保留文件中的条目（其他进程的进度不被覆盖）。
+    """
+
+    def __init__(self, trade_date: str, manifest_dir: str = None):
+        """
+        加载（或新建）交易日的获取清单
+
+        Args:
+            trade_date: 交易日期 YYYYMMDD
+            manifest_dir: 清单目录（默认为缓存目录下的manifests）
+        """
+        self.trade_date = trade_date
+        self.path = Path(manifest_dir or os.path.join(CACHE_CONFIG["cache_dir"], "manifests")) / f"{trade_date}.json"
+        self._lock = threading.Lock()
+        self._touched: Set[str] = set()  # 本实例改动过、尚未完成的交易所
+        self.entries: Dict[str, Dict[str, Dict[str, str]]] = self._read()
+
+    def _read(self) -> Dict[str, Dict[str, Dict[str, str]]]:
+        """读取磁盘上的清单条目"""
+        if not self.path.exists():
+            return {}
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f).get("entries", {})
+        except Exception as e:
+            print(f"  ⚠️ 获取清单读取失败，重新开始: {str(e)[:50]}")
+            return {}
+
+    @property
+    def resumed(self) -> bool:
+        """是否继续了之前未完成的获取"""
+        return bool(self.entries)
+
+    def prepare(self, exchange_name: str, symbol: str, contract: str, position_types: List[str]):
+        """登记品种的待获取条目（主力合约变化时重置该品种的状态）"""
+        with self._lock:
+            symbols = self.entries.setdefault(exchange_name, {})
+            entry = symbols.get(symbol)
+            if entry is None or entry.get("contract") != contract:
+                entry = {"contract": contract}
+                symbols[symbol] = entry
+            for position_type in position_types:
+                entry.setdefault(position_type, PENDING)
+            self._touched.add(exchange_name)
+            self._save()
+
+    def status(self, exchange_name: str, symbol: str, position_type: str) -> str:
+        """条目状态"""
+        with self._lock:
+            entry = self.entries.get(exchange_name, {}).get(symbol, {})
+            return entry.get(position_type, PENDING)
+
+    def mark(self, exchange_name: str, symbol: str, position_type: str, status: str):
+        """更新条目状态并写入磁盘"""
+        with self._lock:
+            entry = self.entries.setdefault(exchange_name, {}).setdefault(symbol, {})
+            entry[position_type] = status
+            self._touched.add(exchange_name)
+            self._save()
+
+    def missing(self, exchange_name: str = None) -> List[Tuple[str, str, str]]:
+        """尚未完成的条目 (交易所, 品种, 持仓类型)"""
+        with self._lock:
+            return [
+                (name, symbol, position_type)
+                for name, symbols in self.entries.items()
+                if exchange_name is None or name == exchange_name
+                for symbol, entry in symbols.items()
+                for position_type, status in entry.items()
+                if position_type != "contract" and status != DONE
+            ]
+
+    def summary(self, exchange_name: str) -> Dict[str, int]:
+        """交易所各状态的条目数"""
+        counts = {PENDING: 0, DONE: 0, FAILED: 0}
+        with self._lock:
+            for entry in self.entries.get(exchange_name, {}).values():
+                for position_type, status in entry.items():
+                    if position_type != "contract":
+                        counts[status] = counts.get(status, 0) + 1
+        return counts
+
+    def finish(self, exchange_name: str):
+        """交易所全部完成时移除其条目，下次获取按正常缓存规则重新开始"""
+        if self.missing(exchange_name):
+            return
+        with self._lock:
+            self.entries.pop(exchange_name, None)
+            self._touched.add(exchange_name)
+            self._save()
+            self._touched.discard(exchange_name)
+
+    def discard(self, exchange_name: str):
+        """移除交易所的条目（数据已由其他数据源完整获取，无需续传）"""
+        with self._lock:
+            self.entries.pop(exchange_name, None)
+            self._touched.add(exchange_name)
+            self._save()
+            self._touched.discard(exchange_name)
+
+    def _save(self):
+        """重新读取并合并磁盘上的清单后原子写入（调用方持有锁）"""
+        with _file_lock:
+            try:
+                merged = {name: symbols for name, symbols in self._read().items() if name not in self._touched}
+                merged.update({name: self.entries[name] for name in self._touched if name in self.entries})
+                self.entries = merged
+
+                if not self.entries:
+                    if self.path.exists():
+                        self.path.unlink()
+                    return
+
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                tmp_path = self.path.with_name(f"{self.path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump({
+                        "trade_date": self.trade_date,
+                        "updated_at": datetime.now().isoformat(timespec='seconds'),
+                        "entries": self.entries,
+                    }, f, ensure_ascii=False)
+                os.replace(tmp_path, self.path)
+            except Exception as e:
+                print(f"  ⚠️ 获取清单保存失败: {str(e)[:50]}")
+
+
+# 进程内所有清单文件的读-合并-写互斥；每个交易日一个共享实例
+_file_lock = threading.Lock()
+_manifests: Dict[Path, FetchManifest] = {}
+_manifests_lock = threading.Lock()
+
+
+def get_fetch_manifest(trade_date: str, manifest_dir: str = None) -> FetchManifest:
+    """
+    获取交易日的进程级共享获取清单（各交易所并发获取时共用同一实例）
+
+    Args:
+        trade_date: 交易日期 YYYYMMDD
+        manifest_dir: 清单目录（默认为缓存目录下的manifests）
+    """
+    path = Path(manifest_dir or os.path.join(CACHE_CONFIG["cache_dir"], "manifests")) / f"{trade_date}.json"
+    with _manifests_lock:
+        manifest = _manifests.get(path)
+        if manifest is None:
+            manifest = FetchManifest(trade_date, manifest_dir)
+            _manifests[path] = manifest
+        return manifest
+
+
+__all__ = [
+    'FetchManifest',
+    'get_fetch_manifest',
+    'PENDING',
+    'DONE',
+    'FAILED'
+]
@@ -18,6 +18,16 @@ import time
 from typing import Dict, List, Tuple, Optional, Any
 import re
 
+from rate_limiter import rate_limited_call
+from parallel_fetch import get_exchange_deadline, run_exchanges_concurrently
+from async_position_fetcher import record_position_timeout
+from response_cache import fetch_futures_daily
+from retry_policy import RetryBudget
+from position_schema import is_canonical, parse_numeric
+from position_store import POSITIONS, LazyPositionData, get_position_lake, save_positions
+from strategy_kernels import (PositionBatch, RETAIL_COLUMNS, SPIDER_WEB_COLUMNS, position_totals,
+                              require_result, retail_seat_stats, spider_web_msd)
+
 warnings.filterwarnings('ignore')
 
 class FuturesDataManager:
@@ -84,77 +94,75 @@ class FuturesDataManager:
         if not os.path.exists(self.data_dir):
             os.makedirs(self.data_dir)
     
+    @property
+    def lake(self):
+        """按日期分区的数据湖"""
+        return get_position_lake()
+    
     def fetch_position_data(self, trade_date: str, progress_callback=None) -> bool:
         """
         获取持仓数据（支持新浪获取器和传统方法）
+        各交易所并发获取（各自有期限），按完成顺序保存并回报进度
         :param trade_date: 交易日期 YYYYMMDD
         :param progress_callback: 进度回调函数
         :return: 是否成功
         """
         success_count = 0
+        completed_count = 0
         total_exchanges = len(self.exchange_config)
         
         # 优先使用新浪获取器
-        if self.use_sina_fetcher and self.sina_fetcher:
-            print("\n" + "="*60)
-            print("使用新浪期货持仓数据获取器")
-            print("="*60)
-            
-            for i, (exchange_name, config) in enumerate(self.exchange_config.items()):
-                try:
-                    if progress_callback:
-                        progress_callback(f"正在获取{exchange_name}数据（新浪API）...", (i + 1) / total_exchanges * 0.6)
-                    
-                    # 使用新浪获取器
-                    data_dict = self.sina_fetcher.fetch_exchange_data(exchange_name, trade_date)
-                    
-                    if data_dict:
-                        # 保存到Excel
-                        self.sina_fetcher.save_to_excel(data_dict, config['filename'])
-                        success_count += 1
-                    else:
-                        print(f"⚠️ {exchange_name}数据获取失败，跳过")
-                        
-                except Exception as e:
-                    print(f"❌ 获取{exchange_name}数据失败: {str(e)}")
+        use_sina = self.use_sina_fetcher and self.sina_fetcher
+        
+        print("\n" + "="*60)
+        print("使用新浪期货持仓数据获取器" if use_sina else "使用传统方法获取持仓数据")
+        print("="*60)
+        
+        tasks = {}
+        budget = RetryBudget()  # 各交易所共享本次运行的重试预算
+        for exchange_name, config in self.exchange_config.items():
+            if use_sina:
+                tasks[exchange_name] = (
+                    lambda name=exchange_name: self.sina_fetcher.fetch_exchange_data(name, trade_date, budget)
+                )
+            else:
+                # 动态获取API函数
+                func_name = config.get("func_name")
+                if not hasattr(ak, func_name):
+                    print(f"⚠️ {exchange_name}: API {func_name} 不存在，跳过")
                     continue
+                
+                tasks[exchange_name] = (
+                    lambda func=getattr(ak, func_name): rate_limited_call(func, date=trade_date)
+                )
         
-        # 如果新浪获取器未启用或失败，使用传统方法
-        else:
-            print("\n" + "="*60)
-            print("使用传统方法获取持仓数据")
-            print("="*60)
+        deadlines = {name: get_exchange_deadline("position", name) for name in tasks}
+        source_label = "（新浪API）" if use_sina else ""
+        
+        for exchange_name, data_dict, error in run_exchanges_concurrently(tasks, deadlines):
+            completed_count += 1
+            config = self.exchange_config[exchange_name]
             
-            for i, (exchange_name, config) in enumerate(self.exchange_config.items()):
+            if use_sina and isinstance(error, TimeoutError):
+                record_position_timeout(exchange_name, error)  # 新浪数据源超过期限计入熔断
+            
+            if error is not None:
+                print(f"❌ 获取{exchange_name}数据失败: {str(error)}")
+            elif data_dict:
                 try:
-                    if progress_callback:
-                        progress_callback(f"正在获取{exchange_name}数据...", (i + 1) / total_exchanges * 0.6)
-                    
-                    # 动态获取API函数
-                    func_name = config.get("func_name")
-                    if not hasattr(ak, func_name):
-                        print(f"⚠️ {exchange_name}: API {func_name} 不存在，跳过")
-                        continue
-                    
-                    func = getattr(ak, func_name)
-                    
-                    # 获取数据
-                    data_dict = func(date=trade_date)
-                    
-                    if data_dict:
-                        # 保存到Excel
-                        save_path = os.path.join(self.data_dir, config['filename'])
-                        with pd.ExcelWriter(save_path, engine='openpyxl') as writer:
-                            for sheet_name, df in data_dict.items():
-                                # 清理sheet名称
-                                clean_name = sheet_name[:31].replace("/", "-").replace("*", "")
-                                df.to_excel(writer, sheet_name=clean_name, index=False)
-                        
-                        success_count += 1
-                        
+                    if use_sina:
+                        self.sina_fetcher.save_to_excel(data_dict, config['filename'], trade_date, exchange_name)
+                    else:
+                        save_positions(data_dict, self.data_dir, config['filename'],
+                                       trade_date=trade_date, exchange_name=exchange_name)
+                    success_count += 1
                 except Exception as e:
-                    print(f"获取{exchange_name}数据失败: {str(e)}")
-                    continue
+                    print(f"❌ 保存{exchange_name}数据失败: {str(e)}")
+            else:
+                print(f"⚠️ {exchange_name}数据获取失败，跳过")
+            
+            if progress_callback:
+                progress_callback(f"已完成{exchange_name}数据获取{source_label}", completed_count / total_exchanges * 0.6)
         
         if progress_callback:
             progress_callback("持仓数据获取完成", 0.6)
@@ -168,95 +176,57 @@ class FuturesDataManager:
     def fetch_price_data(self, trade_date: str, progress_callback=None) -> pd.DataFrame:
         """
         获取期货行情数据，包含智能自动跳过功能
+        各交易所并发获取，超过期限（广期所更短）的交易所自动跳过
         :param trade_date: 交易日期 YYYYMMDD
         :param progress_callback: 进度回调函数
         :return: 合并后的价格数据
         """
+        # 数据湖中已有该日结算后的行情时直接读取
+        if self.lake.has_prices(trade_date):
+            print(f"✅ 使用已存储的 {trade_date} 行情数据")
+            if progress_callback:
+                progress_callback("行情数据获取完成（已存储）", 0.8)
+            return self.lake.read_prices(trade_date)
+        
         all_data = []
         success_count = 0
+        completed_count = 0
+        total_exchanges = len(self.price_exchanges)
+        start_time = time.time()
         
-        # 使用所有配置的交易所，包含增强的超时处理
-        for i, exchange in enumerate(self.price_exchanges):
-            try:
-                if progress_callback:
-                    progress_callback(f"正在获取{exchange['name']}行情数据...", 0.6 + (i / len(self.price_exchanges)) * 0.2)
-                
-                # 记录开始时间
-                start_time = time.time()
-                
-                # 对广期所使用增强的超时控制
-                if exchange['name'] == '广期所':
-                    print("⚠️ 广期所行情数据获取中，如遇问题将自动跳过...")
-                    
-                    try:
-                        # 使用线程和严格超时控制
-                        import threading
-                        import queue
-                        
-                        result_queue = queue.Queue()
-                        
-                        def fetch_gfex_data():
-                            try:
-                                result = ak.get_futures_daily(
-                                    start_date=trade_date, 
-                                    end_date=trade_date, 
-                                    market=exchange["market"]
-                                )
-                                result_queue.put(('success', result))
-                            except Exception as e:
-                                result_queue.put(('error', str(e)))
-                        
-                        # 启动获取线程
-                        fetch_thread = threading.Thread(target=fetch_gfex_data)
-                        fetch_thread.daemon = True
-                        fetch_thread.start()
-                        
-                        # 等待结果，最多等待15秒
-                        fetch_thread.join(timeout=15)
-                        
-                        if fetch_thread.is_alive():
-                            # 超时了，自动跳过
-                            print("⚠️ 广期所行情数据获取超时(15秒)，自动跳过")
-                            continue
-                        
-                        # 获取结果
-                        try:
-                            status, df = result_queue.get_nowait()
-                            if status == 'error':
-                                raise Exception(df)
-                        except queue.Empty:
-                            print("⚠️ 广期所行情数据获取无响应，自动跳过")
-                            continue
-                            
-                    except Exception as e:
-                        print(f"⚠️ 广期所行情数据获取失败，自动跳过: {str(e)}")
-                        continue
-                else:
-                    # 其他交易所使用标准获取方式
-                    df = ak.get_futures_daily(start_date=trade_date, end_date=trade_date, market=exchange["market"])
-                
-                end_time = time.time()
-                elapsed_time = end_time - start_time
-                
-                if df is not None and not df.empty:
-                    df['exchange'] = exchange["name"]
-                    all_data.append(df)
-                    print(f"✅ {exchange['name']} 行情数据获取成功 (耗时: {elapsed_time:.1f}秒)")
-                    success_count += 1
-                else:
-                    print(f"⚠️ {exchange['name']} 行情数据为空，跳过")
-                    
-            except Exception as e:
-                error_msg = str(e)
-                elapsed_time = time.time() - start_time if 'start_time' in locals() else 0
-                print(f"获取{exchange['name']}行情数据失败，跳过: {error_msg}")
-                continue
+        tasks = {
+            exchange['name']: (
+                lambda market=exchange['market']: fetch_futures_daily(market, trade_date, trade_date)
+            )
+            for exchange in self.price_exchanges
+        }
+        deadlines = {name: get_exchange_deadline("price", name) for name in tasks}
+        
+        for exchange_name, df, error in run_exchanges_concurrently(tasks, deadlines):
+            completed_count += 1
+            elapsed_time = time.time() - start_time
+            
+            if error is not None:
+                print(f"⚠️ {exchange_name} 行情数据获取失败，自动跳过: {str(error)}")
+            elif df is not None and not df.empty:
+                try:
+                    self.lake.write_prices(trade_date, exchange_name, df)
+                except Exception as e:
+                    print(f"⚠️ {exchange_name} 行情数据存储失败: {str(e)}")
+                df['exchange'] = exchange_name
+                all_data.append(df)
+                print(f"✅ {exchange_name} 行情数据获取成功 (耗时: {elapsed_time:.1f}秒)")
+                success_count += 1
+            else:
+                print(f"⚠️ {exchange_name} 行情数据为空，跳过")
+            
+            if progress_callback:
+                progress_callback(f"已完成{exchange_name}行情数据获取", 0.6 + completed_count / total_exchanges * 0.2)
         
         if progress_callback:
             progress_callback("行情数据获取完成", 0.8)
         
         # 显示获取结果统计
-        total_exchanges = len(self.price_exchanges)
         if success_count >= 3:
             print(f"✅ 成功获取 {success_count}/{total_exchanges} 个交易所行情数据")
         elif success_count > 0:
@@ -266,21 +236,82 @@ class FuturesDataManager:
         
         return pd.concat(all_data, ignore_index=True) if all_data else pd.DataFrame()
     
-    def load_position_data(self) -> Dict[str, pd.DataFrame]:
-        """加载已保存的持仓数据"""
-        all_data = {}
+    def fetch_price_range(self, start_date: str, end_date: str) -> Dict[str, pd.DataFrame]:
+        """
+        获取日期区间内的期货行情数据（区间模式）
+        每个交易所只发起一次区间请求，结果按交易日拆分并逐日缓存
+        :param start_date: 开始日期 YYYYMMDD
+        :param end_date: 结束日期 YYYYMMDD
+        :return: 交易日 -> 当日各交易所合并后的行情数据
+        """
+        tasks = {
+            exchange['name']: (
+                lambda market=exchange['market']: fetch_futures_daily(market, start_date, end_date)
+            )
+            for exchange in self.price_exchanges
+        }
         
+        frames = []
+        for exchange_name, df, error in run_exchanges_concurrently(tasks):
+            if error is not None:
+                print(f"⚠️ {exchange_name} 区间行情数据获取失败，跳过: {str(error)}")
+            elif df is not None and not df.empty:
+                df['exchange'] = exchange_name
+                frames.append(df)
+                print(f"✅ {exchange_name} 区间行情数据获取成功 ({len(df)} 条)")
+        
+        if not frames:
+            return {}
+        
+        all_data = pd.concat(frames, ignore_index=True)
+        day_keys = all_data['date'].astype(str).str.replace('-', '').str[:8]
+        return {date_str: day_df.reset_index(drop=True) for date_str, day_df in all_data.groupby(day_keys)}
+    
+    def has_stored_positions(self, trade_date: str) -> bool:
+        """数据湖中是否已有该日结算后的持仓数据（历史分析无需重新获取）"""
+        return self.lake.has_positions(trade_date)
+    
+    def incomplete_positions(self, trade_date: str, since: float = None) -> List[str]:
+        """
+        数据湖中该日不可用的持仓分区：结算前写入且不是本次获取写入的（如结算前的预热数据）
+        :param trade_date: 交易日期 YYYYMMDD
+        :param since: 本次获取开始的时间戳
+        :return: 交易所列表
+        """
+        usable = set(self.lake.stored_exchanges(POSITIONS, trade_date, since=since))
+        stored = set(self.lake.stored_exchanges(POSITIONS, trade_date, final_only=False))
+        return [exchange_name for exchange_name in self.exchange_config
+                if exchange_name in stored and exchange_name not in usable]
+    
+    def load_position_data(self, trade_date: str = None, since: float = None) -> LazyPositionData:
+        """
+        加载已保存的持仓数据（按需加载：只读取文件索引，合约首次访问时才读取其数据）
+        :param trade_date: 交易日期，给出且数据湖中有该日可用数据时按日期读取（不受其他日期的获取影响）
+        :param since: 本次获取开始的时间戳；数据湖中只读取结算后写入及此后写入的分区，
+                      其余结算前写入的分区视为不完整并跳过
+        :return: 交易所_合约 -> 持仓数据
+        """
+        if trade_date:
+            usable = set(self.lake.stored_exchanges(POSITIONS, trade_date, since=since))
+            incomplete = self.incomplete_positions(trade_date, since)
+            if incomplete:
+                print(f"⚠️ {trade_date} {'、'.join(incomplete)} 的持仓数据在结算前写入且本次未重新获取，可能不完整，已跳过")
+            
+            all_data = LazyPositionData()
+            for exchange_name in self.exchange_config:
+                if exchange_name in usable:
+                    all_data.add_store(exchange_name, self.lake.partition_path(POSITIONS, trade_date, exchange_name))
+            if all_data:
+                return all_data
+        
+        all_data = LazyPositionData()
         for exchange_name, config in self.exchange_config.items():
-            file_path = os.path.join(self.data_dir, config['filename'])
-            if os.path.exists(file_path):
-                try:
-                    data_dict = pd.read_excel(file_path, sheet_name=None)
-                    for sheet_name, df in data_dict.items():
-                        contract_key = f"{exchange_name}_{sheet_name}"
-                        all_data[contract_key] = df
-                except Exception as e:
-                    print(f"读取{exchange_name}数据失败: {str(e)}")
-                    continue
+            try:
+                # 优先读取Parquet存储，兼容旧的Excel文件
+                all_data.add_positions(exchange_name, self.data_dir, config['filename'])
+            except Exception as e:
+                print(f"读取{exchange_name}数据失败: {str(e)}")
+                continue
         
         return all_data
 
@@ -306,24 +337,10 @@ class StrategyAnalyzer:
         :return: 处理后的数据字典
         """
         try:
-            # 自动适配不同交易所的列名
-            df = self._standardize_columns(df)
-            
-            required_columns = ['long_party_name', 'long_open_interest', 'long_open_interest_chg',
-                              'short_party_name', 'short_open_interest', 'short_open_interest_chg', 'vol']
-            
-            if not all(col in df.columns for col in required_columns):
+            df = self._prepare_position_frame(df)
+            if df is None:
                 return None
             
-            # 数据类型转换 - 处理所有数据，不限制前20名
-            df = df.copy()
-            numeric_columns = ['long_open_interest', 'long_open_interest_chg',
-                             'short_open_interest', 'short_open_interest_chg', 'vol']
-            
-            for col in numeric_columns:
-                df[col] = df[col].astype(str).str.replace(',', '').str.replace(' ', '').replace({'nan': None})
-                df[col] = pd.to_numeric(df[col], errors='coerce')
-            
             # 计算汇总数据
             total_long = df['long_open_interest'].sum()
             total_short = df['short_open_interest'].sum()
@@ -342,6 +359,102 @@ class StrategyAnalyzer:
             print(f"处理持仓数据失败: {str(e)}")
             return None
     
+    def _prepare_position_frame(self, df: pd.DataFrame) -> Optional[pd.DataFrame]:
+        """统一列名并确保数值列为数值类型，缺少必要列时返回None"""
+        # 自动适配不同交易所的列名
+        df = self._standardize_columns(df)
+        
+        required_columns = ['long_party_name', 'long_open_interest', 'long_open_interest_chg',
+                          'short_party_name', 'short_open_interest', 'short_open_interest_chg', 'vol']
+        
+        if not all(col in df.columns for col in required_columns):
+            return None
+        
+        # 数据类型转换 - 处理所有数据，不限制前20名（保存时已规范化的数据无需解析）
+        if not is_canonical(df):
+            df = df.copy()
+            numeric_columns = ['long_open_interest', 'long_open_interest_chg',
+                             'short_open_interest', 'short_open_interest_chg', 'vol']
+            
+            for col in numeric_columns:
+                df[col] = parse_numeric(df[col])
+        
+        return df
+    
+    def analyze_market(self, position_data: Dict[str, pd.DataFrame], progress_callback=None) -> Dict[str, Any]:
+        """
+        全市场批量分析：所有合约拼接为一张长表（PositionBatch），多空力量汇总、蜘蛛网和
+        家人席位策略在长表上分组向量化计算，结果与逐个合约分析相同
+        :param position_data: 合约 -> 原始持仓数据
+        :param progress_callback: 进度回调函数
+        :return: 合约 -> {'strategies', 'raw_data', 'summary_data'}
+        """
+        total_contracts = len(position_data)
+        progress_step = max(1, total_contracts // 20)
+        
+        frames = {}
+        for i, (contract_name, df) in enumerate(position_data.items()):
+            if progress_callback and i % progress_step == 0:
+                progress = 0.8 + (i / total_contracts) * 0.1
+                progress_callback(f"分析合约 {contract_name}...", progress)
+            
+            try:
+                df = self._prepare_position_frame(df)
+            except Exception as e:
+                print(f"处理持仓数据失败: {str(e)}")
+                continue
+            if df is not None:
+                frames[contract_name] = df
+        
+        # 一次拼接，各策略共用
+        batch = PositionBatch(frames)
+        totals = position_totals(batch)
+        processed = {name: {**totals[name], 'raw_data': df} for name, df in frames.items()}
+        spider_results = self.analyze_spider_web_batch(processed, batch)
+        retail_results = self.analyze_retail_reverse_batch(processed, batch)
+        
+        results = {}
+        for contract_name, processed_data in processed.items():
+            strategies = {}
+            
+            # 多空力量变化策略
+            signal, reason, strength = self.analyze_power_change(processed_data)
+            strategies['多空力量变化策略'] = {
+                'signal': signal,
+                'reason': reason,
+                'strength': strength
+            }
+            
+            # 蜘蛛网策略
+            signal, reason, strength = spider_results[contract_name]
+            strategies['蜘蛛网策略'] = {
+                'signal': signal,
+                'reason': reason,
+                'strength': strength
+            }
+            
+            # 家人席位反向操作策略
+            signal, reason, strength, seat_details = retail_results[contract_name]
+            strategies['家人席位反向操作策略'] = {
+                'signal': signal,
+                'reason': reason,
+                'strength': strength,
+                'seat_details': seat_details
+            }
+            
+            results[contract_name] = {
+                'strategies': strategies,
+                'raw_data': processed_data['raw_data'],
+                'summary_data': {
+                    'total_long': processed_data['total_long'],
+                    'total_short': processed_data['total_short'],
+                    'total_long_chg': processed_data['total_long_chg'],
+                    'total_short_chg': processed_data['total_short_chg']
+                }
+            }
+        
+        return results
+    
     def _standardize_columns(self, df: pd.DataFrame) -> pd.DataFrame:
         """标准化列名"""
         # 郑商所列名映射
@@ -392,136 +505,146 @@ class StrategyAnalyzer:
     def analyze_spider_web(self, data: Dict[str, Any]) -> Tuple[str, str, float]:
         """蜘蛛网策略"""
         try:
-            df = data['raw_data']
-            
-            # 找出有效席位
-            valid_seats = df[
-                (df['vol'].notna()) & (df['vol'] > 0) &
-                (df['long_open_interest'].notna()) & 
-                (df['short_open_interest'].notna())
-            ].copy()
-            
-            if len(valid_seats) < 5:
-                return "中性", "有效席位数据不足", 0
-            
-            # 计算知情度指标
-            valid_seats['stat'] = (valid_seats['long_open_interest'] + valid_seats['short_open_interest']) / valid_seats['vol']
-            
-            # 划分知情者和非知情者
-            sorted_seats = valid_seats.sort_values('stat', ascending=False)
-            cutoff_index = max(2, int(len(sorted_seats) * 0.4))
-            
-            its = sorted_seats.iloc[:cutoff_index]
-            uts = sorted_seats.iloc[cutoff_index:]
-            
-            # 计算ITS和UTS
-            its_values = []
-            uts_values = []
-            
-            for _, row in its.iterrows():
-                total_pos = row['long_open_interest'] + row['short_open_interest']
-                if total_pos > 0:
-                    its_val = (row['long_open_interest'] - row['short_open_interest']) / total_pos
-                    its_values.append(its_val)
-            
-            for _, row in uts.iterrows():
-                total_pos = row['long_open_interest'] + row['short_open_interest']
-                if total_pos > 0:
-                    uts_val = (row['long_open_interest'] - row['short_open_interest']) / total_pos
-                    uts_values.append(uts_val)
-            
-            if not its_values or not uts_values:
-                return "中性", "计算数据不足", 0
-            
-            # 计算MSD
-            msd = np.mean(its_values) - np.mean(uts_values)
-            
-            if msd > 0.05:
-                return "看多", f"MSD={msd:.4f}，知情者明显看多", abs(msd)
-            elif msd < -0.05:
-                return "看空", f"MSD={msd:.4f}，知情者明显看空", abs(msd)
-            else:
-                return "中性", f"MSD={msd:.4f}，无明显信号", abs(msd)
-                
+            return self._spider_web_signal(spider_web_msd({'contract': data['raw_data']})['contract'])
         except Exception as e:
             return "错误", f"数据处理错误：{str(e)}", 0
     
+    def analyze_spider_web_batch(self, processed: Dict[str, Dict[str, Any]],
+                                 batch: PositionBatch = None) -> Dict[str, Tuple[str, str, float]]:
+        """
+        蜘蛛网策略 - 所有合约一次向量化计算MSD
+        :param processed: 合约 -> process_position_data的结果
+        :param batch: 已拼接的长表（与processed为同一批合约）
+        :return: 合约 -> (信号, 原因, 强度)
+        """
+        try:
+            all_msd = spider_web_msd(batch if batch is not None else {name: data['raw_data'] for name, data in processed.items()})
+        except Exception as e:
+            # 个别合约数据异常时逐个分析，错误只影响该合约
+            print(f"批量计算蜘蛛网指标出错，改为逐个合约分析：{str(e)}")
+            return {name: self.analyze_spider_web(data) for name, data in processed.items()}
+        
+        results = {}
+        for name in processed:
+            try:
+                results[name] = self._spider_web_signal(all_msd[name])
+            except Exception as e:
+                results[name] = ("错误", f"数据处理错误：{str(e)}", 0)
+        return results
+    
+    def _spider_web_signal(self, result: Dict[str, Any]) -> Tuple[str, str, float]:
+        """根据MSD计算结果（spider_web_msd）判断信号"""
+        result = require_result(result, SPIDER_WEB_COLUMNS)
+        
+        from config import STRATEGY_CONFIG
+        if result['seats'] < STRATEGY_CONFIG["蜘蛛网策略"]["min_seats"]:
+            return "中性", "有效席位数据不足", 0
+        
+        msd = result['msd']
+        if np.isnan(msd):
+            return "中性", "计算数据不足", 0
+        
+        if result['signal'] == "看多":
+            return "看多", f"MSD={msd:.4f}，知情者明显看多", abs(msd)
+        elif result['signal'] == "看空":
+            return "看空", f"MSD={msd:.4f}，知情者明显看空", abs(msd)
+        else:
+            return "中性", f"MSD={msd:.4f}，无明显信号", abs(msd)
+    
     def analyze_retail_reverse(self, data: Dict[str, Any]) -> Tuple[str, str, float, List[Dict]]:
         """家人席位反向操作策略 - 按照精确逻辑实现"""
         try:
-            df = data['raw_data']
-            
-            # 统计家人席位的多空变化（合并同一席位）
-            seat_stats = {name: {'long_chg': 0, 'short_chg': 0, 'long_pos': 0, 'short_pos': 0} for name in self.retail_seats}
-            
-            for _, row in df.iterrows():
-                if row['long_party_name'] in self.retail_seats:
-                    seat_stats[row['long_party_name']]['long_chg'] += row['long_open_interest_chg'] if pd.notna(row['long_open_interest_chg']) else 0
-                    seat_stats[row['long_party_name']]['long_pos'] += row['long_open_interest'] if pd.notna(row['long_open_interest']) else 0
-                if row['short_party_name'] in self.retail_seats:
-                    seat_stats[row['short_party_name']]['short_chg'] += row['short_open_interest_chg'] if pd.notna(row['short_open_interest_chg']) else 0
-                    seat_stats[row['short_party_name']]['short_pos'] += row['short_open_interest'] if pd.notna(row['short_open_interest']) else 0
-            
-            # 只保留有持仓的席位（多单或空单有持仓）
-            active_seats = []
-            for seat, stats in seat_stats.items():
-                if stats['long_pos'] > 0 or stats['short_pos'] > 0:
-                    active_seats.append({
-                        'seat_name': seat, 
-                        'long_chg': stats['long_chg'], 
-                        'short_chg': stats['short_chg'],
-                        'long_pos': stats['long_pos'],
-                        'short_pos': stats['short_pos']
-                    })
-            
-            if not active_seats:
-                return "中性", "未发现家人席位持仓", 0, []
-            
-            # 按照新的逻辑判断信号
-            # 看多信号：所有家人席位的空单持仓量变化为正，且多单持仓量变化为负或0
-            # 看空信号：所有家人席位的多单持仓量变化为正，且空单持仓量变化为负或0
-            
-            long_signal_conditions = []  # 看多信号条件
-            short_signal_conditions = []  # 看空信号条件
-            
-            for seat in active_seats:
-                long_chg = seat['long_chg']
-                short_chg = seat['short_chg']
-                
-                # 看多信号条件：空单增加(>0) 且 多单减少或不变(<=0)
-                long_condition = short_chg > 0 and long_chg <= 0
-                long_signal_conditions.append(long_condition)
-                
-                # 看空信号条件：多单增加(>0) 且 空单减少或不变(<=0)
-                short_condition = long_chg > 0 and short_chg <= 0
-                short_signal_conditions.append(short_condition)
-            
-            # 计算持仓占比
-            total_position = df['long_open_interest'].sum() + df['short_open_interest'].sum()
-            retail_position = sum([seat['long_pos'] + seat['short_pos'] for seat in active_seats])
-            position_ratio = retail_position / total_position if total_position > 0 else 0
-            
-            # 判断信号
-            if len(active_seats) > 0 and all(long_signal_conditions):
-                # 所有家人席位都满足看多条件
-                total_short_increase = sum([seat['short_chg'] for seat in active_seats if seat['short_chg'] > 0])
-                return "看多", f"家人席位空单增加{total_short_increase:.0f}手，多单减少或不变，持仓占比{position_ratio:.2%}", position_ratio, active_seats
-            elif len(active_seats) > 0 and all(short_signal_conditions):
-                # 所有家人席位都满足看空条件
-                total_long_increase = sum([seat['long_chg'] for seat in active_seats if seat['long_chg'] > 0])
-                return "看空", f"家人席位多单增加{total_long_increase:.0f}手，空单减少或不变，持仓占比{position_ratio:.2%}", position_ratio, active_seats
-            else:
-                # 不满足条件
-                reason_parts = []
-                for seat in active_seats:
-                    if seat['long_chg'] != 0 or seat['short_chg'] != 0:
-                        reason_parts.append(f"{seat['seat_name']}(多{seat['long_chg']:+.0f},空{seat['short_chg']:+.0f})")
-                
-                reason = f"家人席位持仓变化不符合策略条件: {', '.join(reason_parts)}" if reason_parts else "家人席位无明显变化"
-                return "中性", reason, 0, active_seats
-                
+            stats = retail_seat_stats({'contract': data['raw_data']}, self.retail_seats)['contract']
+            return self._retail_reverse_signal(stats)
         except Exception as e:
             return "错误", f"数据处理错误：{str(e)}", 0, []
+    
+    def analyze_retail_reverse_batch(self, processed: Dict[str, Dict[str, Any]],
+                                     batch: PositionBatch = None) -> Dict[str, Tuple[str, str, float, List[Dict]]]:
+        """
+        家人席位反向操作策略 - 所有合约一次向量化统计
+        :param processed: 合约 -> process_position_data的结果
+        :param batch: 已拼接的长表（与processed为同一批合约）
+        :return: 合约 -> (信号, 原因, 强度, 席位详情)，与逐个调用analyze_retail_reverse的结果相同
+        """
+        try:
+            all_stats = retail_seat_stats(batch if batch is not None else {name: data['raw_data'] for name, data in processed.items()},
+                                          self.retail_seats)
+        except Exception as e:
+            # 个别合约数据异常时逐个分析，错误只影响该合约
+            print(f"批量统计家人席位出错，改为逐个合约分析：{str(e)}")
+            return {name: self.analyze_retail_reverse(data) for name, data in processed.items()}
+        
+        results = {}
+        for name, data in processed.items():
+            try:
+                results[name] = self._retail_reverse_signal(all_stats[name])
+            except Exception as e:
+                results[name] = ("错误", f"数据处理错误：{str(e)}", 0, [])
+        return results
+    
+    def _retail_reverse_signal(self, stats: Dict[str, Any]) -> Tuple[str, str, float, List[Dict]]:
+        """根据家人席位统计（retail_seat_stats）判断信号"""
+        stats = require_result(stats, RETAIL_COLUMNS)
+        seat_stats = stats['seats']
+        
+        # 只保留有持仓的席位（多单或空单有持仓）
+        active_seats = []
+        for seat, seat_item in seat_stats.items():
+            if seat_item['long_pos'] > 0 or seat_item['short_pos'] > 0:
+                active_seats.append({
+                    'seat_name': seat, 
+                    'long_chg': seat_item['long_chg'], 
+                    'short_chg': seat_item['short_chg'],
+                    'long_pos': seat_item['long_pos'],
+                    'short_pos': seat_item['short_pos']
+                })
+        
+        if not active_seats:
+            return "中性", "未发现家人席位持仓", 0, []
+        
+        # 按照新的逻辑判断信号
+        # 看多信号：所有家人席位的空单持仓量变化为正，且多单持仓量变化为负或0
+        # 看空信号：所有家人席位的多单持仓量变化为正，且空单持仓量变化为负或0
+        
+        long_signal_conditions = []  # 看多信号条件
+        short_signal_conditions = []  # 看空信号条件
+        
+        for seat in active_seats:
+            long_chg = seat['long_chg']
+            short_chg = seat['short_chg']
+            
+            # 看多信号条件：空单增加(>0) 且 多单减少或不变(<=0)
+            long_condition = short_chg > 0 and long_chg <= 0
+            long_signal_conditions.append(long_condition)
+            
+            # 看空信号条件：多单增加(>0) 且 空单减少或不变(<=0)
+            short_condition = long_chg > 0 and short_chg <= 0
+            short_signal_conditions.append(short_condition)
+        
+        # 计算持仓占比
+        total_position = stats['total_long'] + stats['total_short']
+        retail_position = sum([seat['long_pos'] + seat['short_pos'] for seat in active_seats])
+        position_ratio = retail_position / total_position if total_position > 0 else 0
+        
+        # 判断信号
+        if len(active_seats) > 0 and all(long_signal_conditions):
+            # 所有家人席位都满足看多条件
+            total_short_increase = sum([seat['short_chg'] for seat in active_seats if seat['short_chg'] > 0])
+            return "看多", f"家人席位空单增加{total_short_increase:.0f}手，多单减少或不变，持仓占比{position_ratio:.2%}", position_ratio, active_seats
+        elif len(active_seats) > 0 and all(short_signal_conditions):
+            # 所有家人席位都满足看空条件
+            total_long_increase = sum([seat['long_chg'] for seat in active_seats if seat['long_chg'] > 0])
+            return "看空", f"家人席位多单增加{total_long_increase:.0f}手，空单减少或不变，持仓占比{position_ratio:.2%}", position_ratio, active_seats
+        else:
+            # 不满足条件
+            reason_parts = []
+            for seat in active_seats:
+                if seat['long_chg'] != 0 or seat['short_chg'] != 0:
+                    reason_parts.append(f"{seat['seat_name']}(多{seat['long_chg']:+.0f},空{seat['short_chg']:+.0f})")
+            
+            reason = f"家人席位持仓变化不符合策略条件: {', '.join(reason_parts)}" if reason_parts else "家人席位无明显变化"
+            return "中性", reason, 0, active_seats
 
 class TermStructureAnalyzer:
     """期限结构分析器"""
@@ -663,7 +786,11 @@ class FuturesAnalysisEngine:
             if progress_callback:
                 progress_callback("开始获取持仓数据...", 0.1)
             
-            if not self.data_manager.fetch_position_data(trade_date, progress_callback):
+            # 历史日期已存储时直接读取，不再重新获取
+            fetch_started = time.time()
+            if self.data_manager.has_stored_positions(trade_date):
+                print(f"✅ 使用已存储的 {trade_date} 持仓数据")
+            elif not self.data_manager.fetch_position_data(trade_date, progress_callback):
                 return None
             
             # 2. 获取期货行情数据
@@ -676,7 +803,10 @@ class FuturesAnalysisEngine:
             if progress_callback:
                 progress_callback("开始分析持仓数据...", 0.8)
             
-            position_data = self.data_manager.load_position_data()
+            # 只读取结算后的数据和本次获取写入的数据，其余结算前数据记为不完整
+            position_data = self.data_manager.load_position_data(trade_date, since=fetch_started)
+            results['metadata']['incomplete_exchanges'] = self.data_manager.incomplete_positions(
+                trade_date, since=fetch_started)
             position_results = self._analyze_positions(position_data, progress_callback)
             results['position_analysis'] = position_results
             
@@ -703,61 +833,47 @@ class FuturesAnalysisEngine:
             print(f"分析过程出错: {str(e)}")
             return None
     
-    def _analyze_positions(self, position_data: Dict[str, pd.DataFrame], progress_callback=None) -> Dict[str, Any]:
-        """分析持仓数据"""
+    def analyze_seat_history(self, start_date: str, end_date: str, symbols: List[str] = None,
+                             progress_callback=None) -> Dict[str, Dict[str, Any]]:
+        """
+        用席位历史存储批量分析多个交易日的持仓（不联网，数据来自内存映射的历史段文件）
+        :param start_date: 起始日期 YYYYMMDD（含）
+        :param end_date: 结束日期 YYYYMMDD（含）
+        :param symbols: 品种代码（默认全部）
+        :param progress_callback: 进度回调函数
+        :return: 交易日期 -> 持仓分析结果（与full_analysis的position_analysis格式相同）
+        """
+        from seat_history import get_seat_history
+
+        store = get_seat_history()
+        trade_dates = store.dates(start_date, end_date)
         results = {}
-        total_contracts = len(position_data)
-        
-        for i, (contract_name, df) in enumerate(position_data.items()):
+        for i, trade_date in enumerate(trade_dates):
             if progress_callback:
-                progress = 0.8 + (i / total_contracts) * 0.1
-                progress_callback(f"分析合约 {contract_name}...", progress)
-            
-            # 处理数据
-            processed_data = self.strategy_analyzer.process_position_data(df)
-            if not processed_data:
-                continue
-            
-            # 应用各种策略
-            strategies = {}
-            
-            # 多空力量变化策略
-            signal, reason, strength = self.strategy_analyzer.analyze_power_change(processed_data)
-            strategies['多空力量变化策略'] = {
-                'signal': signal,
-                'reason': reason,
-                'strength': strength
-            }
-            
-            # 蜘蛛网策略
-            signal, reason, strength = self.strategy_analyzer.analyze_spider_web(processed_data)
-            strategies['蜘蛛网策略'] = {
-                'signal': signal,
-                'reason': reason,
-                'strength': strength
-            }
-            
-            # 家人席位反向操作策略
-            signal, reason, strength, seat_details = self.strategy_analyzer.analyze_retail_reverse(processed_data)
-            strategies['家人席位反向操作策略'] = {
-                'signal': signal,
-                'reason': reason,
-                'strength': strength,
-                'seat_details': seat_details
-            }
-            
-            results[contract_name] = {
-                'strategies': strategies,
-                'raw_data': processed_data['raw_data'],
-                'summary_data': {
-                    'total_long': processed_data['total_long'],
-                    'total_short': processed_data['total_short'],
-                    'total_long_chg': processed_data['total_long_chg'],
-                    'total_short_chg': processed_data['total_short_chg']
-                }
-            }
-        
+                progress_callback(f"分析 {trade_date}...", i / len(trade_dates))
+            results[trade_date] = self._analyze_positions(store.position_frames(trade_date, symbols))
         return results
+
+    def analyze_dates(self, start_date: str = None, end_date: str = None, max_workers: int = None,
+                      include_positions: bool = False, progress_callback=None) -> Dict[str, Any]:
+        """
+        多个交易日并行分析（数据湖中已存储的持仓，按交易日分给进程池）
+        :param start_date: 起始日期 YYYYMMDD（含）
+        :param end_date: 结束日期 YYYYMMDD（含）
+        :param max_workers: 工作进程数（默认CPU核数）
+        :param include_positions: 是否返回各合约的策略结果
+        :param progress_callback: 进度回调函数
+        :return: 合并结果（见multi_date_analysis.analyze_dates）
+        """
+        from multi_date_analysis import analyze_dates
+
+        return analyze_dates(start_date, end_date, retail_seats=self.strategy_analyzer.retail_seats,
+                             max_workers=max_workers, include_positions=include_positions,
+                             progress_callback=progress_callback, lake=self.data_manager.lake)
+
+    def _analyze_positions(self, position_data: Dict[str, pd.DataFrame], progress_callback=None) -> Dict[str, Any]:
+        """分析持仓数据（全市场合约一次批量计算）"""
+        return self.strategy_analyzer.analyze_market(position_data, progress_callback)
     
     def _generate_summary(self, results: Dict[str, Any]) -> Dict[str, Any]:
         """生成分析总结"""
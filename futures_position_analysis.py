@@ -5,6 +5,11 @@ from datetime import datetime
 import warnings
 warnings.filterwarnings('ignore')
 
+from rate_limiter import rate_limited_call
+from position_schema import is_canonical, parse_numeric
+from position_store import load_positions, save_positions
+from strategy_kernels import RETAIL_COLUMNS, SPIDER_WEB_COLUMNS, require_result, retail_seat_stats, spider_web_msd
+
 class Strategy:
     """策略基类"""
     def __init__(self, name):
@@ -13,6 +18,14 @@ class Strategy:
     def analyze(self, data):
         """分析数据并返回结果"""
         raise NotImplementedError("子类必须实现analyze方法")
+    
+    def analyze_batch(self, processed):
+        """
+        分析多个合约（可向量化的策略重写此方法一次计算所有合约）
+        :param processed: 合约 -> process_position_data的结果
+        :return: 合约 -> (信号, 原因, 强度)
+        """
+        return {name: self.analyze(data) for name, data in processed.items()}
 
 class PowerChangeStrategy(Strategy):
     """多空力量变化策略"""
@@ -43,45 +56,46 @@ class SpiderWebStrategy(Strategy):
     def analyze(self, data):
         """分析蜘蛛网指标并生成交易信号"""
         try:
-            df = data['raw_data']
-            
-            # 1. 找出同时存在于成交量、做多持仓、做空持仓的席位
-            valid_seats = df[
-                (df['vol'].notna()) &
-                (df['long_open_interest'].notna()) & 
-                (df['short_open_interest'].notna())
-            ]
-            
-            if len(valid_seats) == 0:
-                return "中性", "无有效席位数据", 0
-            
-            # 2. 计算知情度指标stat
-            valid_seats['stat'] = (valid_seats['long_open_interest'] + valid_seats['short_open_interest']) / valid_seats['vol']
-            
-            # 3. 划分知情者和非知情者
-            sorted_seats = valid_seats.sort_values('stat', ascending=False)
-            cutoff_index = int(len(sorted_seats) * 0.4)
-            its = sorted_seats.iloc[:cutoff_index]
-            uts = sorted_seats.iloc[cutoff_index:]
-            
-            # 4. 计算ITS和UTS
-            its['its'] = (its['long_open_interest'] - its['short_open_interest']) / (its['long_open_interest'] + its['short_open_interest'])
-            uts['uts'] = (uts['long_open_interest'] - uts['short_open_interest']) / (uts['long_open_interest'] + uts['short_open_interest'])
-            
-            # 5. 计算MSD
-            msd = its['its'].mean() - uts['uts'].mean()
-            
-            # 6. 生成信号
-            if msd > 0:
-                return "看多", f"MSD={msd:.4f}，知情者看多", abs(msd)
-            elif msd < 0:
-                return "看空", f"MSD={msd:.4f}，知情者看空", abs(msd)
-            else:
-                return "中性", f"MSD={msd:.4f}，无明显信号", 0
-                
+            return self._signal(self._msd({'contract': data['raw_data']})['contract'])
         except Exception as e:
             print(f"分析蜘蛛网指标时出错：{str(e)}")
             return "错误", f"数据处理错误：{str(e)}", 0
+    
+    def analyze_batch(self, processed):
+        """所有合约一次向量化计算MSD后逐个判断信号"""
+        try:
+            all_msd = self._msd({name: data['raw_data'] for name, data in processed.items()})
+        except Exception as e:
+            # 个别合约数据异常时逐个分析，错误只影响该合约
+            print(f"批量计算蜘蛛网指标出错，改为逐个合约分析：{str(e)}")
+            return super().analyze_batch(processed)
+        
+        results = {}
+        for name in processed:
+            try:
+                results[name] = self._signal(all_msd[name])
+            except Exception as e:
+                print(f"分析蜘蛛网指标时出错：{str(e)}")
+                results[name] = ("错误", f"数据处理错误：{str(e)}", 0)
+        return results
+    
+    def _msd(self, frames):
+        """计算MSD：成交量非空即为有效席位，不限席位数，MSD非零即产生信号"""
+        return spider_web_msd(frames, min_seats=1, msd_threshold=0, min_informed=0, positive_volume=False)
+    
+    def _signal(self, result):
+        """根据MSD计算结果判断信号"""
+        result = require_result(result, SPIDER_WEB_COLUMNS)
+        if result['seats'] == 0:
+            return "中性", "无有效席位数据", 0
+        
+        msd = result['msd']
+        if result['signal'] == "看多":
+            return "看多", f"MSD={msd:.4f}，知情者看多", abs(msd)
+        elif result['signal'] == "看空":
+            return "看空", f"MSD={msd:.4f}，知情者看空", abs(msd)
+        else:
+            return "中性", f"MSD={msd:.4f}，无明显信号", 0
 
 class RetailReverseStrategy(Strategy):
     """家人席位反向操作策略"""
@@ -92,56 +106,64 @@ class RetailReverseStrategy(Strategy):
     def analyze(self, data):
         """分析家人席位持仓变化并生成反向交易信号"""
         try:
-            df = data['raw_data']
-            
-            # 统计家人席位的多空变化（合并同一席位）
-            seat_stats = {name: {'long_chg': 0, 'short_chg': 0} for name in self.retail_seats}
-            for _, row in df.iterrows():
-                if row['long_party_name'] in self.retail_seats:
-                    seat_stats[row['long_party_name']]['long_chg'] += row['long_open_interest_chg'] if pd.notna(row['long_open_interest_chg']) else 0
-                if row['short_party_name'] in self.retail_seats:
-                    seat_stats[row['short_party_name']]['short_chg'] += row['short_open_interest_chg'] if pd.notna(row['short_open_interest_chg']) else 0
+            stats = retail_seat_stats({'contract': data['raw_data']}, self.retail_seats)['contract']
+            return self._signal(stats)
+        except Exception as e:
+            print(f"分析家人席位时出错：{str(e)}")
+            return "错误", f"数据处理错误：{str(e)}", 0
+    
+    def analyze_batch(self, processed):
+        """所有合约一次统计家人席位后逐个判断信号"""
+        try:
+            all_stats = retail_seat_stats({name: data['raw_data'] for name, data in processed.items()}, self.retail_seats)
+        except Exception as e:
+            # 个别合约数据异常时逐个分析，错误只影响该合约
+            print(f"批量统计家人席位出错，改为逐个合约分析：{str(e)}")
+            return super().analyze_batch(processed)
+        
+        results = {}
+        for name in processed:
+            try:
+                results[name] = self._signal(all_stats[name])
+            except Exception as e:
+                print(f"分析家人席位时出错：{str(e)}")
+                results[name] = ("错误", f"数据处理错误：{str(e)}", 0)
+        return results
+    
+    def _signal(self, stats):
+        """根据家人席位统计（retail_seat_stats）判断信号"""
+        stats = require_result(stats, RETAIL_COLUMNS)
 
-            # 只保留有变化的席位
-            seat_details = []
-            for seat, chg in seat_stats.items():
-                if chg['long_chg'] != 0 or chg['short_chg'] != 0:
-                    seat_details.append({'seat_name': seat, 'long_chg': chg['long_chg'], 'short_chg': chg['short_chg']})
+        # 只保留有变化的席位
+        seat_details = []
+        for seat, chg in stats['seats'].items():
+            if chg['long_chg'] != 0 or chg['short_chg'] != 0:
+                seat_details.append({'seat_name': seat, 'long_chg': chg['long_chg'], 'short_chg': chg['short_chg']})
 
-            if not seat_details:
-                return "中性", "未发现家人席位持仓变化", 0
+        if not seat_details:
+            return "中性", "未发现家人席位持仓变化", 0
 
-            # 判断信号 - 家人席位多单增加时看空，空单增加时看多
-            all_long_increase = all(seat['long_chg'] > 0 for seat in seat_details)
-            all_short_increase = all(seat['short_chg'] > 0 for seat in seat_details)
-            
-            # 计算家人席位持仓占比
-            retail_long_position = 0
-            retail_short_position = 0
-            
-            for _, row in df.iterrows():
-                if row['long_party_name'] in self.retail_seats:
-                    retail_long_position += row['long_open_interest'] if pd.notna(row['long_open_interest']) else 0
-                if row['short_party_name'] in self.retail_seats:
-                    retail_short_position += row['short_open_interest'] if pd.notna(row['short_open_interest']) else 0
-            
-            total_long = df['long_open_interest'].sum()
-            total_short = df['short_open_interest'].sum()
+        # 判断信号 - 家人席位多单增加时看空，空单增加时看多
+        all_long_increase = all(seat['long_chg'] > 0 for seat in seat_details)
+        all_short_increase = all(seat['short_chg'] > 0 for seat in seat_details)
+        
+        # 计算家人席位持仓占比
+        retail_long_position = sum(seat['long_pos'] for seat in stats['seats'].values())
+        retail_short_position = sum(seat['short_pos'] for seat in stats['seats'].values())
+        
+        total_long = stats['total_long']
+        total_short = stats['total_short']
 
-            if all_long_increase:
-                # 家人席位多单增加，看空
-                retail_ratio = retail_long_position / total_long if total_long > 0 else 0
-                return "看空", f"家人席位多单增加，持仓占比{retail_ratio:.2%}", retail_ratio
-            elif all_short_increase:
-                # 家人席位空单增加，看多
-                retail_ratio = retail_short_position / total_short if total_short > 0 else 0
-                return "看多", f"家人席位空单增加，持仓占比{retail_ratio:.2%}", retail_ratio
-            else:
-                return "中性", "家人席位持仓变化不符合策略要求", 0
-                
-        except Exception as e:
-            print(f"分析家人席位时出错：{str(e)}")
-            return "错误", f"数据处理错误：{str(e)}", 0
+        if all_long_increase:
+            # 家人席位多单增加，看空
+            retail_ratio = retail_long_position / total_long if total_long > 0 else 0
+            return "看空", f"家人席位多单增加，持仓占比{retail_ratio:.2%}", retail_ratio
+        elif all_short_increase:
+            # 家人席位空单增加，看多
+            retail_ratio = retail_short_position / total_short if total_short > 0 else 0
+            return "看多", f"家人席位空单增加，持仓占比{retail_ratio:.2%}", retail_ratio
+        else:
+            return "中性", "家人席位持仓变化不符合策略要求", 0
 
 class FuturesDataFetcher:
     """期货数据获取类"""
@@ -187,20 +209,19 @@ class FuturesDataFetcher:
         success = True
         for exchange_name, config in self.exchange_config.items():
             try:
-                # 获取数据
-                data_dict = config["func"](date=trade_date)
+                # 获取数据（经共享限速器）
+                data_dict = rate_limited_call(config["func"], date=trade_date)
                 
                 # 检查数据是否为空
                 if not data_dict:
                     success = False
                     continue
 
-                # 保存到Excel
-                save_path = os.path.join(self.save_dir, config['filename'])
-                with pd.ExcelWriter(save_path) as writer:
-                    for raw_sheet_name, df in data_dict.items():
-                        clean_name = config["sheet_handler"](raw_sheet_name)
-                        df.to_excel(writer, sheet_name=clean_name, index=False)
+                # 保存到持仓存储
+                save_positions(
+                    {config["sheet_handler"](raw_sheet_name): df for raw_sheet_name, df in data_dict.items()},
+                    self.save_dir, config['filename']
+                )
                 
             except Exception as e:
                 success = False
@@ -234,14 +255,9 @@ class FuturesPositionAnalyzer:
         :param exchange_name: 交易所名称
         :return: 包含所有品种数据的字典
         """
-        file_path = os.path.join(self.data_dir, self.exchanges[exchange_name])
-        if not os.path.exists(file_path):
-            return {}
-            
         try:
-            # 读取Excel文件中的所有sheet
-            data_dict = pd.read_excel(file_path, sheet_name=None)
-            return data_dict
+            # 读取交易所的所有合约（Parquet存储，兼容旧Excel文件）
+            return load_positions(self.data_dir, self.exchanges[exchange_name]) or {}
         except Exception as e:
             return {}
     
@@ -274,13 +290,13 @@ class FuturesPositionAnalyzer:
             # 只保留前20名会员的数据
             df = df.head(20)
             
-            # 确保数值列为数值类型
-            numeric_columns = ['long_open_interest', 'long_open_interest_chg',
-                             'short_open_interest', 'short_open_interest_chg',
-                             'vol']
-            for col in numeric_columns:
-                df[col] = df[col].astype(str).str.replace(',', '').str.replace(' ', '').replace({'nan': None})
-                df[col] = pd.to_numeric(df[col], errors='coerce')
+            # 确保数值列为数值类型（保存时已规范化的数据无需解析）
+            if not is_canonical(df):
+                numeric_columns = ['long_open_interest', 'long_open_interest_chg',
+                                 'short_open_interest', 'short_open_interest_chg',
+                                 'vol']
+                for col in numeric_columns:
+                    df[col] = parse_numeric(df[col])
             
             # 计算多空单总量和变化量
             total_long = df['long_open_interest'].sum()
@@ -303,7 +319,7 @@ class FuturesPositionAnalyzer:
         分析所有交易所的持仓数据
         :return: 分析结果字典
         """
-        results = {}
+        processed = {}
         
         for exchange_name in self.exchanges.keys():
             exchange_data = self.read_exchange_data(exchange_name)
@@ -314,20 +330,26 @@ class FuturesPositionAnalyzer:
             for contract_name, df in exchange_data.items():
                 processed_data = self.process_position_data(df)
                 if processed_data:
-                    # 对每个策略进行分析
-                    strategy_results = {}
-                    for strategy in self.strategies:
-                        signal, reason, strength = strategy.analyze(processed_data)
-                        strategy_results[strategy.name] = {
-                            'signal': signal,
-                            'reason': reason,
-                            'strength': strength
-                        }
-                    # 存储结果时包含原始数据
-                    results[f"{exchange_name}_{contract_name}"] = {
-                        'strategies': strategy_results,
-                        'raw_data': processed_data['raw_data']
-                    }
+                    processed[f"{exchange_name}_{contract_name}"] = processed_data
+        
+        # 对每个策略进行分析（所有合约一次计算）
+        strategy_outputs = {strategy.name: strategy.analyze_batch(processed) for strategy in self.strategies}
+        
+        results = {}
+        for contract, processed_data in processed.items():
+            strategy_results = {}
+            for strategy in self.strategies:
+                signal, reason, strength = strategy_outputs[strategy.name][contract]
+                strategy_results[strategy.name] = {
+                    'signal': signal,
+                    'reason': reason,
+                    'strength': strength
+                }
+            # 存储结果时包含原始数据
+            results[contract] = {
+                'strategies': strategy_results,
+                'raw_data': processed_data['raw_data']
+            }
         
         return results
 
@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+期货持仓分析系统 - 对冲请求模块
+同一交易所的持仓排名有多个独立数据源：主数据源（新浪持仓接口，集成获取器）超过其历史
+耗时分位数仍未返回时，并行请求备用数据源（交易所持仓排名表），采用先完成的完整结果并取消另一方。
+主数据源熔断打开时直接请求备用数据源。
+作者：7haoge
+邮箱：953534947@qq.com
+"""
+
+import asyncio
+import re
+import threading
+import time
+from collections import defaultdict, deque
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+import akshare as ak
+import numpy as np
+import pandas as pd
+
+from config import HEDGE_CONFIG
+from async_position_fetcher import AsyncPositionFetcher, get_shared_executor, record_position_timeout
+from fetch_manifest import FetchManifest
+from rate_limiter import rate_limited_call
+from retry_policy import RetryBudget
+
+PRIMARY = "primary"
+ALTERNATE = "alternate"
+
+# 数据字典键中的品种代码：主数据源为"名称(代码)"，备用数据源为合约代码（如rb2501）
+_SHEET_SYMBOL = re.compile(r"\(([A-Za-z]+)\)$")
+_CONTRACT_SYMBOL = re.compile(r"^([A-Za-z]+)")
+
+
+def covered_symbols(data: Dict[str, pd.DataFrame]) -> Set[str]:
+    """数据字典覆盖的品种代码（大写）"""
+    symbols = set()
+    for name in data or {}:
+        match = _SHEET_SYMBOL.search(str(name)) or _CONTRACT_SYMBOL.match(str(name))
+        if match:
+            symbols.add(match.group(1).upper())
+    return symbols
+
+
+def coverage_check(expected: Iterable[str]) -> Callable[[Dict[str, pd.DataFrame]], bool]:
+    """
+    按品种覆盖率判断结果是否完整
+
+    :param expected: 交易所应有的品种代码
+    :return: 覆盖的品种达到HEDGE_CONFIG["min_coverage"]比例时返回True的判断函数
+    """
+    expected = {symbol.upper() for symbol in expected}
+
+    def is_complete(data: Dict[str, pd.DataFrame]) -> bool:
+        if not data:
+            return False
+        if not expected:
+            return True
+        return len(covered_symbols(data) & expected) >= HEDGE_CONFIG["min_coverage"] * len(expected)
+
+    return is_complete
+
+
+class LatencyTracker:
+    """
+    按 (数据源, 交易所) 记录最近耗时并估计分位数
+    被取消的请求只知道耗时的下限，单独记为截尾样本，不参与分位数估计
+    （否则对冲延迟会被取消时刻拉向自身，自我强化），只在统计中报告。
+    """
+
+    def __init__(self, window: int = None):
+        """
+        初始化耗时记录器
+
+        :param window: 每个数据源保留的最近样本数（默认读取HEDGE_CONFIG）
+        """
+        self.window = window or HEDGE_CONFIG["window"]
+        self._samples = defaultdict(lambda: deque(maxlen=self.window))
+        self._censored = defaultdict(lambda: deque(maxlen=self.window))
+        self._lock = threading.Lock()
+
+    def record(self, source: str, exchange_name: str, latency: float, censored: bool = False):
+        """
+        记录一次耗时（秒）
+
+        :param censored: 请求被取消，latency只是实际耗时的下限
+        """
+        with self._lock:
+            samples = self._censored if censored else self._samples
+            samples[(source, exchange_name)].append(latency)
+
+    def percentile(self, source: str, exchange_name: str, q: float) -> Optional[float]:
+        """
+        耗时分位数
+        :return: 分位数（秒），样本不足时返回None
+        """
+        with self._lock:
+            samples = list(self._samples.get((source, exchange_name), ()))
+        if len(samples) < HEDGE_CONFIG["min_samples"]:
+            return None
+        return float(np.percentile(samples, q))
+
+    def hedge_delay(self, exchange_name: str) -> float:
+        """主数据源的对冲延迟（秒）"""
+        delay = self.percentile(PRIMARY, exchange_name, HEDGE_CONFIG["percentile"])
+        if delay is None:
+            delay = HEDGE_CONFIG["default_delay"]
+        return max(HEDGE_CONFIG["min_delay"], delay)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """各数据源耗时统计"""
+        with self._lock:
+            items = {key: list(samples) for key, samples in self._samples.items()}
+            censored = {key: len(samples) for key, samples in self._censored.items()}
+        return {
+            f"{exchange_name}/{source}": {
+                "samples": len(samples),
+                "censored": censored.get((source, exchange_name), 0),
+                "median": float(np.median(samples)),
+                "p95": float(np.percentile(samples, 95)),
+            }
+            for (source, exchange_name), samples in items.items() if samples
+        }
+
+
+_latency_tracker: Optional[LatencyTracker] = None
+_tracker_lock = threading.Lock()
+
+
+def get_latency_tracker() -> LatencyTracker:
+    """获取进程级共享耗时记录器（所有会话共用）"""
+    global _latency_tracker
+    with _tracker_lock:
+        if _latency_tracker is None:
+            _latency_tracker = LatencyTracker()
+        return _latency_tracker
+
+
+async def hedged_race(primary: Callable[[], Awaitable], alternate: Callable[[], Awaitable],
+                      delay: float, is_complete: Callable[[Any], bool] = bool,
+                      on_finish: Callable[[str, float, bool], None] = None) -> Tuple[str, Any]:
+    """
+    对冲执行：先启动主任务，delay秒内未得到完整结果时启动备用任务，采用先完成的完整结果
+
+    :param primary: 主任务协程工厂
+    :param alternate: 备用任务协程工厂
+    :param delay: 对冲延迟（秒）
+    :param is_complete: 判断结果是否完整
+    :param on_finish: 任务成功返回或被取消时的回调 (来源, 自身耗时, 是否被取消)
+    :return: (来源, 结果)；两者都没有完整结果时返回主任务的结果，两者都失败时抛出主任务的异常
+    """
+    started = {PRIMARY: time.monotonic()}
+    tasks = {asyncio.ensure_future(primary()): PRIMARY}
+    results: Dict[str, Any] = {}
+    errors: Dict[str, BaseException] = {}
+
+    def finish(task) -> Optional[Tuple[str, Any]]:
+        source = tasks.pop(task)
+        try:
+            result = task.result()
+        except Exception as e:
+            errors[source] = e
+            return None
+        if on_finish:
+            on_finish(source, time.monotonic() - started[source], False)
+        results[source] = result
+        return (source, result) if is_complete(result) else None
+
+    try:
+        done, _ = await asyncio.wait(list(tasks), timeout=delay)
+        for task in done:
+            winner = finish(task)
+            if winner:
+                return winner
+
+        started[ALTERNATE] = time.monotonic()
+        tasks[asyncio.ensure_future(alternate())] = ALTERNATE
+
+        while tasks:
+            done, _ = await asyncio.wait(list(tasks), return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                winner = finish(task)
+                if winner:
+                    return winner
+    finally:
+        # 取消未完成的一方
+        for task, source in tasks.items():
+            task.cancel()
+            if on_finish:
+                on_finish(source, time.monotonic() - started[source], True)
+
+    if PRIMARY in results:
+        return PRIMARY, results[PRIMARY]
+    if ALTERNATE in results:
+        return ALTERNATE, results[ALTERNATE]
+    raise errors.get(PRIMARY) or errors[ALTERNATE]
+
+
+class HedgedPositionFetcher:
+    """
+    对冲持仓数据获取器
+    - 主数据源：fetcher（IntegratedDataFetcher / SinaPositionFetcher）经异步引擎获取
+    - 备用数据源：HEDGE_CONFIG中配置的交易所持仓排名表
+    """
+
+    def __init__(self, fetcher, tracker: LatencyTracker = None, budget: RetryBudget = None,
+                 manifest: FetchManifest = None):
+        """
+        初始化对冲获取器
+
+        :param fetcher: 主数据源获取器
+        :param tracker: 耗时记录器（默认进程级共享）
+        :param budget: 本次运行的重试预算（默认新建，所有交易所共享）
+        :param manifest: 主数据源的获取清单（get_fetch_manifest，中断后可续传；默认不记录）
+        """
+        self.fetcher = fetcher
+        self.manifest = manifest
+        self.engine = AsyncPositionFetcher(fetcher, manifest=manifest, budget=budget)
+        self.tracker = tracker or get_latency_tracker()
+
+    async def _fetch_alternate(self, exchange_name: str, trade_date: str) -> Dict[str, pd.DataFrame]:
+        """从交易所持仓排名表获取（不占用主数据源的并发名额）"""
+        func_name = HEDGE_CONFIG["alternate_sources"].get(exchange_name)
+        if not func_name or not hasattr(ak, func_name):
+            raise ValueError(f"{exchange_name} 无可用的备用数据源")
+
+        loop = asyncio.get_running_loop()
+        data_dict = await loop.run_in_executor(
+            get_shared_executor(),
+            lambda: rate_limited_call(getattr(ak, func_name), date=trade_date)
+        )
+        return {
+            name: df for name, df in (data_dict or {}).items()
+            if isinstance(df, pd.DataFrame) and not df.empty
+        }
+
+    async def fetch_exchange(self, exchange_name: str, trade_date: str) -> Tuple[str, Dict[str, pd.DataFrame]]:
+        """
+        对冲获取单个交易所的持仓数据
+
+        :return: (来源, 按品种/合约分组的数据字典)
+        """
+        delay = self.tracker.hedge_delay(exchange_name)
+
+        def on_finish(source: str, elapsed: float, cancelled: bool):
+            # 被取消的一方耗时至少为elapsed，记为截尾样本
+            self.tracker.record(source, exchange_name, elapsed, censored=cancelled)
+            if cancelled:
+                print(f"  {exchange_name} {source} 数据源已取消（{elapsed:.1f}秒）")
+
+        source, data = await hedged_race(
+            lambda: self.engine.fetch_exchange(exchange_name, trade_date),
+            lambda: self._fetch_alternate(exchange_name, trade_date),
+            delay,
+            # 按品种覆盖率判断完整，只覆盖少数品种的结果不能赢得对冲
+            is_complete=coverage_check(self.fetcher.exchange_symbols.get(exchange_name, ())),
+            on_finish=on_finish
+        )
+        # 备用数据源胜出时主数据源已被取消，其未完成的清单条目不再需要续传
+        if source == ALTERNATE and data and self.manifest is not None:
+            self.manifest.discard(exchange_name)
+        return source, data or {}
+
+    async def iter_exchanges(self, trade_date: str, exchanges: List[str] = None,
+                             deadlines: Dict[str, float] = None,
+                             ) -> AsyncIterator[Tuple[str, str, Dict[str, pd.DataFrame], Optional[BaseException]]]:
+        """
+        并发对冲获取多个交易所，按完成顺序产出 (交易所, 来源, 数据字典, 异常)
+
+        :param trade_date: 交易日期 YYYYMMDD
+        :param exchanges: 交易所列表（默认全部）
+        :param deadlines: 交易所 -> 期限（秒），超过期限计入主数据源的熔断失败次数
+        """
+        exchanges = list(self.fetcher.exchange_symbols) if exchanges is None else exchanges
+        deadlines = deadlines or {}
+
+        async def exchange_task(exchange_name: str):
+            try:
+                source, data = await asyncio.wait_for(
+                    self.fetch_exchange(exchange_name, trade_date),
+                    deadlines.get(exchange_name)
+                )
+                return exchange_name, source, data, None
+            except asyncio.TimeoutError:
+                error = TimeoutError(f"{exchange_name} 获取超时({deadlines[exchange_name]:.0f}秒)")
+                record_position_timeout(exchange_name, error)
+                return exchange_name, None, {}, error
+            except Exception as e:
+                return exchange_name, None, {}, e
+
+        tasks = [asyncio.ensure_future(exchange_task(name)) for name in exchanges]
+
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            for task in tasks:
+                task.cancel()
+
+
+__all__ = [
+    'HedgedPositionFetcher',
+    'LatencyTracker',
+    'coverage_check',
+    'covered_symbols',
+    'get_latency_tracker',
+    'hedged_race'
+]
@@ -14,10 +14,19 @@ import pandas as pd
 from pathlib import Path
 from datetime import datetime, timedelta
 import time
-import random
 from typing import Dict, List, Optional
 import warnings
 
+from config import FETCH_CONFIG
+from retry_policy import RetryBudget, get_retry_policy
+from response_cache import fetch_hold_pos_sina
+from dominant_contract_index import get_contract_index
+from parallel_fetch import get_exchange_deadline
+from async_position_fetcher import AsyncPositionFetcher, POSITION_TYPES, run_sync
+from fetch_manifest import get_fetch_manifest
+from circuit_breaker import CircuitOpenError
+from position_store import save_positions
+
 warnings.filterwarnings('ignore')
 
 # 从交易席位项目导入核心模块
@@ -58,19 +67,22 @@ class IntegratedDataFetcher:
     - 输出与现有系统兼容的格式
     """
     
-    def __init__(self, data_dir: str = "data", online_mode: bool = True):
+    def __init__(self, data_dir: str = "data", online_mode: bool = True, max_workers: int = None):
         """
         初始化集成数据获取器
         
         Args:
             data_dir: 数据保存目录
             online_mode: 是否在线获取基差数据（默认True）
+            max_workers: 并发请求数（默认读取FETCH_CONFIG，1表示串行）
         """
         self.data_dir = data_dir
         self.symbol_names = SYMBOL_NAMES
         self.exchange_symbols = EXCHANGE_SYMBOLS
         self.online_mode = online_mode
-        self.basis_cache = {}  # 缓存当天的基差数据
+        self.max_workers = max(1, max_workers or FETCH_CONFIG["max_workers"])
+        self.contract_index = get_contract_index()  # 交易日 -> 品种 -> 主力合约
+        self.retry_policy = get_retry_policy()  # 统一重试策略
         self.ensure_data_directory()
         
         if online_mode:
@@ -83,65 +95,6 @@ class IntegratedDataFetcher:
         if not os.path.exists(self.data_dir):
             os.makedirs(self.data_dir)
     
-    def fetch_online_basis_data(self, date_str: str) -> Optional[pd.DataFrame]:
-        """
-        在线获取基差数据（实时调用API）
-        
-        Args:
-            date_str: 日期 YYYYMMDD
-            
-        Returns:
-            基差数据DataFrame
-        """
-        # 检查缓存
-        if date_str in self.basis_cache:
-            return self.basis_cache[date_str]
-        
-        if not self.online_mode:
-            return None
-        
-        try:
-            import akshare as ak
-            import time
-            import random
-            
-            print(f"  📡 在线获取基差数据: {date_str}")
-            
-            # 调用AkShare API获取基差数据
-            df = ak.futures_spot_price(date_str)
-            
-            if df is None or df.empty:
-                print(f"    ⚠️ 基差数据为空")
-                return None
-            
-            # 检查品种列名（适应不同版本）
-            variety_col = None
-            if 'var' in df.columns:
-                variety_col = 'var'
-            elif 'symbol' in df.columns:
-                variety_col = 'symbol'
-            else:
-                print(f"    ⚠️ 未找到品种列")
-                return None
-            
-            # 标准化列名
-            if variety_col != 'symbol':
-                df = df.rename(columns={variety_col: 'symbol'})
-            
-            # 缓存数据
-            self.basis_cache[date_str] = df
-            
-            print(f"    ✅ 获取到 {len(df)} 个品种的基差数据")
-            
-            # 避免请求过快
-            time.sleep(random.uniform(0.5, 1.5))
-            
-            return df
-            
-        except Exception as e:
-            print(f"    ❌ 基差数据获取失败: {str(e)[:100]}")
-            return None
-    
     def get_main_contract_from_basis(self, symbol: str, date_str: str) -> Optional[str]:
         """
         从基差数据中获取主力合约（在线获取或离线读取）
@@ -153,61 +106,15 @@ class IntegratedDataFetcher:
         Returns:
             主力合约代码
         """
-        # 优先在线获取
+        # 优先在线获取（主力合约索引按交易日一次性构建，已修复合约代码格式）
         if self.online_mode:
-            basis_df = self.fetch_online_basis_data(date_str)
-            
-            if basis_df is not None:
-                try:
-                    # 查找对应品种
-                    symbol_data = basis_df[basis_df['symbol'] == symbol]
-                    
-                    if not symbol_data.empty:
-                        # 检查主力合约列（可能的列名）
-                        contract_cols = ['dominant_contract', '主力合约', 'main_contract']
-                        
-                        for col in contract_cols:
-                            if col in symbol_data.columns:
-                                contract = str(symbol_data.iloc[0][col]).strip()
-                                if contract and contract != 'nan':
-                                    # 修复合约代码格式
-                                    contract = self._fix_contract_code(contract, symbol)
-                                    return contract
-                except Exception as e:
-                    pass
+            try:
+                return self.contract_index.lookup(symbol, date_str)
+            except Exception as e:
+                pass
         
         return None
     
-    def _fix_contract_code(self, contract: str, symbol: str) -> str:
-        """
-        修复合约代码格式
-        如果数字部分只有3位，在前面补2
-        
-        Args:
-            contract: 原始合约代码
-            symbol: 品种代码
-            
-        Returns:
-            修复后的合约代码
-        """
-        if not contract:
-            return contract
-        
-        import re
-        match = re.match(r'([A-Za-z]+)(\d+)', contract.upper())
-        
-        if match:
-            prefix = match.group(1)
-            digits = match.group(2)
-            
-            # 如果数字部分只有3位，在前面补2
-            if len(digits) == 3:
-                return f"{prefix}2{digits}"
-            else:
-                return contract
-        else:
-            return contract
-    
     def get_main_contract_from_symbol(self, symbol: str, date_str: str) -> Optional[str]:
         """
         获取主力合约（简化版）
@@ -262,7 +169,72 @@ class IntegratedDataFetcher:
             print(f"  获取{symbol}主力合约失败: {e}")
             return None
     
-    def fetch_single_contract_data(self, contract: str, date_str: str, symbol: str) -> Dict[str, pd.DataFrame]:
+    def resolve_main_contract(self, symbol: str, date_str: str) -> Optional[str]:
+        """
+        确定品种的主力合约：优先基差数据，其次简化推测
+        
+        Args:
+            symbol: 品种代码
+            date_str: 日期 YYYYMMDD
+            
+        Returns:
+            主力合约代码
+        """
+        main_contract = self.get_main_contract_from_basis(symbol, date_str)
+        if not main_contract:
+            main_contract = self.get_main_contract_from_symbol(symbol, date_str)
+        return main_contract
+    
+    def fetch_single_position_data(self, contract: str, date_str: str, symbol: str,
+                                   position_type: str, allow_expired: bool = False,
+                                   budget: RetryBudget = None) -> Optional[pd.DataFrame]:
+        """
+        获取单个合约单一持仓类型的数据（可在线程池中并发调用）
+        
+        Args:
+            contract: 合约代码
+            date_str: 日期 YYYYMMDD
+            symbol: 品种代码
+            position_type: 持仓类型（成交量/多单持仓/空单持仓）
+            allow_expired: 是否接受已过期的缓存（续传未完成的获取时使用，结算后不接受结算前写入的缓存）
+            budget: 本次运行的重试预算（None表示不限）
+            
+        Returns:
+            持仓数据DataFrame，失败返回None
+        """
+        # 统一重试策略：指数退避+随机抖动，重试次数受本次运行的重试预算限制
+        try:
+            df = self.retry_policy.call(
+                fetch_hold_pos_sina, position_type, contract, date_str, allow_expired,
+                budget=budget,
+                retry_if_result=lambda result: result is None or result.empty
+            )
+        except Exception as e:
+            print(f"    获取{contract} {position_type}失败: {str(e)[:50]}")
+            return None
+        
+        if df is None or df.empty:
+            return None
+        
+        df = df.copy()
+        
+        # 标准化列名（与交易席位项目一致）
+        if len(df.columns) >= 4:
+            if position_type in ["多单持仓", "空单持仓"]:
+                df.columns = ['排名', '会员简称', '持仓量', '比上交易增减']
+            elif position_type == "成交量":
+                df.columns = ['排名', '会员简称', '成交量', '比上交易增减']
+        
+        # 添加元数据
+        df['date'] = date_str
+        df['contract'] = contract
+        df['position_type'] = position_type
+        df['symbol'] = symbol
+        
+        return df
+    
+    def fetch_single_contract_data(self, contract: str, date_str: str, symbol: str,
+                                   budget: RetryBudget = None) -> Dict[str, pd.DataFrame]:
         """
         获取单个合约的持仓数据（使用交易席位的方法）
         
@@ -270,47 +242,18 @@ class IntegratedDataFetcher:
             contract: 合约代码
             date_str: 日期 YYYYMMDD
             symbol: 品种代码
+            budget: 本次运行的重试预算（默认新建）
             
         Returns:
             持仓数据字典
         """
-        position_types = ["成交量", "多单持仓", "空单持仓"]
         result = {}
+        budget = budget or RetryBudget()
         
-        for position_type in position_types:
-            for attempt in range(3):
-                try:
-                    df = ak.futures_hold_pos_sina(
-                        symbol=position_type,
-                        contract=contract,
-                        date=date_str
-                    )
-                    
-                    if df is not None and not df.empty:
-                        df = df.copy()
-                        
-                        # 标准化列名（与交易席位项目一致）
-                        if len(df.columns) >= 4:
-                            if position_type in ["多单持仓", "空单持仓"]:
-                                df.columns = ['排名', '会员简称', '持仓量', '比上交易增减']
-                            elif position_type == "成交量":
-                                df.columns = ['排名', '会员简称', '成交量', '比上交易增减']
-                        
-                        # 添加元数据
-                        df['date'] = date_str
-                        df['contract'] = contract
-                        df['position_type'] = position_type
-                        df['symbol'] = symbol
-                        
-                        result[position_type] = df
-                        break
-                    else:
-                        time.sleep(random.uniform(0.3, 0.6))
-                        
-                except Exception as e:
-                    if attempt == 2:
-                        print(f"    获取{contract} {position_type}失败: {str(e)[:50]}")
-                    time.sleep(random.uniform(0.5, 1.0))
+        for position_type in POSITION_TYPES:
+            df = self.fetch_single_position_data(contract, date_str, symbol, position_type, budget=budget)
+            if df is not None:
+                result[position_type] = df
         
         return result
     
@@ -401,102 +344,62 @@ class IntegratedDataFetcher:
         
         return result
     
-    def fetch_exchange_data(self, exchange_name: str, trade_date: str) -> Dict[str, pd.DataFrame]:
+    def fetch_exchange_data(self, exchange_name: str, trade_date: str,
+                            budget: RetryBudget = None) -> Dict[str, pd.DataFrame]:
         """
-        获取指定交易所的所有品种持仓数据
+        获取指定交易所的所有品种持仓数据（AsyncPositionFetcher.fetch_exchange的同步封装）
+        
+        品种×持仓类型的请求由异步引擎并发执行（并发数max_workers），
+        所有请求经进程级共享限速器，结果按原品种顺序重新组装。
         
         Args:
             exchange_name: 交易所名称
             trade_date: 交易日期 YYYYMMDD
+            budget: 本次运行的重试预算（多个交易所属于同一次运行时由调用方传入同一个，默认新建）
             
         Returns:
             按品种分组的数据字典
         """
-        print(f"\n正在获取{exchange_name}数据（使用交易席位方法）...")
-        
-        if exchange_name not in self.exchange_symbols:
-            print(f"  未知交易所: {exchange_name}")
-            return {}
-        
-        symbols = self.exchange_symbols[exchange_name]
-        all_data = []
-        success_count = 0
-        
-        for symbol in symbols:
-            try:
-                # 优先从基差数据获取主力合约
-                main_contract = self.get_main_contract_from_basis(symbol, trade_date)
-                
-                # 如果基差数据中没有，使用简化推测方法
-                if not main_contract:
-                    main_contract = self.get_main_contract_from_symbol(symbol, trade_date)
-                
-                if not main_contract:
-                    print(f"  {symbol} ({self.symbol_names.get(symbol, symbol)}) - 无法确定主力合约 ❌")
-                    continue
-                
-                print(f"  {symbol} ({self.symbol_names.get(symbol, symbol)}) - {main_contract}...", end="", flush=True)
-                
-                # 获取合约数据
-                contract_data = self.fetch_single_contract_data(main_contract, trade_date, symbol)
-                
-                if contract_data:
-                    # 将所有类型的数据添加到列表
-                    for data_type, df in contract_data.items():
-                        all_data.append(df)
-                    print(" ✅")
-                    success_count += 1
-                else:
-                    print(" ❌")
-                
-                # 避免请求过快
-                time.sleep(random.uniform(0.5, 1.0))
-                
-            except Exception as e:
-                print(f" ❌ {str(e)[:30]}")
-                continue
-        
-        print(f"  {exchange_name}数据获取完成: {success_count}/{len(symbols)} 个品种成功")
-        
-        # 转换为交易所Excel格式
-        return self.convert_to_exchange_format(all_data, exchange_name)
+        # 获取清单记录每个品种×持仓类型的状态，中断后重新获取时只请求缺失部分
+        manifest = get_fetch_manifest(trade_date)
+        async_fetcher = AsyncPositionFetcher(self, manifest=manifest, budget=budget)
+        return run_sync(async_fetcher.fetch_exchange(exchange_name, trade_date))
     
-    def save_to_excel(self, data_dict: Dict[str, pd.DataFrame], filename: str):
+    def save_to_excel(self, data_dict: Dict[str, pd.DataFrame], filename: str,
+                      trade_date: str = None, exchange_name: str = None):
         """
-        保存数据到Excel文件（兼容现有系统格式）
+        保存数据到持仓存储（Parquet，按STORAGE_CONFIG可同时导出Excel）
         
         Args:
             data_dict: 数据字典
-            filename: 文件名
+            filename: 文件名（如 大商所持仓.xlsx）
+            trade_date: 交易日期（与exchange_name同时给出时写入按日期分区的数据湖）
+            exchange_name: 交易所名称
         """
         if not data_dict:
             print(f"    {filename}: 无数据，跳过保存")
             return
         
-        save_path = os.path.join(self.data_dir, filename)
-        
         try:
-            with pd.ExcelWriter(save_path, engine='openpyxl') as writer:
-                for sheet_name, df in data_dict.items():
-                    # 清理sheet名称
-                    clean_name = sheet_name[:31].replace("/", "-").replace("*", "")
-                    df.to_excel(writer, sheet_name=clean_name, index=False)
-            
+            save_positions(data_dict, self.data_dir, filename,
+                           trade_date=trade_date, exchange_name=exchange_name)
             print(f"    ✅ {filename}: 已保存 {len(data_dict)} 个品种")
         except Exception as e:
             print(f"    ❌ {filename}: 保存失败 - {e}")
     
-    def fetch_all_exchanges_data(self, trade_date: str, progress_callback=None) -> bool:
+    def fetch_all_exchanges_data(self, trade_date: str, progress_callback=None,
+                                 budget: RetryBudget = None) -> bool:
         """
         获取所有交易所的数据
         
         完整流程：
         1. 先获取基差数据（包含所有品种的主力合约）
-        2. 遍历各交易所，使用主力合约获取持仓数据
+        2. 各交易所并发获取持仓数据（各自有期限），按完成顺序保存并回报进度
         
         Args:
             trade_date: 交易日期 YYYYMMDD
             progress_callback: 进度回调函数
+            budget: 本次运行的重试预算（默认新建，所有交易所共享）
             
         Returns:
             是否成功
@@ -512,11 +415,10 @@ class IntegratedDataFetcher:
             
             print("\n【步骤1/2】获取基差数据")
             print("-" * 80)
-            basis_df = self.fetch_online_basis_data(trade_date)
+            contracts = self.contract_index.get_contracts(trade_date)
             
-            if basis_df is not None:
-                print(f"  ✅ 成功获取基差数据，覆盖 {len(basis_df)} 个品种")
-                print(f"  📋 基差数据列: {list(basis_df.columns)}")
+            if contracts:
+                print(f"  ✅ 成功构建主力合约索引，覆盖 {len(contracts)} 个品种")
             else:
                 print(f"  ⚠️ 基差数据获取失败，将使用简化推测方法")
         
@@ -533,33 +435,49 @@ class IntegratedDataFetcher:
         }
         
         success_count = 0
+        completed_count = 0
         total_exchanges = len(exchanges)
+        budget = budget or RetryBudget()  # 所有交易所共享本次运行的重试预算
         
-        for i, (exchange_name, filename) in enumerate(exchanges.items()):
-            if progress_callback:
-                progress = i / total_exchanges * 0.6
-                progress_callback(f"正在获取 {exchange_name} 数据（交易席位方法）...", progress)
+        if progress_callback:
+            progress_callback("正在并发获取各交易所数据（交易席位方法）...", 0.1)
+        
+        deadlines = {name: get_exchange_deadline("position", name) for name in exchanges}
+        
+        async def fetch_and_save():
+            nonlocal success_count, completed_count
             
-            try:
-                # 获取交易所数据
-                data_dict = self.fetch_exchange_data(exchange_name, trade_date)
+            # 获取清单记录每个品种×持仓类型的状态，中断后重新获取时只请求缺失部分
+            async_fetcher = AsyncPositionFetcher(self, manifest=get_fetch_manifest(trade_date), budget=budget)
+            
+            # 按完成顺序处理：每个交易所完成后立即保存
+            # （熔断打开的交易所直接跳过并后台探测，超过期限计入熔断失败次数）
+            async for exchange_name, data_dict, error in async_fetcher.iter_exchanges(
+                    trade_date, list(exchanges), deadlines):
+                completed_count += 1
                 
-                if data_dict:
-                    # 保存数据
-                    self.save_to_excel(data_dict, filename)
+                if isinstance(error, CircuitOpenError):
+                    print(f"    ⚡ {error}")
+                elif error is not None:
+                    print(f"    ❌ {exchange_name} 数据获取失败: {str(error)[:50]}")
+                elif data_dict:
+                    self.save_to_excel(data_dict, exchanges[exchange_name], trade_date, exchange_name)
                     success_count += 1
                 else:
                     print(f"    ⚠️ {exchange_name} 数据获取失败")
-                    
-            except Exception as e:
-                print(f"    ❌ {exchange_name} 数据获取失败: {str(e)[:50]}")
-                continue
+                
+                if progress_callback:
+                    progress = 0.1 + completed_count / total_exchanges * 0.5
+                    progress_callback(f"已完成 {exchange_name} 数据获取（{completed_count}/{total_exchanges}）", progress)
+        
+        run_sync(fetch_and_save())
         
         if progress_callback:
             progress_callback("持仓数据获取完成", 0.6)
         
         print(f"\n{'='*80}")
         print(f"数据获取完成: {success_count}/{total_exchanges} 个交易所成功")
+        print(f"重试统计: {budget.stats()}")
         print(f"{'='*80}\n")
         
         return success_count >= 3
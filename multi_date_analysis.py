@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+期货持仓分析系统 - 多日期并行分析模块
+按交易日把数据湖中已存储的持仓分给进程池并行分析（pandas计算受GIL限制，线程无法利用多核）。
+主进程只读取每个交易日分区文件的原始字节（Parquet：列式、压缩、席位字典编码，
+比pickle的DataFrame小）传给工作进程，解码在工作进程内并行完成；工作进程只返回
+该日的信号总结，主进程按完成顺序合并。
+
+用法：
+    python multi_date_analysis.py --start 20250101 --end 20251231 --workers 8
+作者：7haoge
+邮箱：953534947@qq.com
+"""
+
+import argparse
+import multiprocessing
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Any, Callable, Dict, List, Optional
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from config import EXCHANGE_CONFIG, PARALLEL_ANALYSIS_CONFIG
+from position_store import POSITIONS, PositionLake, get_position_lake, split_store
+
+# 工作进程内的分析引擎（进程初始化时创建）
+_engine = None
+
+
+def encode_positions(lake: PositionLake, trade_date: str) -> Dict[str, pa.Buffer]:
+    """
+    读取某日各交易所结算后写入的持仓分区的Parquet字节（主进程不解码；结算前写入的分区可能不完整，跳过）
+
+    :return: 交易所 -> Parquet缓冲（含合约布局元数据），交易所及顺序与load_position_data一致
+    """
+    stored = set(lake.stored_exchanges(POSITIONS, trade_date))
+    return {
+        exchange_name: pa.py_buffer(lake.partition_path(POSITIONS, trade_date, exchange_name).read_bytes())
+        for exchange_name in EXCHANGE_CONFIG if exchange_name in stored
+    }
+
+
+def decode_positions(buffers: Dict[str, pa.Buffer]) -> Dict[str, pd.DataFrame]:
+    """Parquet缓冲解码为 交易所_合约 -> 持仓数据（键与load_position_data一致）"""
+    position_data = {}
+    for exchange_name, buffer in buffers.items():
+        for name, df in split_store(pq.read_table(pa.BufferReader(buffer))).items():
+            position_data[f"{exchange_name}_{name}"] = df
+    return position_data
+
+
+def _init_worker(retail_seats: Optional[List[str]]):
+    """工作进程初始化：创建分析引擎"""
+    global _engine
+    from futures_analyzer import FuturesAnalysisEngine
+
+    _engine = FuturesAnalysisEngine(retail_seats=retail_seats)
+
+
+def _analyze_date(trade_date: str, buffers: Dict[str, pa.Buffer], include_positions: bool) -> Dict[str, Any]:
+    """
+    工作进程任务：分析一个交易日
+
+    :return: {'summary': 总结（与full_analysis的summary相同）,
+              'position_analysis': 持仓分析结果（不含raw_data，include_positions时）}
+    """
+    position_analysis = _engine._analyze_positions(decode_positions(buffers))
+    result = {'summary': _engine._generate_summary({'position_analysis': position_analysis})}
+    if include_positions:
+        result['position_analysis'] = {
+            contract: {key: value for key, value in data.items() if key != 'raw_data'}
+            for contract, data in position_analysis.items()
+        }
+    return result
+
+
+class MultiDateSummary:
+    """按完成顺序合并各交易日的分析结果"""
+
+    def __init__(self):
+        self.summaries: Dict[str, Dict[str, Any]] = {}
+        self.position_analysis: Dict[str, Dict[str, Any]] = {}
+        self.errors: Dict[str, str] = {}
+        self._statistics: List[Dict[str, Any]] = []
+        self._signals: List[Dict[str, Any]] = []
+
+    def add(self, trade_date: str, result: Dict[str, Any]):
+        """合并一个交易日的结果"""
+        summary = result['summary']
+        self.summaries[trade_date] = summary
+        if 'position_analysis' in result:
+            self.position_analysis[trade_date] = result['position_analysis']
+        self._statistics.append({'trade_date': trade_date, **summary['statistics']})
+        for strategy_name, signals in summary['strategy_signals'].items():
+            for direction, label in (('long', '看多'), ('short', '看空')):
+                for signal in signals[direction]:
+                    self._signals.append({
+                        'trade_date': trade_date,
+                        'contract': signal['contract'],
+                        'strategy': strategy_name,
+                        'signal': label,
+                        'strength': signal['strength'],
+                        'reason': signal['reason'],
+                    })
+
+    def fail(self, trade_date: str, error: str):
+        """记录失败的交易日"""
+        self.errors[trade_date] = error
+
+    def result(self) -> Dict[str, Any]:
+        """
+        合并结果
+
+        :return: {
+            'summaries': 交易日 -> 总结,
+            'statistics': DataFrame[trade_date, total_contracts, total_long_signals, ...]（按日期排序）,
+            'signals': DataFrame[trade_date, contract, strategy, signal, strength, reason]，
+            'position_analysis': 交易日 -> 持仓分析结果（include_positions时）,
+            'errors': 交易日 -> 错误信息
+        }
+        """
+        statistics = pd.DataFrame(self._statistics)
+        if not statistics.empty:
+            statistics = statistics.sort_values('trade_date').reset_index(drop=True)
+        signals = pd.DataFrame(self._signals, columns=['trade_date', 'contract', 'strategy', 'signal', 'strength', 'reason'])
+        signals = signals.sort_values(['trade_date', 'strategy', 'signal', 'strength'],
+                                      ascending=[True, True, True, False], kind='stable').reset_index(drop=True)
+        return {
+            'summaries': dict(sorted(self.summaries.items())),
+            'statistics': statistics,
+            'signals': signals,
+            'position_analysis': dict(sorted(self.position_analysis.items())),
+            'errors': dict(sorted(self.errors.items())),
+        }
+
+
+def analyze_dates(start_date: str = None, end_date: str = None, trade_dates: List[str] = None,
+                  retail_seats: List[str] = None, max_workers: int = None, include_positions: bool = False,
+                  progress_callback: Callable[[str, float], None] = None, lake: PositionLake = None) -> Dict[str, Any]:
+    """
+    多个交易日的持仓并行分析（数据来自数据湖，不联网）
+
+    :param start_date: 起始日期 YYYYMMDD（含）
+    :param end_date: 结束日期 YYYYMMDD（含）
+    :param trade_dates: 指定交易日（给出时忽略起止日期）
+    :param retail_seats: 家人席位（默认读取STRATEGY_CONFIG）
+    :param max_workers: 工作进程数（默认读取PARALLEL_ANALYSIS_CONFIG），1为在当前进程内逐日分析
+    :param include_positions: 是否返回各合约的策略结果（不含原始持仓数据）
+    :param progress_callback: 进度回调函数 (消息, 进度)
+    :param lake: PositionLake（默认进程级共享数据湖）
+    :return: MultiDateSummary.result()
+    """
+    lake = lake or get_position_lake()
+    if trade_dates is None:
+        trade_dates = [trade_date for trade_date in lake.dates(POSITIONS)
+                       if (not start_date or trade_date >= start_date) and (not end_date or trade_date <= end_date)]
+    trade_dates = sorted(trade_dates)
+    merged = MultiDateSummary()
+    if not trade_dates:
+        return merged.result()
+
+    max_workers = max_workers or PARALLEL_ANALYSIS_CONFIG["max_workers"] or os.cpu_count() or 1
+    max_workers = min(max_workers, len(trade_dates))
+    completed = 0
+
+    def report(trade_date: str):
+        nonlocal completed
+        completed += 1
+        if progress_callback:
+            progress_callback(f"完成 {trade_date}（{completed}/{len(trade_dates)}）", completed / len(trade_dates))
+
+    # 单进程：不启动进程池，数据路径相同
+    if max_workers <= 1:
+        _init_worker(retail_seats)
+        for trade_date in trade_dates:
+            try:
+                buffers = encode_positions(lake, trade_date)
+                if buffers:
+                    merged.add(trade_date, _analyze_date(trade_date, buffers, include_positions))
+                else:
+                    merged.fail(trade_date, "无结算后的持仓数据")
+            except Exception as e:
+                merged.fail(trade_date, str(e))
+            report(trade_date)
+        return merged.result()
+
+    # 进程池：每个进程最多排队tasks_per_worker个交易日，完成一个再读取下一个
+    context = multiprocessing.get_context(PARALLEL_ANALYSIS_CONFIG["start_method"])
+    max_pending = max_workers * PARALLEL_ANALYSIS_CONFIG["tasks_per_worker"]
+    remaining = iter(trade_dates)
+    pending = {}
+
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=context,
+                             initializer=_init_worker, initargs=(retail_seats,)) as executor:
+        def submit_next() -> bool:
+            for trade_date in remaining:
+                try:
+                    buffers = encode_positions(lake, trade_date)
+                except Exception as e:
+                    buffers = None
+                    merged.fail(trade_date, str(e))
+                else:
+                    if not buffers:
+                        merged.fail(trade_date, "无结算后的持仓数据")
+                if not buffers:
+                    report(trade_date)
+                    continue
+                pending[executor.submit(_analyze_date, trade_date, buffers, include_positions)] = trade_date
+                return True
+            return False
+
+        while len(pending) < max_pending and submit_next():
+            pass
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                trade_date = pending.pop(future)
+                try:
+                    merged.add(trade_date, future.result())
+                except Exception as e:
+                    merged.fail(trade_date, str(e))
+                report(trade_date)
+                submit_next()
+
+    return merged.result()
+
+
+def main():
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description="多日期持仓并行分析")
+    parser.add_argument("--start", help="起始日期 YYYYMMDD")
+    parser.add_argument("--end", help="结束日期 YYYYMMDD")
+    parser.add_argument("--workers", type=int, help="工作进程数（默认CPU核数）")
+    args = parser.parse_args()
+
+    result = analyze_dates(args.start, args.end, max_workers=args.workers,
+                           progress_callback=lambda message, progress: print(f"[{progress*100:.1f}%] {message}"))
+    if result['statistics'].empty:
+        print("没有可分析的交易日")
+    else:
+        print(result['statistics'].to_string(index=False))
+    for trade_date, error in result['errors'].items():
+        print(f"⚠️ {trade_date} 分析失败: {error}")
+
+
+__all__ = [
+    'MultiDateSummary',
+    'analyze_dates',
+    'decode_positions',
+    'encode_positions'
+]
+
+
+if __name__ == "__main__":
+    main()
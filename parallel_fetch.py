@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+期货持仓分析系统 - 交易所级并发获取模块
+各交易所的数据获取互不依赖，并发执行并按完成顺序返回结果
+作者：7haoge
+邮箱：953534947@qq.com
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+from config import FETCH_CONFIG
+
+
+def get_exchange_deadline(kind: str, exchange_name: str) -> float:
+    """
+    获取交易所的获取期限
+    :param kind: 任务类型（position/price）
+    :param exchange_name: 交易所名称
+    :return: 期限（秒）
+    """
+    deadlines = FETCH_CONFIG[f"{kind}_deadlines"]
+    return deadlines.get(exchange_name, deadlines["default"])
+
+
+def run_exchanges_concurrently(tasks: Dict[str, Callable[[], Any]],
+                               deadlines: Optional[Dict[str, float]] = None,
+                               ) -> Iterator[Tuple[str, Any, Optional[BaseException]]]:
+    """
+    并发执行各交易所任务，按完成顺序逐个产出结果
+
+    超过各自期限仍未完成的任务以TimeoutError产出并被放弃，不再阻塞其他交易所。
+
+    :param tasks: 交易所名称 -> 无参任务函数
+    :param deadlines: 交易所名称 -> 期限（秒），未配置的交易所不设期限
+    :return: 迭代器，产出 (交易所名称, 结果, 异常)
+    """
+    if not tasks:
+        return
+
+    deadlines = deadlines or {}
+    executor = ThreadPoolExecutor(max_workers=len(tasks))
+    start_time = time.monotonic()
+
+    try:
+        future_to_exchange = {executor.submit(func): name for name, func in tasks.items()}
+        pending = set(future_to_exchange)
+
+        while pending:
+            # 等待到最近的一个期限
+            now = time.monotonic()
+            pending_deadlines = [
+                start_time + deadlines[future_to_exchange[f]] - now
+                for f in pending if future_to_exchange[f] in deadlines
+            ]
+            timeout = max(0.0, min(pending_deadlines)) if pending_deadlines else None
+
+            done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                exchange_name = future_to_exchange[future]
+                try:
+                    yield exchange_name, future.result(), None
+                except Exception as e:
+                    yield exchange_name, None, e
+
+            # 放弃已超过期限的任务
+            now = time.monotonic()
+            for future in list(pending):
+                exchange_name = future_to_exchange[future]
+                if exchange_name in deadlines and now - start_time >= deadlines[exchange_name]:
+                    pending.discard(future)
+                    future.cancel()
+                    yield exchange_name, None, TimeoutError(
+                        f"{exchange_name} 获取超时({deadlines[exchange_name]:.0f}秒)"
+                    )
+    finally:
+        # 不等待被放弃的任务，未开始的任务直接取消
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+__all__ = [
+    'get_exchange_deadline',
+    'run_exchanges_concurrently'
+]
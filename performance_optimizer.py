@@ -22,6 +22,9 @@ import requests
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 
+from rate_limiter import rate_limited_call
+from position_store import save_positions
+
 class PerformanceOptimizer:
     """性能优化器"""
     
@@ -39,12 +42,8 @@ class PerformanceOptimizer:
         """创建优化的HTTP会话"""
         session = requests.Session()
         
-        # 配置重试策略
-        retry_strategy = Retry(
-            total=3,
-            backoff_factor=1,
-            status_forcelist=[429, 500, 502, 503, 504],
-        )
+        # 连接层不再重试：重试统一由retry_policy在调用层处理，避免多层重试相乘
+        retry_strategy = Retry(total=0, raise_on_status=False)
         
         adapter = HTTPAdapter(max_retries=retry_strategy)
         session.mount("http://", adapter)
@@ -141,17 +140,18 @@ def cached_data_fetch(func_name: str, date: str, exchange: str = None):
     
     try:
         if func_name == "get_dce_rank_table":
-            return ak.get_dce_rank_table(date=date)
+            return rate_limited_call(ak.get_dce_rank_table, date=date)
         elif func_name == "get_cffex_rank_table":
-            return ak.get_cffex_rank_table(date=date)
+            return rate_limited_call(ak.get_cffex_rank_table, date=date)
         elif func_name == "get_czce_rank_table":
-            return ak.get_czce_rank_table(date=date)
+            return rate_limited_call(ak.get_czce_rank_table, date=date)
         elif func_name == "get_shfe_rank_table":
-            return ak.get_shfe_rank_table(date=date)
+            return rate_limited_call(ak.get_shfe_rank_table, date=date)
         elif func_name == "futures_gfex_position_rank":
-            return ak.futures_gfex_position_rank(date=date)
+            return rate_limited_call(ak.futures_gfex_position_rank, date=date)
         elif func_name == "get_futures_daily" and exchange:
-            return ak.get_futures_daily(start_date=date, end_date=date, market=exchange)
+            from response_cache import fetch_futures_daily
+            return fetch_futures_daily(exchange, date, date)
         else:
             return None
     except Exception as e:
@@ -243,13 +243,9 @@ class FastDataManager:
             data_dict = cached_data_fetch(config["func_name"], trade_date)
             
             if data_dict:
-                # 保存到Excel
-                save_path = os.path.join(self.data_dir, config['filename'])
-                with pd.ExcelWriter(save_path, engine='openpyxl') as writer:
-                    for sheet_name, df in data_dict.items():
-                        # 清理sheet名称
-                        clean_name = sheet_name[:31].replace("/", "-").replace("*", "")
-                        df.to_excel(writer, sheet_name=clean_name, index=False)
+                # 保存到持仓存储
+                save_positions(data_dict, self.data_dir, config['filename'],
+                               trade_date=trade_date, exchange_name=exchange_name)
                 
                 return True
             
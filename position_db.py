@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+期货持仓分析系统 - 席位排名查询库模块
+获取流程保存持仓时同步写入嵌入式SQLite库（每行一个 日期×合约×排名类型×名次），
+按 (date, symbol, seat, side) 建索引，跨日期、跨席位、跨品种的汇总直接用SQL完成，
+不再逐个读取交易所文件循环统计。
+
+用法：
+    python position_db.py sync                                   # 从数据湖补齐历史
+    python position_db.py net --seat 中信期货 --group 黑色 --days 20
+作者：7haoge
+邮箱：953534947@qq.com
+"""
+
+import argparse
+import sqlite3
+import threading
+from contextlib import closing
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+import pandas as pd
+
+from config import STORAGE_CONFIG, SYMBOL_GROUPS
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS rankings (
+    date TEXT NOT NULL,
+    exchange TEXT NOT NULL,
+    symbol TEXT NOT NULL,
+    contract TEXT NOT NULL,
+    side TEXT NOT NULL,
+    rank INTEGER NOT NULL,
+    seat TEXT NOT NULL,
+    value INTEGER,
+    chg INTEGER,
+    PRIMARY KEY (date, exchange, contract, side, rank)
+);
+CREATE INDEX IF NOT EXISTS idx_rankings_date_symbol_seat_side ON rankings (date, symbol, seat, side);
+CREATE TABLE IF NOT EXISTS lake_imports (
+    date TEXT NOT NULL,
+    exchange TEXT NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    PRIMARY KEY (date, exchange)
+);
+"""
+
+_COLUMNS = ["date", "exchange", "symbol", "contract", "side", "rank", "seat", "value", "chg"]
+
+
+def resolve_symbols(symbols: Sequence[str] = None, group: str = None) -> Optional[List[str]]:
+    """
+    品种代码和品种分组合并为品种列表
+
+    :param symbols: 品种代码
+    :param group: SYMBOL_GROUPS中的分组名（如 黑色）
+    :return: 大写品种代码列表，都未指定返回None（全部品种）
+    """
+    if group is not None and group not in SYMBOL_GROUPS:
+        raise ValueError(f"未知的品种分组: {group}（可选: {', '.join(SYMBOL_GROUPS)}）")
+    if symbols is None and group is None:
+        return None
+    result = [symbol.upper() for symbol in (symbols or [])]
+    for symbol in SYMBOL_GROUPS.get(group, []):
+        if symbol not in result:
+            result.append(symbol)
+    return result
+
+
+class PositionDatabase:
+    """
+    席位排名查询库
+    每个 交易日×交易所 的写入在一个事务内替换，重复获取同一天时以最后一次为准。
+    每次操作使用独立连接（WAL模式），多线程、多进程可同时读写。
+    """
+
+    def __init__(self, path: str = None):
+        """
+        初始化查询库
+
+        :param path: 数据库文件路径（默认读取STORAGE_CONFIG）
+        """
+        self.path = Path(path or STORAGE_CONFIG["database_path"])
+        self._initialized = False
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        """打开连接（首次使用时建表）"""
+        with self._lock:
+            if not self._initialized:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                with closing(sqlite3.connect(self.path, timeout=30)) as connection:
+                    connection.execute("PRAGMA journal_mode=WAL")
+                    connection.executescript(_SCHEMA)
+                self._initialized = True
+        return sqlite3.connect(self.path, timeout=30)
+
+    def write_positions(self, trade_date: str, exchange_name: str, data_dict: Dict[str, pd.DataFrame]) -> int:
+        """
+        写入交易所某日的持仓排名（替换该日该交易所的已有数据）
+
+        :param trade_date: 交易日期 YYYYMMDD
+        :param exchange_name: 交易所名称
+        :param data_dict: 合约 -> 持仓数据
+        :return: 写入行数
+        """
+        from seat_history import ranking_frame
+
+        frame = ranking_frame(trade_date, {exchange_name: data_dict})
+        rows = [] if frame is None else [
+            (trade_date, exchange_name, symbol, contract, side, int(rank), seat,
+             None if pd.isna(value) else int(value), None if pd.isna(chg) else int(chg))
+            for symbol, contract, side, rank, seat, value, chg in zip(
+                frame["symbol"], frame["contract"], frame["side"], frame["rank"],
+                frame["seat"], frame["value"], frame["chg"])
+        ]
+        with closing(self._connect()) as connection, connection:
+            connection.execute("DELETE FROM rankings WHERE date = ? AND exchange = ?", (trade_date, exchange_name))
+            connection.executemany(f"INSERT INTO rankings ({', '.join(_COLUMNS)}) VALUES ({', '.join('?' * len(_COLUMNS))})", rows)
+        return len(rows)
+
+    def sync(self, lake=None, start_date: str = None, end_date: str = None) -> List[str]:
+        """
+        从数据湖导入已结算的交易所分区
+
+        导入过的分区按文件修改时间记录在lake_imports中：新结算的交易所、结算后重新写入的分区
+        都会（重新）导入，替换获取时写入的结算前数据；结算前的分区不导入。
+
+        :param lake: PositionLake（默认进程级共享数据湖）
+        :return: 本次写入的交易日
+        """
+        from position_store import POSITIONS, get_position_lake
+
+        lake = lake or get_position_lake()
+        with closing(self._connect()) as connection:
+            imported = {(trade_date, exchange_name): mtime_ns for trade_date, exchange_name, mtime_ns
+                        in connection.execute("SELECT date, exchange, mtime_ns FROM lake_imports")}
+        written = []
+        for trade_date in lake.dates(POSITIONS):
+            if (start_date and trade_date < start_date) or (end_date and trade_date > end_date):
+                continue
+            changed = False
+            for exchange_name in lake.stored_exchanges(POSITIONS, trade_date):
+                mtime_ns = lake.partition_path(POSITIONS, trade_date, exchange_name).stat().st_mtime_ns
+                if imported.get((trade_date, exchange_name)) == mtime_ns:
+                    continue
+                data_dict = lake.read_positions(trade_date, [exchange_name]).get(exchange_name)
+                if data_dict is None:
+                    continue
+                self.write_positions(trade_date, exchange_name, data_dict)
+                with closing(self._connect()) as connection, connection:
+                    connection.execute("INSERT OR REPLACE INTO lake_imports (date, exchange, mtime_ns) VALUES (?, ?, ?)",
+                                       (trade_date, exchange_name, mtime_ns))
+                changed = True
+            if changed:
+                written.append(trade_date)
+        return written
+
+    def query(self, sql: str, params: Sequence[Any] = ()) -> pd.DataFrame:
+        """执行只读SQL，返回DataFrame"""
+        with closing(self._connect()) as connection:
+            return pd.read_sql_query(sql, connection, params=list(params))
+
+    def dates(self, start_date: str = None, end_date: str = None) -> List[str]:
+        """库中的交易日（闭区间过滤）"""
+        with closing(self._connect()) as connection:
+            rows = connection.execute(
+                "SELECT DISTINCT date FROM rankings WHERE date >= ? AND date <= ? ORDER BY date",
+                (start_date or "", end_date or "99999999")).fetchall()
+        return [row[0] for row in rows]
+
+    def _date_range(self, start_date: str = None, end_date: str = None, days: int = None) -> List[str]:
+        """日期范围；给出days时取end_date（含）之前最近的days个交易日"""
+        trade_dates = self.dates(start_date, end_date)
+        return trade_dates[-days:] if days else trade_dates
+
+    def seat_positions(self, seats: Sequence[str], start_date: str = None, end_date: str = None,
+                       symbols: Sequence[str] = None, group: str = None, days: int = None) -> pd.DataFrame:
+        """
+        席位逐日逐品种的多空持仓和变化
+
+        :param seats: 席位名称
+        :param start_date: 起始日期 YYYYMMDD（含）
+        :param end_date: 结束日期 YYYYMMDD（含）
+        :param symbols: 品种代码
+        :param group: 品种分组（SYMBOL_GROUPS）
+        :param days: 只取最近的交易日数
+        :return: DataFrame[date, symbol, seat, long_pos, long_chg, short_pos, short_chg, net_chg]
+        """
+        columns = ["date", "symbol", "seat", "long_pos", "long_chg", "short_pos", "short_chg", "net_chg"]
+        trade_dates = self._date_range(start_date, end_date, days)
+        if not trade_dates or not seats:
+            return pd.DataFrame(columns=columns)
+
+        conditions = ["date >= ? AND date <= ?", f"seat IN ({', '.join('?' * len(seats))})", "side IN ('long', 'short')"]
+        params: List[Any] = [trade_dates[0], trade_dates[-1], *seats]
+        wanted = resolve_symbols(symbols, group)
+        if wanted is not None:
+            conditions.append(f"symbol IN ({', '.join('?' * len(wanted))})")
+            params.extend(wanted)
+
+        sql = f"""
+            SELECT date, symbol, seat,
+                   SUM(CASE WHEN side = 'long' THEN value ELSE 0 END) AS long_pos,
+                   SUM(CASE WHEN side = 'long' THEN chg ELSE 0 END) AS long_chg,
+                   SUM(CASE WHEN side = 'short' THEN value ELSE 0 END) AS short_pos,
+                   SUM(CASE WHEN side = 'short' THEN chg ELSE 0 END) AS short_chg
+            FROM rankings
+            WHERE {' AND '.join(conditions)}
+            GROUP BY date, symbol, seat
+            ORDER BY date, symbol, seat
+        """
+        result = self.query(sql, params)
+        result["net_chg"] = result["long_chg"] - result["short_chg"]
+        return result[columns]
+
+    def seat_net_change(self, seat: str, start_date: str = None, end_date: str = None,
+                        symbols: Sequence[str] = None, group: str = None, days: int = None) -> pd.DataFrame:
+        """
+        席位净多变化汇总（如“中信期货在黑色系品种最近20个交易日的净多变化”）
+
+        :return: DataFrame[symbol, long_chg, short_chg, net_chg, days]，按净多变化降序，末行为合计
+        """
+        daily = self.seat_positions([seat], start_date, end_date, symbols, group, days)
+        columns = ["symbol", "long_chg", "short_chg", "net_chg", "days"]
+        if daily.empty:
+            return pd.DataFrame(columns=columns)
+
+        summary = daily.groupby("symbol").agg(
+            long_chg=("long_chg", "sum"),
+            short_chg=("short_chg", "sum"),
+            net_chg=("net_chg", "sum"),
+            days=("date", "nunique"),
+        ).sort_values("net_chg", ascending=False).reset_index()
+        total = pd.DataFrame([{
+            "symbol": "合计",
+            "long_chg": summary["long_chg"].sum(),
+            "short_chg": summary["short_chg"].sum(),
+            "net_chg": summary["net_chg"].sum(),
+            "days": daily["date"].nunique(),
+        }])
+        return pd.concat([summary, total], ignore_index=True)[columns]
+
+
+_position_database: Optional[PositionDatabase] = None
+_database_lock = threading.Lock()
+
+
+def get_position_database() -> PositionDatabase:
+    """获取进程级共享查询库"""
+    global _position_database
+    with _database_lock:
+        if _position_database is None:
+            _position_database = PositionDatabase()
+        return _position_database
+
+
+def main():
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description="席位排名查询库")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    sync_parser = subparsers.add_parser("sync", help="从数据湖补齐历史交易日")
+    sync_parser.add_argument("--start", help="起始日期 YYYYMMDD")
+    sync_parser.add_argument("--end", help="结束日期 YYYYMMDD")
+
+    net_parser = subparsers.add_parser("net", help="席位净多变化汇总")
+    net_parser.add_argument("--seat", required=True, help="席位名称")
+    net_parser.add_argument("--symbol", nargs="+", help="品种代码")
+    net_parser.add_argument("--group", help=f"品种分组（{', '.join(SYMBOL_GROUPS)}）")
+    net_parser.add_argument("--start", help="起始日期 YYYYMMDD")
+    net_parser.add_argument("--end", help="结束日期 YYYYMMDD")
+    net_parser.add_argument("--days", type=int, help="最近的交易日数")
+    args = parser.parse_args()
+
+    database = get_position_database()
+    if args.command == "sync":
+        written = database.sync(start_date=args.start, end_date=args.end)
+        print(f"写入 {len(written)} 个交易日，共 {len(database.dates())} 个交易日")
+        return
+
+    result = database.seat_net_change(args.seat, args.start, args.end, args.symbol, args.group, args.days)
+    print(result.to_string(index=False) if not result.empty else "没有匹配的席位数据")
+
+
+__all__ = [
+    'PositionDatabase',
+    'get_position_database',
+    'resolve_symbols'
+]
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+期货持仓分析系统 - 持仓数据规范化模块
+各数据源的持仓排名表（交易所排名表、郑商所旧列名、新浪合并格式）在保存前统一为一种
+标准结构：英文列名、持仓/成交量为整数（有缺失值时为浮点）、席位名称为分类类型。
+分析时不再需要重命名列和解析文本数值。
+作者：7haoge
+邮箱：953534947@qq.com
+"""
+
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+# 标准列（其余列保留在其后，如交易所排名表的symbol/variety）
+RANK_COLUMN = "rank"
+SEAT_COLUMNS = ["vol_party_name", "long_party_name", "short_party_name"]
+NUMERIC_COLUMNS = ["vol", "vol_chg", "long_open_interest", "long_open_interest_chg",
+                   "short_open_interest", "short_open_interest_chg"]
+CANONICAL_COLUMNS = [
+    RANK_COLUMN,
+    "vol_party_name", "vol", "vol_chg",
+    "long_party_name", "long_open_interest", "long_open_interest_chg",
+    "short_party_name", "short_open_interest", "short_open_interest_chg",
+]
+
+# 郑商所旧列名
+_CZCE_COLUMNS = {
+    'g_party_n': 'long_party_name',
+    'open_inten': 'long_open_interest',
+    'inten_intert': 'long_open_interest_chg',
+    't_party_n': 'short_party_name',
+    'open_inten.1': 'short_open_interest',
+    'inten_intert.1': 'short_open_interest_chg',
+}
+
+# 新浪合并格式（会员简称同时是成交量、多单、空单的席位）
+_SINA_COLUMNS = {
+    '排名': RANK_COLUMN,
+    '成交量': 'vol',
+    '多单持仓': 'long_open_interest',
+    '多单变化': 'long_open_interest_chg',
+    '空单持仓': 'short_open_interest',
+    '空单变化': 'short_open_interest_chg',
+}
+
+
+def parse_numeric(series: pd.Series) -> pd.Series:
+    """文本数值（含千分位逗号、空格）转为数值；已是数值时原样返回"""
+    if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+        return series
+    text = series.astype(str).str.replace(',', '').str.replace(' ', '').replace({'nan': None})
+    return pd.to_numeric(text, errors='coerce')
+
+
+def _lots(series: pd.Series) -> pd.Series:
+    """手数列：无缺失值的整数取值为int64，否则为float64"""
+    values = parse_numeric(series)
+    if isinstance(values.dtype, np.dtype) and values.dtype.kind in 'iu':
+        return values.astype('int64')
+    values = values.astype('float64')
+    if values.notna().all() and np.array_equal(values, values.round()):
+        return values.astype('int64')
+    return values
+
+
+def _seats(series: pd.Series) -> pd.Series:
+    """席位名称列：去除首尾空白，空值保持缺失，转为分类类型"""
+    present = series.notna()
+    values = series.astype(object).where(present, None)
+    values[present] = series[present].astype(str).str.strip().tolist()
+    return values.astype('category')
+
+
+def is_canonical(df: pd.DataFrame) -> bool:
+    """是否已是标准结构（列齐全且数值列已为数值类型）"""
+    return all(col in df.columns for col in CANONICAL_COLUMNS) and all(
+        pd.api.types.is_numeric_dtype(df[col]) for col in NUMERIC_COLUMNS)
+
+
+def canonicalize_positions(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    单个合约的持仓排名表转为标准结构
+
+    :param df: 任一数据源格式的持仓排名表
+    :return: 标准结构的新DataFrame；无法识别的格式原样返回
+    """
+    if 'g_party_n' in df.columns:
+        df = df.rename(columns=_CZCE_COLUMNS)
+    elif '会员简称' in df.columns and '多单持仓' in df.columns:
+        df = df.rename(columns=_SINA_COLUMNS)
+        seats = df.pop('会员简称')
+        for col in SEAT_COLUMNS:
+            df[col] = seats
+    else:
+        df = df.copy()
+
+    if not all(col in df.columns for col in ['long_party_name', 'long_open_interest', 'short_party_name',
+                                             'short_open_interest']):
+        return df
+
+    if RANK_COLUMN not in df.columns:
+        df[RANK_COLUMN] = np.arange(1, len(df) + 1)
+    if 'vol_party_name' not in df.columns:
+        df['vol_party_name'] = df['long_party_name']
+    for col in NUMERIC_COLUMNS:
+        df[col] = _lots(df[col]) if col in df.columns else np.nan
+    df[RANK_COLUMN] = _lots(df[RANK_COLUMN])
+    for col in SEAT_COLUMNS:
+        df[col] = _seats(df[col])
+
+    extra: List[str] = [col for col in df.columns if col not in CANONICAL_COLUMNS]
+    return df[CANONICAL_COLUMNS + extra].reset_index(drop=True)
+
+
+def canonicalize_exchange(data_dict: Dict[str, pd.DataFrame]) -> Dict[str, pd.DataFrame]:
+    """交易所各合约的持仓排名表统一转为标准结构"""
+    return {name: canonicalize_positions(df) for name, df in data_dict.items()}
+
+
+__all__ = [
+    'CANONICAL_COLUMNS',
+    'NUMERIC_COLUMNS',
+    'SEAT_COLUMNS',
+    'canonicalize_exchange',
+    'canonicalize_positions',
+    'is_canonical',
+    'parse_numeric'
+]
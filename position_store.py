@@ -0,0 +1,505 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+期货持仓分析系统 - 持仓数据存储模块
+持仓数据以Parquet格式存储：每个交易所一个文件，每个合约一个行组，列为强类型；
+Excel只作为可选导出（STORAGE_CONFIG["excel_export"]）。读取时兼容旧的Excel文件。
+按日期分区的数据湖保存历史持仓和行情，历史分析直接读取，不再重新获取。
+作者：7haoge
+邮箱：953534947@qq.com
+"""
+
+import json
+import os
+import threading
+from collections import OrderedDict
+from collections.abc import Mapping
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from config import CACHE_CONFIG, STORAGE_CONFIG
+from position_schema import canonicalize_exchange
+
+# 合约键列（文件内部使用，读取时移除）
+CONTRACT_COLUMN = "__contract__"
+# Parquet元数据中记录各合约原始列和行数的键
+_METADATA_KEY = b"position_store"
+
+
+def clean_sheet_name(name: str) -> str:
+    """合约键（与Excel工作表名称规则一致，两种格式读取结果相同）"""
+    return str(name)[:31].replace("/", "-").replace("*", "")
+
+
+def store_path(data_dir: str, filename: str) -> Path:
+    """交易所持仓文件名（如 大商所持仓.xlsx）对应的Parquet路径"""
+    return Path(data_dir) / f"{Path(filename).stem}.parquet"
+
+
+def _typed_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """列类型规范化：可完整解析为数值的文本列（含千分位逗号）转为数值，其余文本列统一为字符串"""
+    for col in df.columns:
+        series = df[col]
+        if col == CONTRACT_COLUMN or pd.api.types.is_numeric_dtype(series) or pd.api.types.is_bool_dtype(series):
+            continue
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            continue
+        present = series.notna()
+        if not present.any():
+            df[col] = series.astype(object)
+            continue
+        text = series[present].astype(str).str.replace(',', '').str.strip()
+        numeric = pd.to_numeric(text, errors='coerce')
+        if numeric.notna().all():
+            df[col] = numeric.reindex(df.index)
+        else:
+            values = series.astype(object).where(present, None)
+            values[present] = series[present].astype(str).tolist()
+            df[col] = values
+    return df
+
+
+def _integer_columns(frame: pd.DataFrame) -> List[str]:
+    """取值均为整数的数值列（合并时因缺失值变为浮点，按可空整数存储）"""
+    columns = []
+    for col in frame.columns:
+        series = frame[col]
+        if pd.api.types.is_integer_dtype(series):
+            columns.append(col)
+        elif pd.api.types.is_float_dtype(series):
+            values = series.dropna()
+            if (values == values.round()).all():
+                columns.append(col)
+    return columns
+
+
+def _write_store(data_dict: Dict[str, pd.DataFrame], path: Path):
+    """将 合约 -> 持仓数据 原子写入Parquet文件（每个合约一个行组）"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    frames: List[pd.DataFrame] = []
+    contracts = []
+    categorical = set()
+    for name, df in data_dict.items():
+        df = df.rename(columns=str)
+        contracts.append({"name": clean_sheet_name(name), "columns": list(df.columns), "rows": len(df)})
+        frames.append(df.reset_index(drop=True).assign(**{CONTRACT_COLUMN: contracts[-1]["name"]}))
+        categorical.update(col for col in df.columns if isinstance(df[col].dtype, pd.CategoricalDtype))
+
+    # 所有合约合并后按列统一类型（同列同类型）；席位等分类列合并后重新分类，按字典编码存储
+    frame = _typed_frame(pd.concat(frames, ignore_index=True)) if frames else pd.DataFrame()
+    for col in _integer_columns(frame):
+        frame[col] = frame[col].astype('Int64')
+    for col in categorical:
+        frame[col] = frame[col].astype(object).where(frame[col].notna(), None).astype('category')
+    layout = {"contracts": contracts}
+    table = pa.Table.from_pandas(frame, preserve_index=False)
+    # 不保留pandas元数据：读取时按切片内实际取值决定类型（无缺失值的整数列为int64）
+    metadata = {_METADATA_KEY: json.dumps(layout, ensure_ascii=False).encode("utf-8")}
+    table = table.replace_schema_metadata(metadata)
+
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    offset = 0
+    with pq.ParquetWriter(tmp_path, table.schema, compression=STORAGE_CONFIG["compression"]) as writer:
+        for contract in contracts:
+            if contract["rows"]:
+                writer.write_table(table.slice(offset, contract["rows"]))
+            offset += contract["rows"]
+    os.replace(tmp_path, path)
+
+
+def save_positions(data_dict: Dict[str, pd.DataFrame], data_dir: str, filename: str,
+                   excel_export: bool = None, trade_date: str = None, exchange_name: str = None) -> Path:
+    """
+    保存交易所持仓数据（原子写入，先统一为标准结构）
+
+    :param data_dict: 合约 -> 持仓数据
+    :param data_dir: 数据目录
+    :param filename: 交易所持仓文件名（如 大商所持仓.xlsx）
+    :param excel_export: 是否同时导出Excel（默认读取STORAGE_CONFIG）
+    :param trade_date: 交易日期，与exchange_name同时给出时写入按日期分区的数据湖和席位排名查询库
+    :param exchange_name: 交易所名称
+    :return: Parquet文件路径
+    """
+    # 保存前统一为标准结构（各数据源格式在此处规范化一次，分析时不再解析）
+    data_dict = canonicalize_exchange(data_dict)
+
+    # Excel先于Parquet写入，保证Parquet文件较新、读取时优先
+    if STORAGE_CONFIG["excel_export"] if excel_export is None else excel_export:
+        os.makedirs(data_dir, exist_ok=True)
+        export_excel(data_dict, os.path.join(data_dir, filename))
+
+    path = store_path(data_dir, filename)
+    _write_store(data_dict, path)
+
+    if trade_date and exchange_name:
+        get_position_lake().write_positions(trade_date, exchange_name, data_dict)
+        # 同步写入席位排名查询库（失败不影响持仓保存）
+        try:
+            from position_db import get_position_database
+            get_position_database().write_positions(trade_date, exchange_name, data_dict)
+        except Exception as e:
+            print(f"  ⚠️ 席位排名查询库写入失败: {str(e)[:50]}")
+    return path
+
+
+def export_excel(data_dict: Dict[str, pd.DataFrame], save_path: str):
+    """导出为Excel工作簿（每个合约一个工作表）"""
+    with pd.ExcelWriter(save_path, engine='openpyxl') as writer:
+        for sheet_name, df in data_dict.items():
+            df.to_excel(writer, sheet_name=clean_sheet_name(sheet_name), index=False)
+
+
+def read_store(path: Path) -> Dict[str, pd.DataFrame]:
+    """读取Parquet持仓文件：合约 -> 持仓数据（列与保存时一致）"""
+    return split_store(pq.ParquetFile(path).read())
+
+
+def split_store(table: pa.Table) -> Dict[str, pd.DataFrame]:
+    """
+    持仓文件的Arrow表（含保存时的合约布局元数据，如从IPC缓冲读回的表）拆分为 合约 -> 持仓数据
+    """
+    layout = json.loads(table.schema.metadata[_METADATA_KEY])
+
+    # 在Arrow表上按合约切片（零拷贝），无缺失值的整数列直接转为int64
+    data_dict = {}
+    offset = 0
+    for contract in layout["contracts"]:
+        rows = contract["rows"]
+        data_dict[contract["name"]] = table.slice(offset, rows).select(contract["columns"]).to_pandas()
+        offset += rows
+    return data_dict
+
+
+# Parquet文件 -> (修改时间, 合约索引, 打开的文件, 读取锁)，最多保持_MAX_OPEN_STORES个文件打开
+_store_files: "OrderedDict[Path, Tuple[int, Dict[str, Dict[str, Any]], pq.ParquetFile, threading.Lock]]" = OrderedDict()
+_store_files_lock = threading.Lock()
+_MAX_OPEN_STORES = 32
+
+
+def _open_store(path: Path) -> Tuple[Dict[str, Dict[str, Any]], pq.ParquetFile, threading.Lock]:
+    """打开Parquet文件并构建合约索引（按文件修改时间缓存，文件被替换后重新打开）"""
+    path = Path(path)
+    mtime = path.stat().st_mtime_ns
+    with _store_files_lock:
+        cached = _store_files.get(path)
+        if cached and cached[0] == mtime:
+            _store_files.move_to_end(path)
+            return cached[1], cached[2], cached[3]
+
+    parquet_file = pq.ParquetFile(path)
+    metadata = parquet_file.schema_arrow.metadata or {}
+    if _METADATA_KEY in metadata:
+        contracts = json.loads(metadata[_METADATA_KEY])["contracts"]
+    else:
+        contracts = [{"name": None, "columns": parquet_file.schema_arrow.names,
+                      "rows": parquet_file.metadata.num_rows}]
+
+    # 行组边界 [起始行, 结束行)
+    bounds = []
+    position = 0
+    for i in range(parquet_file.metadata.num_row_groups):
+        rows = parquet_file.metadata.row_group(i).num_rows
+        bounds.append((position, position + rows))
+        position += rows
+
+    index = {}
+    offset = 0
+    for contract in contracts:
+        rows = contract["rows"]
+        row_groups = [i for i, (begin, end) in enumerate(bounds) if begin < offset + rows and end > offset]
+        start = offset - bounds[row_groups[0]][0] if row_groups else 0
+        index[contract["name"]] = dict(contract, offset=offset, row_groups=row_groups, start=start)
+        offset += rows
+
+    read_lock = threading.Lock()
+    with _store_files_lock:
+        _store_files[path] = (mtime, index, parquet_file, read_lock)
+        _store_files.move_to_end(path)
+        while len(_store_files) > _MAX_OPEN_STORES:
+            _store_files.popitem(last=False)
+    return index, parquet_file, read_lock
+
+
+def store_index(path: Path) -> Dict[str, Dict[str, Any]]:
+    """
+    Parquet持仓文件的合约索引（来自文件页脚，按文件修改时间缓存）
+
+    :param path: Parquet文件路径
+    :return: 合约 -> {name, columns, offset, rows, row_groups, start}；
+             row_groups为合约所在的行组，start为合约在首个行组内的起始行。
+             非持仓文件（如行情）返回单个name为None的条目
+    """
+    return _open_store(path)[0]
+
+
+def read_contract(path: Path, name: str) -> pd.DataFrame:
+    """只读取单个合约所在的行组和列"""
+    index, parquet_file, read_lock = _open_store(path)
+    entry = index[name]
+    if not entry["rows"]:
+        return pd.DataFrame(columns=entry["columns"])
+    with read_lock:
+        table = parquet_file.read_row_groups(entry["row_groups"], columns=entry["columns"])
+    return table.slice(entry["start"], entry["rows"]).to_pandas()
+
+
+class LazyPositionData(Mapping):
+    """
+    按需加载的持仓数据映射：键 -> 持仓数据
+    打开时只读取各文件页脚中的合约索引，合约首次访问时才读取其所在的行组，
+    已读取的合约按LRU保留（最多STORAGE_CONFIG["lazy_cache_size"]个）。
+    """
+
+    def __init__(self, maxsize: int = None):
+        """
+        初始化映射
+
+        :param maxsize: LRU缓存的合约数（默认读取STORAGE_CONFIG）
+        """
+        self.maxsize = maxsize or STORAGE_CONFIG["lazy_cache_size"]
+        self._sources: Dict[str, Tuple[Path, str]] = {}
+        self._frames: Dict[str, pd.DataFrame] = {}
+        self._cache: "OrderedDict[str, pd.DataFrame]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add_store(self, prefix: str, path: Path):
+        """登记Parquet持仓文件中的全部合约，键为 <prefix>_<合约>"""
+        for name in store_index(path):
+            self._sources[f"{prefix}_{name}"] = (Path(path), name)
+
+    def add_positions(self, prefix: str, data_dir: str, filename: str) -> bool:
+        """
+        登记交易所持仓文件（规则同load_positions：Parquet按需加载，旧的Excel文件整体读取）
+
+        :return: 文件是否存在
+        """
+        path = store_path(data_dir, filename)
+        if _prefer_store(path, Path(data_dir) / filename):
+            self.add_store(prefix, path)
+            return True
+        data_dict = load_positions(data_dir, filename)
+        if data_dict is None:
+            return False
+        self.add_frames(prefix, data_dict)
+        return True
+
+    def add_frames(self, prefix: str, data_dict: Dict[str, pd.DataFrame]):
+        """登记已在内存中的持仓数据（如旧的Excel文件），键为 <prefix>_<合约>"""
+        for name, df in data_dict.items():
+            key = f"{prefix}_{name}"
+            self._sources[key] = None
+            self._frames[key] = df
+
+    def __getitem__(self, key: str) -> pd.DataFrame:
+        source = self._sources[key]
+        if source is None:
+            return self._frames[key]
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return self._cache[key]
+
+        df = read_contract(*source)
+        with self._lock:
+            self._cache[key] = df
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.maxsize:
+                self._cache.popitem(last=False)
+        return df
+
+    def __iter__(self):
+        return iter(self._sources)
+
+    def __len__(self) -> int:
+        return len(self._sources)
+
+    def __contains__(self, key) -> bool:
+        return key in self._sources
+
+    def cached_keys(self) -> List[str]:
+        """当前已读取（在LRU中）的合约键"""
+        with self._lock:
+            return list(self._cache)
+
+
+def load_positions(data_dir: str, filename: str) -> Optional[Dict[str, pd.DataFrame]]:
+    """
+    读取交易所持仓数据：优先Parquet；只有Excel或Excel更新时（旧程序写入）读取Excel
+
+    :param data_dir: 数据目录
+    :param filename: 交易所持仓文件名（如 大商所持仓.xlsx）
+    :return: 合约 -> 持仓数据，文件不存在返回None
+    """
+    path = store_path(data_dir, filename)
+    if _prefer_store(path, Path(data_dir) / filename):
+        return read_store(path)
+    excel_path = Path(data_dir) / filename
+    if excel_path.exists():
+        return pd.read_excel(excel_path, sheet_name=None)
+    return None
+
+
+def _prefer_store(path: Path, excel_path: Path) -> bool:
+    """Parquet文件存在且不比同名Excel旧"""
+    return path.exists() and not (excel_path.exists() and excel_path.stat().st_mtime > path.stat().st_mtime)
+
+
+POSITIONS = "positions"
+PRICES = "prices"
+
+
+class PositionLake:
+    """
+    按日期分区的持仓/行情数据湖
+    布局：<根目录>/<positions|prices>/<交易日>/<交易所>.parquet，持仓文件内每个合约一个行组。
+    每个分区独立原子写入：不同日期、不同交易所互不覆盖；目录即目录表（catalog），
+    目录表从分区文件的页脚元数据构建，不需要额外维护可能损坏的索引文件。
+    """
+
+    def __init__(self, root: str = None, settlement_time: str = None):
+        """
+        初始化数据湖
+
+        :param root: 根目录（默认读取STORAGE_CONFIG）
+        :param settlement_time: 结算时间 HH:MM（默认读取CACHE_CONFIG），此后写入的分区视为最终数据
+        """
+        self.root = Path(root or STORAGE_CONFIG["lake_dir"])
+        self.settlement_time = settlement_time or CACHE_CONFIG["settlement_time"]
+
+    def partition_path(self, kind: str, trade_date: str, exchange_name: str) -> Path:
+        """分区文件路径"""
+        return self.root / kind / trade_date / f"{exchange_name}.parquet"
+
+    def write_positions(self, trade_date: str, exchange_name: str, data_dict: Dict[str, pd.DataFrame]) -> Path:
+        """写入交易所某日的持仓分区"""
+        path = self.partition_path(POSITIONS, trade_date, exchange_name)
+        _write_store(data_dict, path)
+        return path
+
+    def write_prices(self, trade_date: str, exchange_name: str, df: pd.DataFrame) -> Path:
+        """写入交易所某日的行情分区"""
+        path = self.partition_path(PRICES, trade_date, exchange_name)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        df.to_parquet(tmp_path, index=False, compression=STORAGE_CONFIG["compression"])
+        os.replace(tmp_path, path)
+        return path
+
+    def _partitions(self, kind: str, trade_date: str) -> List[Path]:
+        """某日的分区文件"""
+        date_dir = self.root / kind / trade_date
+        return sorted(date_dir.glob("*.parquet")) if date_dir.is_dir() else []
+
+    def is_final(self, path: Path, trade_date: str) -> bool:
+        """分区是否在结算后写入（此后不再变化，可直接用于分析）"""
+        settled = datetime.strptime(f"{trade_date} {self.settlement_time}", "%Y%m%d %H:%M")
+        return path.stat().st_mtime >= settled.timestamp()
+
+    def stored_exchanges(self, kind: str, trade_date: str, final_only: bool = True,
+                         since: float = None) -> List[str]:
+        """
+        某日已存储的交易所
+
+        :param final_only: 只返回结算后写入的分区
+        :param since: 时间戳，给出时此后写入的分区（本次获取写入的结算前数据）同样返回
+        """
+        return [path.stem for path in self._partitions(kind, trade_date)
+                if not final_only or self.is_final(path, trade_date)
+                or (since is not None and path.stat().st_mtime >= since)]
+
+    def has_positions(self, trade_date: str, min_exchanges: int = None) -> bool:
+        """某日是否已存储足够的最终持仓数据（无需重新获取）"""
+        min_exchanges = min_exchanges or STORAGE_CONFIG["min_exchanges"]
+        return len(self.stored_exchanges(POSITIONS, trade_date)) >= min_exchanges
+
+    def has_prices(self, trade_date: str, min_exchanges: int = None) -> bool:
+        """某日是否已存储足够的最终行情数据"""
+        min_exchanges = min_exchanges or STORAGE_CONFIG["min_exchanges"]
+        return len(self.stored_exchanges(PRICES, trade_date)) >= min_exchanges
+
+    def read_positions(self, trade_date: str, exchanges: List[str] = None) -> Dict[str, Dict[str, pd.DataFrame]]:
+        """读取某日持仓：交易所 -> 合约 -> 持仓数据"""
+        return {
+            path.stem: read_store(path)
+            for path in self._partitions(POSITIONS, trade_date)
+            if exchanges is None or path.stem in exchanges
+        }
+
+    def read_prices(self, trade_date: str) -> pd.DataFrame:
+        """读取某日各交易所行情（含exchange列）"""
+        frames = [pd.read_parquet(path).assign(exchange=path.stem)
+                  for path in self._partitions(PRICES, trade_date)]
+        return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+    def dates(self, kind: str = POSITIONS) -> List[str]:
+        """已存储的交易日"""
+        kind_dir = self.root / kind
+        if not kind_dir.is_dir():
+            return []
+        return sorted(path.name for path in kind_dir.iterdir() if path.is_dir() and any(path.glob("*.parquet")))
+
+    def _footer(self, path: Path) -> List[Dict[str, Any]]:
+        """分区内容（持仓为各合约的列和行数，行情为总行数），来自文件页脚"""
+        return list(store_index(path).values())
+
+    def catalog(self, kind: str = None) -> pd.DataFrame:
+        """
+        数据湖目录表
+
+        :param kind: positions/prices（默认全部）
+        :return: DataFrame[kind, date, exchange, contract, rows, written_at, final]
+        """
+        records = []
+        for kind_name in ([kind] if kind else [POSITIONS, PRICES]):
+            for trade_date in self.dates(kind_name):
+                for path in self._partitions(kind_name, trade_date):
+                    written_at = datetime.fromtimestamp(path.stat().st_mtime)
+                    final = self.is_final(path, trade_date)
+                    for contract in self._footer(path):
+                        records.append({
+                            "kind": kind_name,
+                            "date": trade_date,
+                            "exchange": path.stem,
+                            "contract": contract["name"],
+                            "rows": contract["rows"],
+                            "written_at": written_at,
+                            "final": final,
+                        })
+        return pd.DataFrame(records, columns=["kind", "date", "exchange", "contract", "rows", "written_at", "final"])
+
+
+_position_lake: Optional[PositionLake] = None
+_lake_lock = threading.Lock()
+
+
+def get_position_lake() -> PositionLake:
+    """获取进程级共享数据湖"""
+    global _position_lake
+    with _lake_lock:
+        if _position_lake is None:
+            _position_lake = PositionLake()
+        return _position_lake
+
+
+__all__ = [
+    'LazyPositionData',
+    'PositionLake',
+    'get_position_lake',
+    'clean_sheet_name',
+    'export_excel',
+    'load_positions',
+    'read_contract',
+    'read_store',
+    'save_positions',
+    'split_store',
+    'store_index',
+    'store_path',
+    'POSITIONS',
+    'PRICES'
+]
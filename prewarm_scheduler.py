@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+期货持仓分析系统 - 预热调度模块
+独立运行的调度入口：每个交易日在交易所公布持仓排名后（PREWARM_CONFIG中的时间）获取当日持仓、
+行情和基差数据，按默认家人席位完成分析并写入缓存目录，所有应用进程直接读取分析结果。
+
+用法：
+    python prewarm_scheduler.py                  # 按配置时间常驻运行
+    python prewarm_scheduler.py --once           # 立即预热最近交易日
+    python prewarm_scheduler.py --once --date 20250110
+作者：7haoge
+邮箱：953534947@qq.com
+"""
+
+import argparse
+import hashlib
+import os
+import pickle
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from config import CACHE_CONFIG, PREWARM_CONFIG, STRATEGY_CONFIG
+
+
+def get_default_retail_seats() -> List[str]:
+    """默认家人席位"""
+    return list(STRATEGY_CONFIG["家人席位反向操作策略"]["default_retail_seats"])
+
+
+def _results_path(trade_date: str, retail_seats: List[str]) -> Path:
+    """分析结果路径：<缓存目录>/<结果目录>/<日期>/<席位集合摘要>.pkl"""
+    seats_key = "|".join(sorted(retail_seats or []))
+    digest = hashlib.md5(seats_key.encode("utf-8")).hexdigest()[:12]
+    return Path(CACHE_CONFIG["cache_dir"]) / PREWARM_CONFIG["results_dir"] / trade_date / f"{digest}.pkl"
+
+
+def is_settled_result(results: Dict[str, Any]) -> bool:
+    """
+    分析结果是否可缓存：在交易日结算后完成，且没有因结算前数据被跳过的交易所
+
+    :param results: FuturesAnalysisEngine.full_analysis的返回值
+    """
+    metadata = results.get('metadata', {})
+    try:
+        settled = datetime.strptime(f"{metadata['trade_date']} {CACHE_CONFIG['settlement_time']}", "%Y%m%d %H:%M")
+        analyzed = datetime.fromisoformat(metadata['analysis_time'])
+    except (KeyError, TypeError, ValueError):
+        return False
+    # 旧格式结果没有incomplete_exchanges，无法确认完整性
+    return analyzed >= settled and metadata.get('incomplete_exchanges') == []
+
+
+def store_analysis_results(results: Dict[str, Any]) -> Optional[Path]:
+    """
+    原子写入分析结果（按交易日期和家人席位集合区分）
+    结算前完成或有不完整交易所的结果不写入，应用回退为实时获取。
+
+    :param results: FuturesAnalysisEngine.full_analysis的返回值
+    :return: 写入的文件路径，未写入或失败返回None
+    """
+    metadata = results['metadata']
+    if not is_settled_result(results):
+        print(f"  ⚠️ {metadata['trade_date']} 分析结果在结算前完成或数据不完整，不缓存")
+        return None
+    path = _results_path(metadata['trade_date'], metadata.get('retail_seats'))
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(results, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+        return path
+    except Exception as e:
+        print(f"  ⚠️ 分析结果保存失败: {str(e)[:50]}")
+        return None
+
+
+def load_prewarmed_results(trade_date: str, retail_seats: List[str] = None) -> Optional[Dict[str, Any]]:
+    """
+    读取预热好的分析结果
+
+    :param trade_date: 交易日期 YYYYMMDD
+    :param retail_seats: 家人席位（默认席位集合）
+    :return: 分析结果，未预热或结果在结算前完成/数据不完整时返回None
+    """
+    if retail_seats is None:
+        retail_seats = get_default_retail_seats()
+    path = _results_path(trade_date, retail_seats)
+    if not path.exists():
+        return None
+    try:
+        with open(path, 'rb') as f:
+            results = pickle.load(f)
+    except Exception as e:
+        print(f"  ⚠️ 预热结果读取失败: {str(e)[:50]}")
+        return None
+    return results if is_settled_result(results) else None
+
+
+def prewarm_trade_date(trade_date: str, progress_callback=None) -> Optional[Dict[str, Any]]:
+    """
+    预热单个交易日：基差/主力合约 -> 持仓 -> 行情 -> 默认席位分析 -> 写入结果
+
+    :param trade_date: 交易日期 YYYYMMDD
+    :param progress_callback: 进度回调函数
+    :return: 分析结果，失败返回None
+    """
+    from dominant_contract_index import get_contract_index
+    from futures_analyzer import FuturesAnalysisEngine
+
+    start_time = time.time()
+    print(f"🔥 开始预热 {trade_date}")
+
+    # 基差数据和主力合约（持仓获取同样会用到，提前落盘）
+    contracts = get_contract_index().get_contracts(trade_date)
+    print(f"  主力合约: {len(contracts)} 个品种")
+
+    engine = FuturesAnalysisEngine(PREWARM_CONFIG["data_dir"], get_default_retail_seats())
+    results = engine.full_analysis(trade_date, progress_callback)
+    if not results:
+        print(f"❌ {trade_date} 预热失败")
+        return None
+
+    results['metadata']['prewarmed'] = True
+    path = store_analysis_results(results)
+    if path:
+        print(f"✅ {trade_date} 预热完成，耗时 {time.time() - start_time:.1f}秒，结果: {path}")
+
+    # 已结算的交易日追加到席位历史
+    try:
+        from seat_history import get_seat_history
+        appended = get_seat_history().sync()
+        if appended:
+            print(f"  席位历史追加: {', '.join(appended)}")
+    except Exception as e:
+        print(f"  ⚠️ 席位历史追加失败: {str(e)[:50]}")
+    return results
+
+
+def _next_run(now: datetime, run_times: List[str]) -> datetime:
+    """下一个预热时间（仅工作日）"""
+    day = now.date()
+    while True:
+        if day.weekday() < 5:
+            for run_time in sorted(run_times):
+                hour, minute = map(int, run_time.split(":"))
+                candidate = datetime(day.year, day.month, day.day, hour, minute)
+                if candidate > now:
+                    return candidate
+        day += timedelta(days=1)
+
+
+def run_scheduler(run_times: List[str] = None):
+    """
+    常驻调度：在每个交易日的预热时间预热当日数据
+
+    :param run_times: 预热时间列表 HH:MM（默认读取PREWARM_CONFIG）
+    """
+    run_times = run_times or PREWARM_CONFIG["run_times"]
+    print(f"预热调度已启动，预热时间: {', '.join(run_times)}")
+
+    next_run = _next_run(datetime.now(), run_times)
+    print(f"下次预热: {next_run:%Y-%m-%d %H:%M}")
+    while True:
+        now = datetime.now()
+        if now < next_run:
+            time.sleep(min(PREWARM_CONFIG["check_interval"], (next_run - now).total_seconds()))
+            continue
+
+        try:
+            prewarm_trade_date(next_run.strftime('%Y%m%d'))
+        except Exception as e:
+            print(f"❌ 预热出错: {str(e)}")
+
+        next_run = _next_run(datetime.now(), run_times)
+        print(f"下次预热: {next_run:%Y-%m-%d %H:%M}")
+
+
+def main():
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description="期货持仓分析预热调度")
+    parser.add_argument("--once", action="store_true", help="立即预热一次后退出")
+    parser.add_argument("--date", help="预热的交易日期 YYYYMMDD（配合--once，默认最近交易日）")
+    parser.add_argument("--times", nargs="+", help="预热时间 HH:MM（覆盖配置）")
+    args = parser.parse_args()
+
+    if args.once:
+        trade_date = args.date
+        if trade_date is None:
+            day = datetime.now()
+            while day.weekday() >= 5:
+                day -= timedelta(days=1)
+            trade_date = day.strftime('%Y%m%d')
+        raise SystemExit(0 if prewarm_trade_date(trade_date) else 1)
+
+    run_scheduler(args.times)
+
+
+__all__ = [
+    'get_default_retail_seats',
+    'is_settled_result',
+    'store_analysis_results',
+    'load_prewarmed_results',
+    'prewarm_trade_date',
+    'run_scheduler'
+]
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+期货持仓分析系统 - 自适应限速模块
+所有akshare/新浪数据源共用的进程级令牌桶限速器
+作者：7haoge
+邮箱：953534947@qq.com
+"""
+
+import time
+import threading
+from typing import Any, Callable, Dict, Optional
+
+from config import RATE_LIMIT_CONFIG
+
+
+class AdaptiveRateLimiter:
+    """
+    自适应令牌桶限速器
+    - 响应快时逐步放宽速率（加性增加）
+    - 出错时立即降速并暂停一段时间（乘性减少 + 指数退避）
+    - 线程安全，同一进程内所有线程/Streamlit会话共享
+    """
+
+    def __init__(self, name: str, rate: float, burst: float, min_rate: float, max_rate: float,
+                 fast_latency: float, increase_step: float, decrease_factor: float,
+                 error_cooldown: float, max_cooldown: float):
+        self.name = name
+        self.rate = rate
+        self.burst = burst
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.fast_latency = fast_latency
+        self.increase_step = increase_step
+        self.decrease_factor = decrease_factor
+        self.error_cooldown = error_cooldown
+        self.max_cooldown = max_cooldown
+
+        self._lock = threading.Lock()
+        self._tokens = burst
+        self._last_refill = time.monotonic()
+        self._blocked_until = 0.0
+        self._consecutive_errors = 0
+        self._total_calls = 0
+        self._total_errors = 0
+        self._total_wait = 0.0
+
+    def _refill(self, now: float):
+        """按当前速率补充令牌"""
+        elapsed = now - self._last_refill
+        if elapsed > 0:
+            self._tokens = min(self.burst, self._tokens + elapsed * self.rate)
+            self._last_refill = now
+
+    def acquire(self) -> float:
+        """
+        获取一个请求令牌，必要时阻塞等待
+        :return: 实际等待时间（秒）
+        """
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+
+                if now >= self._blocked_until and self._tokens >= 1:
+                    self._tokens -= 1
+                    self._total_calls += 1
+                    self._total_wait += waited
+                    return waited
+
+                wait = max(self._blocked_until - now, (1 - self._tokens) / self.rate)
+
+            time.sleep(wait)
+            waited += wait
+
+    def record_success(self, latency: float):
+        """记录一次成功请求，响应足够快时放宽速率"""
+        with self._lock:
+            self._consecutive_errors = 0
+            if latency <= self.fast_latency:
+                self.rate = min(self.max_rate, self.rate + self.increase_step)
+
+    def record_failure(self, error: Optional[BaseException] = None):
+        """记录一次失败请求，降低速率并暂停一段时间"""
+        error_msg = str(error).lower() if error is not None else ""
+
+        with self._lock:
+            self._consecutive_errors += 1
+            self._total_errors += 1
+            self.rate = max(self.min_rate, self.rate * self.decrease_factor)
+
+            cooldown = self.error_cooldown * (2 ** (self._consecutive_errors - 1))
+            # 被限流时退避更久
+            if "rate limit" in error_msg or "429" in error_msg or "too many" in error_msg:
+                cooldown *= 2
+            cooldown = min(cooldown, self.max_cooldown)
+
+            self._blocked_until = max(self._blocked_until, time.monotonic() + cooldown)
+            self._tokens = min(self._tokens, 0)
+
+    def call(self, func: Callable, *args, **kwargs) -> Any:
+        """经限速器调用函数，并根据结果自动调整速率"""
+        self.acquire()
+        start_time = time.monotonic()
+        try:
+            result = func(*args, **kwargs)
+        except Exception as e:
+            self.record_failure(e)
+            raise
+        self.record_success(time.monotonic() - start_time)
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        """获取限速器状态"""
+        with self._lock:
+            return {
+                'name': self.name,
+                'rate': self.rate,
+                'tokens': self._tokens,
+                'blocked_for': max(0.0, self._blocked_until - time.monotonic()),
+                'consecutive_errors': self._consecutive_errors,
+                'total_calls': self._total_calls,
+                'total_errors': self._total_errors,
+                'total_wait': self._total_wait
+            }
+
+
+# 进程级限速器注册表（所有会话共享）
+_limiters: Dict[str, AdaptiveRateLimiter] = {}
+_registry_lock = threading.Lock()
+
+
+def get_limiter_key(func_or_name) -> str:
+    """根据API函数确定限速器键（同一上游主机的函数共享一个限速器）"""
+    name = func_or_name if isinstance(func_or_name, str) else getattr(func_or_name, '__name__', str(func_or_name))
+    return RATE_LIMIT_CONFIG["api_hosts"].get(name, name)
+
+
+def get_rate_limiter(func_or_name) -> AdaptiveRateLimiter:
+    """获取（必要时创建）某个上游对应的共享限速器"""
+    key = get_limiter_key(func_or_name)
+
+    with _registry_lock:
+        limiter = _limiters.get(key)
+        if limiter is None:
+            params = dict(RATE_LIMIT_CONFIG["default"])
+            params.update(RATE_LIMIT_CONFIG["limits"].get(key, {}))
+            limiter = AdaptiveRateLimiter(key, **params)
+            _limiters[key] = limiter
+        return limiter
+
+
+def rate_limited_call(func: Callable, *args, **kwargs) -> Any:
+    """经共享限速器调用akshare函数"""
+    return get_rate_limiter(func).call(func, *args, **kwargs)
+
+
+def get_all_limiter_stats() -> Dict[str, Dict[str, Any]]:
+    """获取所有限速器状态"""
+    with _registry_lock:
+        limiters = list(_limiters.values())
+    return {limiter.name: limiter.stats() for limiter in limiters}
+
+
+__all__ = [
+    'AdaptiveRateLimiter',
+    'get_limiter_key',
+    'get_rate_limiter',
+    'rate_limited_call',
+    'get_all_limiter_stats'
+]
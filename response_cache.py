@@ -0,0 +1,330 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+期货持仓分析系统 - 接口响应持久化缓存模块
+已结算交易日的持仓排名、基差数据和日行情不会再变化，响应以Parquet格式落盘后重复使用，不再发起网络请求；
+仅结算前写入的当日数据按短有效期处理。
+作者：7haoge
+邮箱：953534947@qq.com
+"""
+
+import hashlib
+import os
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, Optional, Tuple
+
+import akshare as ak
+import pandas as pd
+
+from akshare_backend import LIVE, get_backend, get_backend_mode, install_backend
+from config import CACHE_CONFIG
+from rate_limiter import rate_limited_call
+
+# 按配置/环境变量启用akshare录制或回放（所有数据获取路径都经过本模块）
+if get_backend() is None and get_backend_mode() != LIVE:
+    install_backend()
+
+# 持仓类型在文件名中的编码
+_POSITION_TYPE_CODES = {
+    "成交量": "volume",
+    "多单持仓": "long",
+    "空单持仓": "short",
+}
+
+
+class ResponseCache:
+    """
+    按 (日期, 键...) 存储DataFrame响应的磁盘缓存
+    - 结算时间之后写入的条目永久有效
+    - 结算之前写入的条目只在intraday_ttl秒内有效
+    """
+
+    def __init__(self, namespace: str, cache_dir: str = None,
+                 settlement_time: str = None, intraday_ttl: float = None,
+                 memory: bool = False):
+        """
+        初始化缓存
+
+        Args:
+            namespace: 缓存命名空间（对应一个接口）
+            cache_dir: 缓存根目录（默认读取CACHE_CONFIG）
+            settlement_time: 结算时间 HH:MM（默认读取CACHE_CONFIG）
+            intraday_ttl: 结算前写入条目的有效期（秒，默认读取CACHE_CONFIG）
+            memory: 是否在进程内保留已读取的条目（适合条目少、读取频繁的接口）
+        """
+        self.root = Path(cache_dir or CACHE_CONFIG["cache_dir"]) / namespace
+        self.settlement_time = settlement_time or CACHE_CONFIG["settlement_time"]
+        self.intraday_ttl = CACHE_CONFIG["intraday_ttl"] if intraday_ttl is None else intraday_ttl
+        self.hits = 0
+        self.misses = 0
+        self.memory = memory
+        self._memory: Dict[Path, Tuple[pd.DataFrame, Optional[float]]] = {}
+        self._lock = threading.Lock()
+
+    def _path(self, date_str: str, *key: str) -> Path:
+        """缓存文件路径：<根目录>/<日期>/<键>.parquet，无其余键时为<根目录>/<日期>.parquet"""
+        if not key:
+            return self.root / f"{date_str}.parquet"
+        name = "_".join(str(part) for part in key)
+        if not name.isascii() or os.sep in name:
+            name = hashlib.md5(name.encode("utf-8")).hexdigest()
+        return self.root / date_str / f"{name}.parquet"
+
+    def _settled_at(self, date_str: str) -> float:
+        """交易日结算时间戳"""
+        settled = datetime.strptime(f"{date_str} {self.settlement_time}", "%Y%m%d %H:%M")
+        return settled.timestamp()
+
+    def is_settled(self, date_str: str) -> bool:
+        """交易日是否已过结算时间（此后写入的条目永久有效）"""
+        return time.time() >= self._settled_at(date_str)
+
+    def _expires_at(self, written_at: float, date_str: str) -> Optional[float]:
+        """条目过期时间戳，结算后写入的条目永不过期（返回None）"""
+        if written_at >= self._settled_at(date_str):
+            return None
+        return written_at + self.intraday_ttl
+
+    def is_fresh(self, path: Path, date_str: str) -> bool:
+        """判断缓存条目是否仍然有效"""
+        expires_at = self._expires_at(path.stat().st_mtime, date_str)
+        return expires_at is None or time.time() <= expires_at
+
+    def _usable(self, expires_at: Optional[float], date_str: str, allow_expired: bool) -> bool:
+        """
+        条目是否可用：未过期的条目总是可用；allow_expired时，结算前写入的过期条目
+        仅在交易日尚未结算时可用（结算后续传必须重新获取结算后的数据）
+        """
+        if expires_at is None or time.time() <= expires_at:
+            return True
+        return allow_expired and not self.is_settled(date_str)
+
+    def _remember(self, path: Path, df: pd.DataFrame, written_at: float, date_str: str):
+        """在进程内保留条目"""
+        if self.memory:
+            with self._lock:
+                self._memory[path] = (df, self._expires_at(written_at, date_str))
+
+    def get(self, date_str: str, *key: str, allow_expired: bool = False) -> Optional[pd.DataFrame]:
+        """
+        读取缓存
+
+        Args:
+            date_str: 交易日期 YYYYMMDD
+            key: 其余键
+            allow_expired: 是否允许返回已过期的条目（交易日结算后不再返回结算前写入的条目）
+
+        Returns:
+            缓存的DataFrame，不存在或已过期返回None
+        """
+        path = self._path(date_str, *key)
+
+        with self._lock:
+            entry = self._memory.get(path)
+            if entry is not None:
+                df, expires_at = entry
+                if self._usable(expires_at, date_str, allow_expired):
+                    self.hits += 1
+                    return df
+                del self._memory[path]
+
+        try:
+            written_at = path.stat().st_mtime if path.exists() else None
+            if written_at is not None and self._usable(self._expires_at(written_at, date_str),
+                                                      date_str, allow_expired):
+                df = pd.read_parquet(path)
+                self._remember(path, df, written_at, date_str)
+                with self._lock:
+                    self.hits += 1
+                return df
+        except Exception as e:
+            print(f"    读取缓存失败 {path.name}: {str(e)[:50]}")
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, df: pd.DataFrame, date_str: str, *key: str) -> bool:
+        """
+        写入缓存（先写临时文件再原子替换，并发写入同一条目也不会产生损坏文件）
+
+        Returns:
+            是否写入成功
+        """
+        path = self._path(date_str, *key)
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            df.to_parquet(tmp_path, index=False)
+            os.replace(tmp_path, path)
+            self._remember(path, df, time.time(), date_str)
+            return True
+        except Exception as e:
+            print(f"    写入缓存失败 {path.name}: {str(e)[:50]}")
+            if tmp_path.exists():
+                tmp_path.unlink()
+            return False
+
+    def stats(self) -> dict:
+        """缓存命中统计"""
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses}
+
+
+_position_cache: Optional[ResponseCache] = None
+_position_cache_lock = threading.Lock()
+
+
+def get_position_cache() -> ResponseCache:
+    """获取futures_hold_pos_sina响应的进程级共享缓存"""
+    global _position_cache
+    with _position_cache_lock:
+        if _position_cache is None:
+            _position_cache = ResponseCache("futures_hold_pos_sina")
+        return _position_cache
+
+
+_basis_cache: Optional[ResponseCache] = None
+_basis_cache_lock = threading.Lock()
+
+
+def get_basis_cache() -> ResponseCache:
+    """获取futures_spot_price响应的进程级共享缓存（同时保留在内存中）"""
+    global _basis_cache
+    with _basis_cache_lock:
+        if _basis_cache is None:
+            _basis_cache = ResponseCache("futures_spot_price", memory=True)
+        return _basis_cache
+
+
+def fetch_spot_price(date_str: str) -> Optional[pd.DataFrame]:
+    """
+    获取指定日期的基差数据，优先使用进程内缓存和磁盘缓存
+
+    多个会话、多个进程分析同一交易日时只会请求一次接口。
+
+    Args:
+        date_str: 交易日期 YYYYMMDD
+
+    Returns:
+        akshare原始响应，接口无数据时返回None
+    """
+    cache = get_basis_cache()
+
+    df = cache.get(date_str)
+    if df is not None:
+        return df
+
+    df = rate_limited_call(ak.futures_spot_price, date_str)
+    if df is None or df.empty:
+        return None
+
+    cache.put(df, date_str)
+    return df
+
+
+_daily_cache: Optional[ResponseCache] = None
+_daily_cache_lock = threading.Lock()
+
+
+def get_daily_cache() -> ResponseCache:
+    """获取get_futures_daily响应（按交易日、交易所拆分）的进程级共享缓存"""
+    global _daily_cache
+    with _daily_cache_lock:
+        if _daily_cache is None:
+            _daily_cache = ResponseCache("get_futures_daily")
+        return _daily_cache
+
+
+def fetch_futures_daily(market: str, start_date: str, end_date: str,
+                        fetch: Callable[..., pd.DataFrame] = None) -> pd.DataFrame:
+    """
+    获取交易所日行情（区间模式），按交易日拆分后逐日缓存
+
+    缓存中缺失的交易日合并为一次区间请求；已结算但无数据的交易日（节假日）同样记录，
+    之后不再请求。
+
+    Args:
+        market: 交易所代码（DCE/CZCE/SHFE/INE/CFFEX/GFEX）
+        start_date: 开始日期 YYYYMMDD
+        end_date: 结束日期 YYYYMMDD
+        fetch: 发起网络请求的函数，参数同ak.get_futures_daily（默认经共享限速器调用）
+
+    Returns:
+        区间内的日行情，没有数据时为空DataFrame
+    """
+    from utils import get_trading_dates
+
+    cache = get_daily_cache()
+    dates = get_trading_dates(start_date, end_date)
+
+    frames = {date_str: cache.get(date_str, market) for date_str in dates}
+    missing = [date_str for date_str, df in frames.items() if df is None]
+
+    if missing:
+        if fetch is None:
+            fetch = lambda **kwargs: rate_limited_call(ak.get_futures_daily, **kwargs)
+        df = fetch(start_date=missing[0], end_date=missing[-1], market=market)
+
+        if df is not None and not df.empty:
+            day_keys = df['date'].astype(str).str.replace('-', '').str[:8]
+            for date_str, day_df in df.groupby(day_keys, sort=False):
+                day_df = day_df.reset_index(drop=True)
+                cache.put(day_df, date_str, market)
+                if date_str in frames:
+                    frames[date_str] = day_df
+            empty = df.iloc[0:0]
+        else:
+            empty = pd.DataFrame()
+
+        # 记录已结算但无数据的交易日（节假日），避免重复请求
+        for date_str in missing:
+            if frames[date_str] is None and df is not None and cache.is_settled(date_str):
+                cache.put(empty, date_str, market)
+
+    result = [df for df in frames.values() if df is not None and not df.empty]
+    return pd.concat(result, ignore_index=True) if result else pd.DataFrame()
+
+
+def fetch_hold_pos_sina(position_type: str, contract: str, date_str: str,
+                        allow_expired: bool = False) -> Optional[pd.DataFrame]:
+    """
+    获取新浪持仓排名，优先使用磁盘缓存
+
+    Args:
+        position_type: 持仓类型（成交量/多单持仓/空单持仓）
+        contract: 合约代码
+        date_str: 交易日期 YYYYMMDD
+        allow_expired: 是否接受已过期的缓存（续传未完成的获取时使用，结算后不接受结算前写入的缓存）
+
+    Returns:
+        akshare原始响应，接口无数据时返回None
+    """
+    cache = get_position_cache()
+    code = _POSITION_TYPE_CODES.get(position_type, position_type)
+
+    df = cache.get(date_str, contract, code, allow_expired=allow_expired)
+    if df is not None:
+        return df
+
+    df = rate_limited_call(ak.futures_hold_pos_sina, symbol=position_type,
+                           contract=contract, date=date_str)
+    if df is None or df.empty:
+        return None
+
+    cache.put(df, date_str, contract, code)
+    return df
+
+
+__all__ = [
+    'ResponseCache',
+    'get_position_cache',
+    'get_basis_cache',
+    'get_daily_cache',
+    'fetch_futures_daily',
+    'fetch_hold_pos_sina',
+    'fetch_spot_price'
+]
@@ -3,10 +3,12 @@ import akshare as ak
 import pandas as pd
 from datetime import datetime
 from retail_reverse_strategy import analyze_all_positions, print_results
+from rate_limiter import rate_limited_call
+from position_store import save_positions
 
 def fetch_futures_data(trade_date, save_dir):
     """
-    按日期自动下载五大交易所持仓数据，保存为Excel文件
+    按日期自动下载五大交易所持仓数据，保存到持仓存储（Parquet）
     """
     exchanges = {
         "郑商所": {
@@ -38,15 +40,14 @@ def fetch_futures_data(trade_date, save_dir):
     os.makedirs(save_dir, exist_ok=True)
     for exchange_name, config in exchanges.items():
         try:
-            data_dict = config["func"](date=trade_date)
+            data_dict = rate_limited_call(config["func"], date=trade_date)
             if not data_dict:
                 print(f"{exchange_name} 没有获取到数据")
                 continue
-            save_path = os.path.join(save_dir, config['filename'])
-            with pd.ExcelWriter(save_path) as writer:
-                for raw_sheet_name, df in data_dict.items():
-                    clean_name = config["sheet_handler"](raw_sheet_name)
-                    df.to_excel(writer, sheet_name=clean_name, index=False)
+            save_path = save_positions(
+                {config["sheet_handler"](raw_sheet_name): df for raw_sheet_name, df in data_dict.items()},
+                save_dir, config['filename']
+            )
             print(f"{exchange_name} 数据已保存到 {save_path}")
         except Exception as e:
             print(f"{exchange_name} 数据获取失败: {e}")
@@ -1,5 +1,8 @@
 import pandas as pd
 import os
+from position_schema import is_canonical, parse_numeric
+from position_store import load_positions
+from strategy_kernels import RETAIL_COLUMNS, require_result, retail_seat_stats
 
 class RetailReverseStrategy:
     """散户反向操作策略"""
@@ -8,37 +11,36 @@ class RetailReverseStrategy:
 
     def analyze(self, df):
         try:
-            # 统计家人席位的多空变化（合并同一席位）
-            seat_stats = {name: {'long_chg': 0, 'short_chg': 0} for name in self.retail_seats}
-            for _, row in df.iterrows():
-                if row['long_party_name'] in self.retail_seats:
-                    seat_stats[row['long_party_name']]['long_chg'] += row['long_open_interest_chg'] if pd.notna(row['long_open_interest_chg']) else 0
-                if row['short_party_name'] in self.retail_seats:
-                    seat_stats[row['short_party_name']]['short_chg'] += row['short_open_interest_chg'] if pd.notna(row['short_open_interest_chg']) else 0
+            stats = retail_seat_stats({'contract': df}, self.retail_seats)['contract']
+            return self.signal(stats)
+        except Exception as e:
+            return "错误", f"数据处理错误：{str(e)}", 0, None
 
-            # 只保留有变化的席位
-            seat_details = []
-            for seat, chg in seat_stats.items():
-                if chg['long_chg'] != 0 or chg['short_chg'] != 0:
-                    seat_details.append({'seat_name': seat, 'long_chg': chg['long_chg'], 'short_chg': chg['short_chg']})
+    def signal(self, stats):
+        """根据家人席位统计（strategy_kernels.retail_seat_stats）判断信号"""
+        stats = require_result(stats, RETAIL_COLUMNS)
 
-            if not seat_details:
-                return "中性", "未发现家人席位持仓变化", 0, None
+        # 只保留有变化的席位
+        seat_details = []
+        for seat, chg in stats['seats'].items():
+            if chg['long_chg'] != 0 or chg['short_chg'] != 0:
+                seat_details.append({'seat_name': seat, 'long_chg': chg['long_chg'], 'short_chg': chg['short_chg']})
 
-            # 判断信号
-            all_long_increase = all(seat['long_chg'] > 0 for seat in seat_details)
-            all_short_increase = all(seat['short_chg'] > 0 for seat in seat_details)
-            total_position = df['long_open_interest'].sum() + df['short_open_interest'].sum()
-            retail_position = sum([abs(seat['long_chg']) + abs(seat['short_chg']) for seat in seat_details])
-            position_ratio = retail_position / total_position if total_position > 0 else 0
+        if not seat_details:
+            return "中性", "未发现家人席位持仓变化", 0, None
 
-            if all_long_increase:
-                return "看空", f"家人席位多单增加，持仓占比{position_ratio:.2%}", position_ratio, seat_details
-            elif all_short_increase:
-                return "看多", f"家人席位空单增加，持仓占比{position_ratio:.2%}", position_ratio, seat_details
-            return "中性", "家人席位持仓变化不符合策略要求", 0, seat_details
-        except Exception as e:
-            return "错误", f"数据处理错误：{str(e)}", 0, None
+        # 判断信号
+        all_long_increase = all(seat['long_chg'] > 0 for seat in seat_details)
+        all_short_increase = all(seat['short_chg'] > 0 for seat in seat_details)
+        total_position = stats['total_long'] + stats['total_short']
+        retail_position = sum([abs(seat['long_chg']) + abs(seat['short_chg']) for seat in seat_details])
+        position_ratio = retail_position / total_position if total_position > 0 else 0
+
+        if all_long_increase:
+            return "看空", f"家人席位多单增加，持仓占比{position_ratio:.2%}", position_ratio, seat_details
+        elif all_short_increase:
+            return "看多", f"家人席位空单增加，持仓占比{position_ratio:.2%}", position_ratio, seat_details
+        return "中性", "家人席位持仓变化不符合策略要求", 0, seat_details
 
 def process_position_data(df):
     # 适配郑商所格式
@@ -57,14 +59,15 @@ def process_position_data(df):
                       'vol']
     if not all(col in df.columns for col in required_columns):
         return None
-    # 不再限制前20名，遍历所有数据
+    # 不再限制前20名，遍历所有数据（保存时已规范化的数据无需解析）
+    if is_canonical(df):
+        return df
     df = df.copy()
     numeric_columns = ['long_open_interest', 'long_open_interest_chg',
                      'short_open_interest', 'short_open_interest_chg',
                      'vol']
     for col in numeric_columns:
-        df[col] = df[col].astype(str).str.replace(',', '').str.replace(' ', '').replace({'nan': None})
-        df[col] = pd.to_numeric(df[col], errors='coerce')
+        df[col] = parse_numeric(df[col])
     return df
 
 def analyze_all_positions(data_dir):
@@ -76,47 +79,49 @@ def analyze_all_positions(data_dir):
         '广期所': '广期所持仓.xlsx'
     }
     strategy = RetailReverseStrategy()
-    results = {}
+    processed = {}
     for exchange_name, file_name in exchanges.items():
-        file_path = os.path.join(data_dir, file_name)
-        if not os.path.exists(file_path):
+        data_dict = load_positions(data_dir, file_name)
+        if data_dict is None:
             continue
-        data_dict = pd.read_excel(file_path, sheet_name=None)
         for contract_name, df in data_dict.items():
             processed_df = process_position_data(df)
             if processed_df is not None:
-                signal, reason, strength, seat_details = strategy.analyze(processed_df)
-                # 计算家人席位持仓占比
-                retail_long_position = 0
-                retail_short_position = 0
-                
-                # 计算家人席位的实际持仓量
-                for _, row in processed_df.iterrows():
-                    if row['long_party_name'] in ["东方财富", "平安期货", "徽商期货"]:
-                        retail_long_position += row['long_open_interest'] if pd.notna(row['long_open_interest']) else 0
-                    if row['short_party_name'] in ["东方财富", "平安期货", "徽商期货"]:
-                        retail_short_position += row['short_open_interest'] if pd.notna(row['short_open_interest']) else 0
-                
-                total_long = processed_df['long_open_interest'].sum()
-                total_short = processed_df['short_open_interest'].sum()
-                
-                # 根据信号类型计算占比
-                if signal == '看多':
-                    # 看多信号是因为家人空单增加，显示家人空单占比
-                    retail_ratio = retail_short_position / total_short if total_short > 0 else 0
-                elif signal == '看空':
-                    # 看空信号是因为家人多单增加，显示家人多单占比
-                    retail_ratio = retail_long_position / total_long if total_long > 0 else 0
-                else:
-                    retail_ratio = 0
-                results[f"{exchange_name}_{contract_name}"] = {
-                    'signal': signal,
-                    'reason': reason,
-                    'strength': strength,
-                    'seat_details': seat_details,
-                    'raw_df': processed_df,
-                    'retail_ratio': retail_ratio
-                }
+                processed[f"{exchange_name}_{contract_name}"] = processed_df
+
+    # 所有合约一次统计家人席位（信号判断和持仓占比共用同一份统计）
+    all_stats = retail_seat_stats(processed, strategy.retail_seats)
+    results = {}
+    for contract, processed_df in processed.items():
+        stats = all_stats[contract]
+        try:
+            signal, reason, strength, seat_details = strategy.signal(stats)
+        except Exception as e:
+            signal, reason, strength, seat_details = "错误", f"数据处理错误：{str(e)}", 0, None
+        # 家人席位的实际持仓量
+        retail_long_position = sum(seat['long_pos'] for seat in stats['seats'].values()) if stats else 0
+        retail_short_position = sum(seat['short_pos'] for seat in stats['seats'].values()) if stats else 0
+        
+        total_long = processed_df['long_open_interest'].sum()
+        total_short = processed_df['short_open_interest'].sum()
+        
+        # 根据信号类型计算占比
+        if signal == '看多':
+            # 看多信号是因为家人空单增加，显示家人空单占比
+            retail_ratio = retail_short_position / total_short if total_short > 0 else 0
+        elif signal == '看空':
+            # 看空信号是因为家人多单增加，显示家人多单占比
+            retail_ratio = retail_long_position / total_long if total_long > 0 else 0
+        else:
+            retail_ratio = 0
+        results[contract] = {
+            'signal': signal,
+            'reason': reason,
+            'strength': strength,
+            'seat_details': seat_details,
+            'raw_df': processed_df,
+            'retail_ratio': retail_ratio
+        }
     return results
 
 def print_results(results):
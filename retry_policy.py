@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+期货持仓分析系统 - 统一重试策略模块
+所有数据获取使用同一个重试策略：指数退避+随机抖动，按错误类型决定重试次数，
+并由每次运行共享的重试预算限制总重试次数和总等待时间，避免多层重试相乘。
+作者：7haoge
+邮箱：953534947@qq.com
+"""
+
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+from config import RETRY_CONFIG
+
+# 错误类型
+TIMEOUT = "timeout"
+RATE_LIMIT = "rate_limit"
+NETWORK = "network"
+EMPTY = "empty"
+DATA = "data"
+OTHER = "other"
+
+
+class EmptyResultError(Exception):
+    """调用返回空结果"""
+
+
+def classify_error(error: BaseException) -> str:
+    """
+    判断错误类型
+    :param error: 异常
+    :return: 错误类型（timeout/rate_limit/network/empty/data/other）
+    """
+    if isinstance(error, EmptyResultError):
+        return EMPTY
+    if isinstance(error, TimeoutError):
+        return TIMEOUT
+
+    message = str(error).lower()
+    if "429" in message or "too many" in message or "rate limit" in message:
+        return RATE_LIMIT
+    if "timed out" in message or "timeout" in message:
+        return TIMEOUT
+
+    try:
+        import requests
+        if isinstance(error, requests.exceptions.Timeout):
+            return TIMEOUT
+        if isinstance(error, requests.exceptions.ConnectionError):
+            return NETWORK
+    except ImportError:
+        pass
+
+    if isinstance(error, (ConnectionError, OSError)):
+        return NETWORK
+    if isinstance(error, (KeyError, IndexError, ValueError, TypeError, AttributeError)):
+        return DATA
+    return OTHER
+
+
+class RetryBudget:
+    """
+    单次运行的重试预算（线程安全）
+    同一次运行中所有调用的重试共享总次数和总等待时间上限。
+    """
+
+    def __init__(self, max_retries: int = None, max_retry_seconds: float = None):
+        """
+        初始化重试预算
+
+        :param max_retries: 最多重试次数（默认读取RETRY_CONFIG）
+        :param max_retry_seconds: 最多累计退避时间（秒，默认读取RETRY_CONFIG）
+        """
+        budget = RETRY_CONFIG["budget"]
+        self.max_retries = budget["max_retries"] if max_retries is None else max_retries
+        self.max_retry_seconds = budget["max_retry_seconds"] if max_retry_seconds is None else max_retry_seconds
+        self.retries = 0
+        self.retry_seconds = 0.0
+        self.denied = 0
+        self._lock = threading.Lock()
+
+    def try_spend(self, delay: float) -> bool:
+        """申请一次重试，预算不足时返回False"""
+        with self._lock:
+            if self.retries >= self.max_retries or self.retry_seconds + delay > self.max_retry_seconds:
+                self.denied += 1
+                return False
+            self.retries += 1
+            self.retry_seconds += delay
+            return True
+
+    def stats(self) -> Dict[str, Any]:
+        """预算使用情况"""
+        with self._lock:
+            return {
+                "retries": self.retries,
+                "retry_seconds": round(self.retry_seconds, 2),
+                "denied": self.denied,
+            }
+
+
+class RetryPolicy:
+    """
+    重试策略
+    - 第n次重试的退避为 [0, min(max_delay, base_delay * multiplier^(n-1))] 内的随机值
+    - rules按错误类型覆盖max_attempts/base_delay/max_delay
+    """
+
+    def __init__(self, max_attempts: int = None, base_delay: float = None, multiplier: float = None,
+                 max_delay: float = None, rules: Dict[str, Dict[str, float]] = None):
+        """
+        初始化重试策略（未指定的参数读取RETRY_CONFIG）
+
+        :param max_attempts: 最多尝试次数（含首次）
+        :param base_delay: 首次重试的退避上限（秒）
+        :param multiplier: 退避倍数
+        :param max_delay: 单次退避上限（秒）
+        :param rules: 错误类型 -> 参数覆盖
+        """
+        self.max_attempts = max_attempts or RETRY_CONFIG["max_attempts"]
+        self.base_delay = RETRY_CONFIG["base_delay"] if base_delay is None else base_delay
+        self.multiplier = multiplier or RETRY_CONFIG["multiplier"]
+        self.max_delay = RETRY_CONFIG["max_delay"] if max_delay is None else max_delay
+        self.rules = RETRY_CONFIG["rules"] if rules is None else rules
+
+    def _rule(self, error_class: str, name: str, default: Any) -> Any:
+        """错误类型对应的参数"""
+        return self.rules.get(error_class, {}).get(name, default)
+
+    def max_attempts_for(self, error_class: str, max_attempts: int = None) -> int:
+        """错误类型允许的最多尝试次数（不超过调用方指定的上限）"""
+        attempts = self._rule(error_class, "max_attempts", self.max_attempts)
+        return min(attempts, max_attempts) if max_attempts else attempts
+
+    def backoff(self, retry_number: int, error_class: str = OTHER) -> float:
+        """第retry_number次重试的退避时间（秒，全抖动）"""
+        base_delay = self._rule(error_class, "base_delay", self.base_delay)
+        max_delay = self._rule(error_class, "max_delay", self.max_delay)
+        ceiling = min(max_delay, base_delay * self.multiplier ** (retry_number - 1))
+        return random.uniform(0, ceiling)
+
+    def call(self, func: Callable, *args, budget: RetryBudget = None, max_attempts: int = None,
+             retry_if_result: Callable[[Any], bool] = None,
+             on_retry: Callable[[int, BaseException, float], None] = None, **kwargs) -> Any:
+        """
+        按策略执行调用
+
+        :param func: 被调用函数
+        :param budget: 本次运行的重试预算（None表示不限）
+        :param max_attempts: 调用方指定的尝试次数上限
+        :param retry_if_result: 结果判定函数，返回True时视为空结果按empty规则重试
+        :param on_retry: 重试前回调 (已失败次数, 异常, 退避秒数)
+        :return: 函数返回值；空结果重试用完时返回最后一次的结果
+        :raises: 不再重试时抛出最后一次的异常
+        """
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                result = func(*args, **kwargs)
+                if retry_if_result is None or not retry_if_result(result):
+                    return result
+                error: BaseException = EmptyResultError(f"{getattr(func, '__name__', 'call')} 返回空结果")
+            except Exception as e:
+                result = None
+                error = e
+
+            error_class = classify_error(error)
+            if attempt >= self.max_attempts_for(error_class, max_attempts):
+                return self._give_up(error, result)
+
+            delay = self.backoff(attempt, error_class)
+            if budget is not None and not budget.try_spend(delay):
+                return self._give_up(error, result)
+
+            if on_retry:
+                on_retry(attempt, error, delay)
+            time.sleep(delay)
+
+    @staticmethod
+    def _give_up(error: BaseException, result: Any) -> Any:
+        """放弃重试：空结果返回结果本身，其他错误抛出异常"""
+        if isinstance(error, EmptyResultError):
+            return result
+        raise error
+
+
+_default_policy: Optional[RetryPolicy] = None
+_policy_lock = threading.Lock()
+
+
+def get_retry_policy() -> RetryPolicy:
+    """获取按RETRY_CONFIG构建的默认重试策略"""
+    global _default_policy
+    with _policy_lock:
+        if _default_policy is None:
+            _default_policy = RetryPolicy()
+        return _default_policy
+
+
+__all__ = [
+    'EmptyResultError',
+    'RetryBudget',
+    'RetryPolicy',
+    'classify_error',
+    'get_retry_policy'
+]
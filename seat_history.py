@@ -0,0 +1,404 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+期货持仓分析系统 - 席位历史存储模块
+多年的逐日席位排名以Arrow IPC文件追加存储：每个交易日一个段文件，段内按
+品种、合约、排名类型、名次排序，并在元数据中记录各品种的行区间。
+读取时内存映射段文件，按日期范围和品种取的切片不复制数据，扫描多年历史
+受页缓存而不是内存限制；按席位过滤只复制命中的行。
+
+用法：
+    python seat_history.py sync                      # 把数据湖中已结算的交易日追加到席位历史
+    python seat_history.py flows --seat 东方财富 --start 20240101 --end 20241231
+作者：7haoge
+邮箱：953534947@qq.com
+"""
+
+import argparse
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from config import STORAGE_CONFIG
+from position_schema import parse_numeric
+
+# 排名类型
+VOLUME = "vol"
+LONG = "long"
+SHORT = "short"
+
+# 排名类型 -> (席位列, 数值列, 变化列)，列名为StrategyAnalyzer标准化后的列名
+_SIDE_COLUMNS = {
+    VOLUME: ("vol_party_name", "vol", "vol_chg"),
+    LONG: ("long_party_name", "long_open_interest", "long_open_interest_chg"),
+    SHORT: ("short_party_name", "short_open_interest", "short_open_interest_chg"),
+}
+
+SEAT_HISTORY_SCHEMA = pa.schema([
+    ("date", pa.int32()),
+    ("exchange", pa.dictionary(pa.int8(), pa.string())),
+    ("symbol", pa.dictionary(pa.int16(), pa.string())),
+    ("contract", pa.dictionary(pa.int32(), pa.string())),
+    ("side", pa.dictionary(pa.int8(), pa.string())),
+    ("rank", pa.int16()),
+    ("seat", pa.dictionary(pa.int32(), pa.string())),
+    ("value", pa.int64()),
+    ("chg", pa.int64()),
+])
+
+# 段文件元数据中记录品种行区间的键
+_INDEX_KEY = b"seat_history"
+
+
+def contract_symbol(contract: str) -> str:
+    """合约键对应的品种代码：'豆一(A)' -> 'A'，'a2501' -> 'A'"""
+    contract = str(contract)
+    if "(" in contract and contract.endswith(")"):
+        return contract[contract.rindex("(") + 1:-1].upper()
+    symbol = ''.join(c for c in contract if c.isalpha()).upper()
+    return symbol or contract
+
+
+def _numeric(series: pd.Series) -> np.ndarray:
+    """数值列（兼容带千分位逗号的文本）"""
+    return parse_numeric(series).to_numpy(dtype=float, na_value=np.nan)
+
+
+def _seat_rows(df: pd.DataFrame) -> List[Tuple[str, np.ndarray, np.ndarray, np.ndarray, np.ndarray]]:
+    """
+    单个合约的宽表拆为各排名类型的 (排名类型, 名次, 席位, 数值, 变化)
+
+    名次取原表的行号，还原时各排名类型按行对齐，与原表一致。
+    """
+    rows = []
+    ranks = np.arange(1, len(df) + 1)
+    for side, (seat_col, value_col, chg_col) in _SIDE_COLUMNS.items():
+        if value_col not in df.columns:
+            continue
+        # 新浪合并格式只有会员简称一列，成交量席位与多单席位相同
+        if seat_col not in df.columns:
+            seat_col = "long_party_name"
+        if seat_col not in df.columns:
+            continue
+        seats = df[seat_col].astype(str).str.strip()
+        present = (df[seat_col].notna() & (seats != "")).to_numpy()
+        values = _numeric(df[value_col])
+        changes = _numeric(df[chg_col]) if chg_col in df.columns else np.full(len(df), np.nan)
+        rows.append((side, ranks[present], seats.to_numpy(dtype=object)[present], values[present], changes[present]))
+    return rows
+
+
+def ranking_frame(trade_date: str, exchange_data: Dict[str, Dict[str, pd.DataFrame]]) -> Optional[pd.DataFrame]:
+    """
+    某日各交易所持仓排名表 -> 长表
+
+    :param trade_date: 交易日期 YYYYMMDD
+    :param exchange_data: 交易所 -> 合约 -> 持仓数据
+    :return: DataFrame[date, exchange, symbol, contract, side, rank, seat, value, chg]，没有数据返回None
+    """
+    from futures_analyzer import StrategyAnalyzer
+
+    analyzer = StrategyAnalyzer([])
+    columns: Dict[str, list] = {name: [] for name in ("exchange", "symbol", "contract", "side", "rank", "seat", "value", "chg")}
+    for exchange_name, data_dict in exchange_data.items():
+        for contract, df in data_dict.items():
+            symbol = contract_symbol(contract)
+            for side, ranks, seats, values, changes in _seat_rows(analyzer._standardize_columns(df)):
+                count = len(ranks)
+                columns["exchange"].append(np.full(count, exchange_name, dtype=object))
+                columns["symbol"].append(np.full(count, symbol, dtype=object))
+                columns["contract"].append(np.full(count, contract, dtype=object))
+                columns["side"].append(np.full(count, side, dtype=object))
+                columns["rank"].append(ranks)
+                columns["seat"].append(seats)
+                columns["value"].append(values)
+                columns["chg"].append(changes)
+    if not columns["rank"] or not sum(len(ranks) for ranks in columns["rank"]):
+        return None
+
+    frame = pd.DataFrame({name: np.concatenate(parts) for name, parts in columns.items()})
+    frame.insert(0, "date", int(trade_date))
+    for col in ("value", "chg"):
+        frame[col] = frame[col].round().astype("Int64")
+    return frame[SEAT_HISTORY_SCHEMA.names]
+
+
+def _segment_table(trade_date: str, exchange_data: Dict[str, Dict[str, pd.DataFrame]]) -> Optional[pa.Table]:
+    """某日各交易所持仓 -> 排好序的段表"""
+    frame = ranking_frame(trade_date, exchange_data)
+    if frame is None:
+        return None
+
+    frame = frame.sort_values(["symbol", "exchange", "contract", "side", "rank"], kind="stable", ignore_index=True)
+    columns = {}
+    for field in SEAT_HISTORY_SCHEMA:
+        values = frame[field.name]
+        if pa.types.is_dictionary(field.type):
+            columns[field.name] = pa.array(values.astype(object), pa.string()).dictionary_encode().cast(field.type)
+        else:
+            columns[field.name] = pa.array(values, field.type, from_pandas=True)
+    return pa.table(columns, schema=SEAT_HISTORY_SCHEMA)
+
+
+def _symbol_index(table: pa.Table) -> Dict[str, List[int]]:
+    """品种 -> [起始行, 行数]（段表已按品种排序）"""
+    symbols = table.column("symbol").to_pandas().astype(str)
+    index = {}
+    for position, symbol in enumerate(symbols):
+        if symbol in index:
+            index[symbol][1] += 1
+        else:
+            index[symbol] = [position, 1]
+    return index
+
+
+class SeatHistoryStore:
+    """
+    追加式席位历史存储
+    布局：<根目录>/<交易日>.arrow，每个交易日一个段文件，段元数据记录包含的交易所；
+    写入后只在数据湖中该日已结算的交易所增加时整段重写，其余情况只追加新的交易日。
+    段文件内存映射后常驻在进程内，多个查询共享同一份映射。
+    """
+
+    def __init__(self, root: str = None):
+        """
+        初始化席位历史存储
+
+        :param root: 根目录（默认读取STORAGE_CONFIG）
+        """
+        self.root = Path(root or STORAGE_CONFIG["seat_history_dir"])
+        self._segments: Dict[str, Tuple[int, pa.Table, Dict[str, List[int]]]] = {}
+        self._lock = threading.Lock()
+
+    def segment_path(self, trade_date: str) -> Path:
+        """段文件路径"""
+        return self.root / f"{trade_date}.arrow"
+
+    def dates(self, start_date: str = None, end_date: str = None) -> List[str]:
+        """已存储的交易日（闭区间过滤）"""
+        if not self.root.is_dir():
+            return []
+        return sorted(
+            path.stem for path in self.root.glob("*.arrow")
+            if (start_date is None or path.stem >= start_date) and (end_date is None or path.stem <= end_date)
+        )
+
+    def append(self, trade_date: str, exchange_data: Dict[str, Dict[str, pd.DataFrame]],
+               replace: bool = False) -> Optional[Path]:
+        """
+        追加一个交易日
+
+        :param trade_date: 交易日期 YYYYMMDD
+        :param exchange_data: 交易所 -> 合约 -> 持仓数据（PositionLake.read_positions的格式）
+        :param replace: 是否覆盖已存在的交易日（已打开的映射不受影响）
+        :return: 段文件路径，没有可写入的数据返回None
+        """
+        path = self.segment_path(trade_date)
+        if path.exists() and not replace:
+            return path
+
+        table = _segment_table(trade_date, exchange_data)
+        if table is None:
+            return None
+
+        index = {"trade_date": trade_date, "exchanges": sorted(exchange_data), "symbols": _symbol_index(table)}
+        table = table.replace_schema_metadata({_INDEX_KEY: json.dumps(index, ensure_ascii=False)})
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        # 整个段写成一个记录批，切片即为同一块映射内存上的偏移
+        with pa.OSFile(str(tmp_path), "wb") as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table, max_chunksize=max(table.num_rows, 1))
+        os.replace(tmp_path, path)
+        return path
+
+    def segment_exchanges(self, trade_date: str) -> List[str]:
+        """段文件包含的交易所（早期段文件元数据中没有记录时从数据中读取）"""
+        with pa.memory_map(str(self.segment_path(trade_date)), "r") as source:
+            index = json.loads(pa.ipc.open_file(source).schema.metadata[_INDEX_KEY])
+        if "exchanges" in index:
+            return index["exchanges"]
+        table, _ = self._segment(trade_date)
+        return sorted(set(table.column("exchange").cast(pa.string()).to_pylist()))
+
+    def sync(self, lake=None, start_date: str = None, end_date: str = None) -> List[str]:
+        """
+        把数据湖中已结算（数据不再变化）的交易日追加到席位历史
+        已存储的交易日在数据湖中该日已结算的交易所增加时整段重写（先结算的交易所先写入的情况）。
+
+        :param lake: PositionLake（默认进程级共享数据湖）
+        :return: 本次追加或重写的交易日
+        """
+        from position_store import POSITIONS, get_position_lake
+
+        lake = lake or get_position_lake()
+        stored = set(self.dates())
+        appended = []
+        for trade_date in lake.dates(POSITIONS):
+            if (start_date and trade_date < start_date) or (end_date and trade_date > end_date):
+                continue
+            if not lake.has_positions(trade_date):
+                continue
+            exchanges = lake.stored_exchanges(POSITIONS, trade_date)
+            replace = trade_date in stored
+            if replace and set(exchanges) <= set(self.segment_exchanges(trade_date)):
+                continue
+            if self.append(trade_date, lake.read_positions(trade_date, exchanges), replace=replace):
+                appended.append(trade_date)
+        return appended
+
+    def _segment(self, trade_date: str) -> Tuple[pa.Table, Dict[str, List[int]]]:
+        """内存映射的段表和品种索引（按文件修改时间缓存）"""
+        path = self.segment_path(trade_date)
+        mtime = path.stat().st_mtime_ns
+        with self._lock:
+            cached = self._segments.get(trade_date)
+            if cached and cached[0] == mtime:
+                return cached[1], cached[2]
+
+        source = pa.memory_map(str(path), "r")
+        table = pa.ipc.open_file(source).read_all()
+        index = json.loads(table.schema.metadata[_INDEX_KEY])["symbols"]
+        table = table.replace_schema_metadata(None)
+        with self._lock:
+            self._segments[trade_date] = (mtime, table, index)
+        return table, index
+
+    def scan(self, start_date: str = None, end_date: str = None, symbols: List[str] = None,
+             seats: List[str] = None) -> pa.Table:
+        """
+        按日期范围、品种、席位取历史数据
+
+        :param start_date: 起始日期 YYYYMMDD（含）
+        :param end_date: 结束日期 YYYYMMDD（含）
+        :param symbols: 品种代码（如 ['A', 'RB']，默认全部）
+        :param seats: 席位名称（默认全部）
+        :return: 按段拼接的Arrow表；不含席位过滤时不复制数据
+        """
+        wanted = [symbol.upper() for symbol in symbols] if symbols else None
+        pieces = []
+        for trade_date in self.dates(start_date, end_date):
+            table, index = self._segment(trade_date)
+            if wanted is None:
+                pieces.append(table)
+                continue
+            for symbol in wanted:
+                if symbol in index:
+                    offset, rows = index[symbol]
+                    pieces.append(table.slice(offset, rows))
+        if not pieces:
+            return SEAT_HISTORY_SCHEMA.empty_table()
+
+        result = pa.concat_tables(pieces)
+        if seats:
+            result = result.filter(pc.is_in(result.column("seat").cast(pa.string()),
+                                             value_set=pa.array(list(seats), pa.string())))
+        return result
+
+    def seat_flows(self, seats: List[str], start_date: str = None, end_date: str = None,
+                   symbols: List[str] = None) -> pd.DataFrame:
+        """
+        席位资金流：每日每个品种各席位的成交量/多单/空单及变化合计
+
+        :return: DataFrame[date, symbol, seat, side, value, chg]
+        """
+        table = self.scan(start_date, end_date, symbols, seats)
+        columns = ["date", "symbol", "seat", "side", "value", "chg"]
+        if table.num_rows == 0:
+            return pd.DataFrame(columns=columns)
+
+        keys = ["date", "symbol", "seat", "side"]
+        table = table.select(keys + ["value", "chg"])
+        table = pa.table({name: (table.column(name).cast(pa.string()) if name in ("symbol", "seat", "side")
+                                 else table.column(name)) for name in table.column_names})
+        grouped = table.group_by(keys).aggregate([("value", "sum"), ("chg", "sum")]).to_pandas()
+        grouped = grouped.rename(columns={"value_sum": "value", "chg_sum": "chg"})
+        grouped["date"] = grouped["date"].astype(str)
+        return grouped[columns].sort_values(keys, ignore_index=True)
+
+    def position_frames(self, trade_date: str, symbols: List[str] = None) -> Dict[str, pd.DataFrame]:
+        """
+        还原某日各合约的持仓排名表，可直接交给StrategyAnalyzer.process_position_data
+
+        :param trade_date: 交易日期 YYYYMMDD
+        :param symbols: 品种代码（默认全部）
+        :return: 交易所_合约 -> 持仓数据（标准化列名）
+        """
+        if trade_date not in self.dates(trade_date, trade_date):
+            return {}
+        frame = self.scan(trade_date, trade_date, symbols).to_pandas()
+        if frame.empty:
+            return {}
+
+        result = {}
+        for (exchange_name, contract), group in frame.groupby(["exchange", "contract"], sort=False, observed=True):
+            wide = pd.DataFrame(index=pd.RangeIndex(1, int(group["rank"].max()) + 1, name="rank"))
+            for side, (seat_col, value_col, chg_col) in _SIDE_COLUMNS.items():
+                side_rows = group[group["side"] == side].set_index("rank")
+                wide[seat_col] = side_rows["seat"].astype(object)
+                wide[value_col] = side_rows["value"]
+                wide[chg_col] = side_rows["chg"]
+            result[f"{exchange_name}_{contract}"] = wide.reset_index()
+        return result
+
+
+_seat_history: Optional[SeatHistoryStore] = None
+_seat_history_lock = threading.Lock()
+
+
+def get_seat_history() -> SeatHistoryStore:
+    """获取进程级共享席位历史存储（共享内存映射）"""
+    global _seat_history
+    with _seat_history_lock:
+        if _seat_history is None:
+            _seat_history = SeatHistoryStore()
+        return _seat_history
+
+
+def main():
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description="席位历史存储")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    sync_parser = subparsers.add_parser("sync", help="把数据湖中已结算的交易日追加到席位历史")
+    sync_parser.add_argument("--start", help="起始日期 YYYYMMDD")
+    sync_parser.add_argument("--end", help="结束日期 YYYYMMDD")
+
+    flows_parser = subparsers.add_parser("flows", help="查询席位资金流")
+    flows_parser.add_argument("--seat", nargs="+", required=True, help="席位名称")
+    flows_parser.add_argument("--start", help="起始日期 YYYYMMDD")
+    flows_parser.add_argument("--end", help="结束日期 YYYYMMDD")
+    flows_parser.add_argument("--symbol", nargs="+", help="品种代码")
+    args = parser.parse_args()
+
+    store = get_seat_history()
+    if args.command == "sync":
+        appended = store.sync(start_date=args.start, end_date=args.end)
+        print(f"追加 {len(appended)} 个交易日，共 {len(store.dates())} 个交易日")
+        return
+
+    flows = store.seat_flows(args.seat, args.start, args.end, args.symbol)
+    print(flows.to_string(index=False) if not flows.empty else "没有匹配的席位数据")
+
+
+__all__ = [
+    'SeatHistoryStore',
+    'get_seat_history',
+    'contract_symbol',
+    'ranking_frame',
+    'SEAT_HISTORY_SCHEMA',
+    'VOLUME',
+    'LONG',
+    'SHORT'
+]
+
+
+if __name__ == "__main__":
+    main()
@@ -11,11 +11,16 @@ import pandas as pd
 from pathlib import Path
 from datetime import datetime, timedelta
 import time
-import random
 from typing import Dict, List, Optional, Tuple
 import warnings
 import os
 
+from retry_policy import RetryBudget, get_retry_policy
+from response_cache import fetch_hold_pos_sina
+from async_position_fetcher import AsyncPositionFetcher, POSITION_TYPES, run_sync
+from fetch_manifest import get_fetch_manifest
+from position_store import save_positions
+
 warnings.filterwarnings('ignore')
 
 # 品种名称映射
@@ -56,6 +61,7 @@ class SinaPositionFetcher:
         self.data_dir = data_dir
         self.symbol_names = SYMBOL_NAMES
         self.exchange_symbols = EXCHANGE_SYMBOLS
+        self.retry_policy = get_retry_policy()
         self.ensure_data_directory()
     
     def ensure_data_directory(self):
@@ -124,7 +130,60 @@ class SinaPositionFetcher:
             print(f"获取{symbol}主力合约失败: {e}")
             return None
     
-    def fetch_single_contract_data(self, contract: str, date_str: str, symbol: str) -> Dict[str, pd.DataFrame]:
+    def resolve_main_contract(self, symbol: str, date_str: str) -> Optional[str]:
+        """确定品种的主力合约（供异步引擎调用）"""
+        return self.get_main_contract(symbol, date_str)
+    
+    def fetch_single_position_data(self, contract: str, date_str: str, symbol: str,
+                                   position_type: str, allow_expired: bool = False,
+                                   budget: RetryBudget = None) -> Optional[pd.DataFrame]:
+        """
+        获取单个合约单一持仓类型的数据
+        
+        Args:
+            contract: 合约代码
+            date_str: 日期 YYYYMMDD
+            symbol: 品种代码
+            position_type: 持仓类型（成交量/多单持仓/空单持仓）
+            allow_expired: 是否接受已过期的缓存（续传未完成的获取时使用，结算后不接受结算前写入的缓存）
+            budget: 本次运行的重试预算（None表示不限）
+            
+        Returns:
+            持仓数据DataFrame，失败返回None
+        """
+        # 统一重试策略：指数退避+随机抖动，重试次数受本次运行的重试预算限制
+        try:
+            df = self.retry_policy.call(
+                fetch_hold_pos_sina, position_type, contract, date_str, allow_expired,
+                budget=budget,
+                retry_if_result=lambda result: result is None or result.empty
+            )
+        except Exception as e:
+            print(f"  获取{contract} {position_type}失败: {str(e)[:50]}")
+            return None
+        
+        if df is None or df.empty:
+            return None
+        
+        df = df.copy()
+        
+        # 标准化列名
+        if len(df.columns) >= 4:
+            if position_type in ["多单持仓", "空单持仓"]:
+                df.columns = ['排名', '会员简称', '持仓量', '比上交易增减']
+            elif position_type == "成交量":
+                df.columns = ['排名', '会员简称', '成交量', '比上交易增减']
+        
+        # 添加元数据
+        df['date'] = date_str
+        df['contract'] = contract
+        df['position_type'] = position_type
+        df['symbol'] = symbol
+        
+        return df
+    
+    def fetch_single_contract_data(self, contract: str, date_str: str, symbol: str,
+                                   budget: RetryBudget = None) -> Dict[str, pd.DataFrame]:
         """
         获取单个合约的持仓数据
         
@@ -132,47 +191,18 @@ class SinaPositionFetcher:
             contract: 合约代码
             date_str: 日期 YYYYMMDD
             symbol: 品种代码
+            budget: 本次运行的重试预算（默认新建）
             
         Returns:
             持仓数据字典
         """
-        position_types = ["成交量", "多单持仓", "空单持仓"]
         result = {}
+        budget = budget or RetryBudget()
         
-        for position_type in position_types:
-            for attempt in range(3):  # 重试3次
-                try:
-                    df = ak.futures_hold_pos_sina(
-                        symbol=position_type,
-                        contract=contract,
-                        date=date_str
-                    )
-                    
-                    if df is not None and not df.empty:
-                        df = df.copy()
-                        
-                        # 标准化列名
-                        if len(df.columns) >= 4:
-                            if position_type in ["多单持仓", "空单持仓"]:
-                                df.columns = ['排名', '会员简称', '持仓量', '比上交易增减']
-                            elif position_type == "成交量":
-                                df.columns = ['排名', '会员简称', '成交量', '比上交易增减']
-                        
-                        # 添加元数据
-                        df['date'] = date_str
-                        df['contract'] = contract
-                        df['position_type'] = position_type
-                        df['symbol'] = symbol
-                        
-                        result[position_type] = df
-                        break
-                    else:
-                        time.sleep(random.uniform(0.3, 0.6))
-                        
-                except Exception as e:
-                    if attempt == 2:  # 最后一次尝试
-                        print(f"  获取{contract} {position_type}失败: {str(e)[:50]}")
-                    time.sleep(random.uniform(0.5, 1.0))
+        for position_type in POSITION_TYPES:
+            df = self.fetch_single_position_data(contract, date_str, symbol, position_type, budget=budget)
+            if df is not None:
+                result[position_type] = df
         
         return result
     
@@ -246,82 +276,42 @@ class SinaPositionFetcher:
         
         return result
     
-    def fetch_exchange_data(self, exchange_name: str, trade_date: str) -> Dict[str, pd.DataFrame]:
+    def fetch_exchange_data(self, exchange_name: str, trade_date: str,
+                            budget: RetryBudget = None) -> Dict[str, pd.DataFrame]:
         """
-        获取指定交易所的所有品种持仓数据
+        获取指定交易所的所有品种持仓数据（AsyncPositionFetcher.fetch_exchange的同步封装）
         
         Args:
             exchange_name: 交易所名称
             trade_date: 交易日期 YYYYMMDD
+            budget: 本次运行的重试预算（多个交易所属于同一次运行时由调用方传入同一个，默认新建）
             
         Returns:
             按品种分组的数据字典
         """
-        print(f"\n正在获取{exchange_name}数据...")
-        
-        if exchange_name not in self.exchange_symbols:
-            print(f"未知交易所: {exchange_name}")
-            return {}
-        
-        symbols = self.exchange_symbols[exchange_name]
-        all_data = []
-        success_count = 0
-        
-        for symbol in symbols:
-            try:
-                # 获取主力合约
-                main_contract = self.get_main_contract(symbol, trade_date)
-                
-                if not main_contract:
-                    continue
-                
-                print(f"  {symbol} ({self.symbol_names.get(symbol, symbol)}) - {main_contract}...", end="")
-                
-                # 获取合约数据
-                contract_data = self.fetch_single_contract_data(main_contract, trade_date, symbol)
-                
-                if contract_data:
-                    # 将所有类型的数据添加到列表
-                    for data_type, df in contract_data.items():
-                        all_data.append(df)
-                    print(" ✅")
-                    success_count += 1
-                else:
-                    print(" ❌")
-                
-                # 避免请求过快
-                time.sleep(random.uniform(0.5, 1.0))
-                
-            except Exception as e:
-                print(f" ❌ {str(e)[:30]}")
-                continue
-        
-        print(f"{exchange_name}数据获取完成: {success_count}/{len(symbols)} 个品种成功")
-        
-        # 转换为交易所格式
-        return self.convert_to_exchange_format(all_data, exchange_name)
+        # 获取清单记录每个品种×持仓类型的状态，中断后重新获取时只请求缺失部分
+        manifest = get_fetch_manifest(trade_date)
+        async_fetcher = AsyncPositionFetcher(self, manifest=manifest, budget=budget)
+        return run_sync(async_fetcher.fetch_exchange(exchange_name, trade_date))
     
-    def save_to_excel(self, data_dict: Dict[str, pd.DataFrame], filename: str):
+    def save_to_excel(self, data_dict: Dict[str, pd.DataFrame], filename: str,
+                      trade_date: str = None, exchange_name: str = None):
         """
-        保存数据到Excel文件
+        保存数据到持仓存储（Parquet，按STORAGE_CONFIG可同时导出Excel）
         
         Args:
             data_dict: 数据字典
-            filename: 文件名
+            filename: 文件名（如 大商所持仓.xlsx）
+            trade_date: 交易日期（与exchange_name同时给出时写入按日期分区的数据湖）
+            exchange_name: 交易所名称
         """
         if not data_dict:
             print(f"  {filename}: 无数据，跳过保存")
             return
         
-        save_path = os.path.join(self.data_dir, filename)
-        
         try:
-            with pd.ExcelWriter(save_path, engine='openpyxl') as writer:
-                for sheet_name, df in data_dict.items():
-                    # 清理sheet名称
-                    clean_name = sheet_name[:31].replace("/", "-").replace("*", "")
-                    df.to_excel(writer, sheet_name=clean_name, index=False)
-            
+            save_positions(data_dict, self.data_dir, filename,
+                           trade_date=trade_date, exchange_name=exchange_name)
             print(f"  ✅ {filename}: 已保存 {len(data_dict)} 个品种")
         except Exception as e:
             print(f"  ❌ {filename}: 保存失败 - {e}")
@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+期货持仓分析系统 - 策略计算内核模块
+策略中逐行遍历的统计改为向量化计算：所有合约的数据拼接为一张长表（PositionBatch，每行带
+合约编号），一次完成席位匹配、排序划分和分组求和，多个策略共用同一次拼接。
+各策略的信号判断仍由调用方按各自规则完成。
+作者：7haoge
+邮箱：953534947@qq.com
+"""
+
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Union
+
+import numpy as np
+import pandas as pd
+
+from config import STRATEGY_CONFIG
+
+# 家人席位统计用到的列
+RETAIL_COLUMNS = ['long_party_name', 'long_open_interest', 'long_open_interest_chg',
+                  'short_party_name', 'short_open_interest', 'short_open_interest_chg']
+
+# 蜘蛛网策略用到的列
+SPIDER_WEB_COLUMNS = ['vol', 'long_open_interest', 'short_open_interest']
+
+# 多空力量汇总用到的列
+TOTAL_COLUMNS = ['long_open_interest', 'short_open_interest', 'long_open_interest_chg', 'short_open_interest_chg']
+
+# 全部策略用到的列
+STRATEGY_COLUMNS = list(dict.fromkeys(RETAIL_COLUMNS + SPIDER_WEB_COLUMNS))
+
+# 持仓方向 -> (席位列, 持仓列, 变化列)
+_SIDES = {
+    'long': ('long_party_name', 'long_open_interest', 'long_open_interest_chg'),
+    'short': ('short_party_name', 'short_open_interest', 'short_open_interest_chg'),
+}
+
+
+def _scalar(value: float, integer: bool):
+    """按原列类型返回求和结果（整数列为int，与逐行累加的结果类型一致，可直接JSON序列化）"""
+    return int(value) if integer else float(value)
+
+
+def _float_values(series: pd.Series) -> np.ndarray:
+    """数值列转为float数组（缺失值为NaN）"""
+    values = series.to_numpy()
+    if values.dtype.kind in 'iuf':
+        return values.astype(float, copy=False)
+    return series.to_numpy(dtype=float, na_value=np.nan)
+
+
+class PositionBatch:
+    """
+    多个合约的持仓数据拼接成的长表
+    keys为列齐全的合约（ids中的编号即其下标），missing为缺列的合约；列数组按需拼接并缓存，
+    同一批合约的多个策略共用。
+    """
+
+    def __init__(self, frames: Mapping[str, pd.DataFrame], columns: Sequence[str] = STRATEGY_COLUMNS):
+        """
+        :param frames: 合约 -> 持仓数据（标准列名）
+        :param columns: 必需列
+        """
+        self.columns = list(columns)
+        self.order = list(frames)
+        self.keys: List[str] = []
+        self.missing: List[str] = []
+        self._parts: List[Dict[str, pd.Series]] = []
+        for key, df in frames.items():
+            if all(col in df.columns for col in self.columns):
+                self.keys.append(key)
+                self._parts.append({col: df[col] for col in self.columns})
+            else:
+                self.missing.append(key)
+        self.size = len(self.keys)
+        lengths = [len(part[self.columns[0]]) for part in self._parts]
+        self.ids = np.repeat(np.arange(self.size), lengths)
+        self._values: Dict[str, np.ndarray] = {}
+        self._integer: Dict[str, np.ndarray] = {}
+        self._sums: Dict[str, np.ndarray] = {}
+
+    @classmethod
+    def of(cls, frames: Union['PositionBatch', Mapping[str, pd.DataFrame]], columns: Sequence[str]) -> 'PositionBatch':
+        """已拼接的长表直接使用（需包含columns），否则按columns拼接"""
+        if isinstance(frames, cls):
+            absent = [col for col in columns if col not in frames.columns]
+            if absent:
+                raise ValueError(f"长表缺少列: {absent}")
+            return frames
+        return cls(frames, columns)
+
+    def values(self, col: str) -> np.ndarray:
+        """数值列（float，缺失值为NaN）"""
+        if col not in self._values:
+            self._values[col] = np.concatenate([_float_values(part[col]) for part in self._parts] or [np.empty(0)])
+        return self._values[col]
+
+    def seat_index(self, col: str, seats: Sequence[str]) -> np.ndarray:
+        """席位列每行在seats中的下标（不在seats中为-1）；分类列按分类编码查表，不展开席位名称"""
+        positions = {seat: j for j, seat in enumerate(seats)}
+        parts = []
+        for part in self._parts:
+            series = part[col]
+            if isinstance(series.dtype, pd.CategoricalDtype):
+                table = np.array([positions.get(name, -1) for name in series.array.categories] + [-1], dtype=np.intp)
+                parts.append(table[series.array.codes])
+            else:
+                parts.append(np.array([positions.get(name, -1) for name in series.to_numpy(dtype=object)], dtype=np.intp))
+        return np.concatenate(parts or [np.empty(0, dtype=np.intp)])
+
+    def integer(self, col: str) -> np.ndarray:
+        """各合约该列是否为整数类型"""
+        if col not in self._integer:
+            self._integer[col] = np.array([pd.api.types.is_integer_dtype(part[col].dtype) for part in self._parts],
+                                          dtype=bool)
+        return self._integer[col]
+
+    def sums(self, col: str) -> np.ndarray:
+        """各合约该列之和（缺失值不计）"""
+        if col not in self._sums:
+            self._sums[col] = np.bincount(self.ids, weights=np.nan_to_num(self.values(col)), minlength=self.size)
+        return self._sums[col]
+
+    def collect(self, results: Mapping[str, Any]) -> Dict[str, Optional[Any]]:
+        """按输入顺序整理结果，缺列的合约为None"""
+        return {key: results.get(key) for key in self.order}
+
+
+def position_totals(frames: Union[PositionBatch, Mapping[str, pd.DataFrame]]) -> Dict[str, Optional[Dict[str, Any]]]:
+    """
+    批量汇总各合约多空总持仓和变化（与DataFrame逐列求和的结果及类型相同）
+
+    :param frames: 合约 -> 持仓数据，或已拼接的PositionBatch
+    :return: 合约 -> {total_long, total_short, total_long_chg, total_short_chg}；缺少必要列的合约为None
+    """
+    batch = PositionBatch.of(frames, TOTAL_COLUMNS)
+    names = {
+        'total_long': 'long_open_interest',
+        'total_short': 'short_open_interest',
+        'total_long_chg': 'long_open_interest_chg',
+        'total_short_chg': 'short_open_interest_chg',
+    }
+    sums = {name: batch.sums(col) for name, col in names.items()}
+    integer = {name: batch.integer(col) for name, col in names.items()}
+    results = {
+        key: {name: np.int64(sums[name][i]) if integer[name][i] else np.float64(sums[name][i]) for name in names}
+        for i, key in enumerate(batch.keys)
+    }
+    return batch.collect(results)
+
+
+def require_result(result: Optional[Dict[str, Any]], columns: Sequence[str]) -> Dict[str, Any]:
+    """
+    取出单个合约的统计结果
+
+    :param result: retail_seat_stats/spider_web_msd中该合约的结果（缺少所需列时为None）
+    :param columns: 该统计用到的列（RETAIL_COLUMNS/SPIDER_WEB_COLUMNS）
+    :raises ValueError: 合约缺少所需列，由各策略统一转为"错误"信号
+    """
+    if result is None:
+        raise ValueError(f"缺少持仓列（需要 {', '.join(columns)}）")
+    return result
+
+
+def retail_seat_stats(frames: Union[PositionBatch, Mapping[str, pd.DataFrame]],
+                      retail_seats: Sequence[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+    """
+    批量统计各合约家人席位的多空持仓和变化（同一席位多行合并）
+
+    :param frames: 合约 -> 持仓数据（标准列名），或已拼接的PositionBatch
+    :param retail_seats: 家人席位
+    :return: 合约 -> {
+                 'seats': 席位 -> {long_chg, short_chg, long_pos, short_pos}（按retail_seats顺序，
+                          未出现的方向为0）,
+                 'total_long': 合约多单总持仓, 'total_short': 合约空单总持仓
+             }；缺少必要列的合约为None
+    """
+    batch = PositionBatch.of(frames, RETAIL_COLUMNS)
+    seats = list(dict.fromkeys(retail_seats))
+    if not batch.size:
+        return batch.collect({})
+
+    # 合约编号 x 席位编号 -> 分组；全部缺失的组为NaN，按逐行累加的规则记为0
+    groups = batch.size * len(seats)
+    sums = {}
+    for side, (seat_col, pos_col, chg_col) in _SIDES.items():
+        seat_ids = batch.seat_index(seat_col, seats)
+        matched = seat_ids >= 0
+        group_ids = batch.ids[matched] * len(seats) + seat_ids[matched]
+        for col in (pos_col, chg_col):
+            values = batch.values(col)[matched]
+            present = ~np.isnan(values)
+            total = np.bincount(group_ids, weights=np.where(present, values, 0), minlength=groups)
+            counts = np.bincount(group_ids[present], minlength=groups)
+            sums[col] = np.where(counts > 0, total, np.nan).reshape(batch.size, len(seats))
+
+    integer = {col: batch.integer(col) for col in sums}
+    total_long = batch.sums('long_open_interest')
+    total_short = batch.sums('short_open_interest')
+    results = {}
+    for i, key in enumerate(batch.keys):
+        seat_stats = {}
+        for j, seat in enumerate(seats):
+            stats = {}
+            for side, (_, pos_col, chg_col) in _SIDES.items():
+                chg = sums[chg_col][i, j]
+                pos = sums[pos_col][i, j]
+                stats[f'{side}_chg'] = 0 if np.isnan(chg) else _scalar(chg, integer[chg_col][i])
+                stats[f'{side}_pos'] = 0 if np.isnan(pos) else _scalar(pos, integer[pos_col][i])
+            seat_stats[seat] = {name: stats[name] for name in ('long_chg', 'short_chg', 'long_pos', 'short_pos')}
+        results[key] = {
+            'seats': seat_stats,
+            'total_long': total_long[i],
+            'total_short': total_short[i],
+        }
+    return batch.collect(results)
+
+
+def _group_mean(ids: np.ndarray, values: np.ndarray, mask: np.ndarray, size: int) -> np.ndarray:
+    """按合约分组求均值（组内无数据为NaN）"""
+    sums = np.bincount(ids[mask], weights=values[mask], minlength=size)
+    counts = np.bincount(ids[mask], minlength=size)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return sums / counts
+
+
+def spider_web_msd(frames: Union[PositionBatch, Mapping[str, pd.DataFrame]], its_ratio: float = None,
+                   min_seats: int = None, msd_threshold: float = None, min_informed: int = 2,
+                   positive_volume: bool = True) -> Dict[str, Optional[Dict[str, Any]]]:
+    """
+    批量计算各合约蜘蛛网策略的MSD（知情者与非知情者多空倾向之差）
+
+    有效席位按知情度 stat=(多单+空单)/成交量 降序排列（相同时保持原排名顺序），前 its_ratio
+    为知情者（至少min_informed个），各席位多空倾向为 (多单-空单)/(多单+空单)，
+    MSD = 知情者均值 - 非知情者均值。参数默认取STRATEGY_CONFIG["蜘蛛网策略"]。
+
+    :param frames: 合约 -> 持仓数据（标准列名），或已拼接的PositionBatch
+    :param its_ratio: 知情者比例
+    :param min_seats: 最小有效席位数，不足时msd为NaN
+    :param msd_threshold: 信号阈值，|MSD|超过时看多/看空
+    :param min_informed: 知情者最少席位数
+    :param positive_volume: 是否只统计成交量大于0的席位（否则只要求成交量非空）
+    :return: 合约 -> {'seats': 有效席位数, 'its': 知情者均值, 'uts': 非知情者均值,
+                     'msd': MSD（席位不足或任一组为空时为NaN）, 'signal': 看多/看空/中性}；
+             缺少必要列的合约为None
+    """
+    config = STRATEGY_CONFIG["蜘蛛网策略"]
+    its_ratio = config["its_ratio"] if its_ratio is None else its_ratio
+    min_seats = config["min_seats"] if min_seats is None else min_seats
+    msd_threshold = config["msd_threshold"] if msd_threshold is None else msd_threshold
+
+    batch = PositionBatch.of(frames, SPIDER_WEB_COLUMNS)
+    if not batch.size:
+        return batch.collect({})
+    size = batch.size
+    vol, long_pos, short_pos = (batch.values(col) for col in SPIDER_WEB_COLUMNS)
+
+    # 有效席位
+    valid = ~np.isnan(vol) & ~np.isnan(long_pos) & ~np.isnan(short_pos)
+    if positive_volume:
+        valid &= vol > 0
+    ids, vol, long_pos, short_pos = batch.ids[valid], vol[valid], long_pos[valid], short_pos[valid]
+    seats = np.bincount(ids, minlength=size)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        stat = (long_pos + short_pos) / vol
+        total = long_pos + short_pos
+        tendency = (long_pos - short_pos) / total
+
+    # 合约内按stat降序排名，排名在截止位置之前的为知情者
+    # lexsort为稳定排序：stat相同的席位保持原排名顺序。逐合约实现用的sort_values默认快速排序不稳定，
+    # 相同stat的席位跨越截止位置时知情者划分可能与之不同（少数合约的MSD有差异），现以稳定顺序为准
+    order = np.lexsort((-stat, ids))
+    starts = np.cumsum(seats) - seats
+    cutoff = np.maximum(min_informed, (seats * its_ratio).astype(int))
+    informed = np.empty(len(order), dtype=bool)
+    informed[order] = np.arange(len(order)) - starts[ids[order]] < cutoff[ids[order]]
+
+    counted = total > 0
+    its = _group_mean(ids, tendency, counted & informed, size)
+    uts = _group_mean(ids, tendency, counted & ~informed, size)
+    msd = its - uts
+    msd[seats < min_seats] = np.nan
+
+    results = {}
+    for i, key in enumerate(batch.keys):
+        if msd[i] > msd_threshold:
+            signal = "看多"
+        elif msd[i] < -msd_threshold:
+            signal = "看空"
+        else:
+            signal = "中性"
+        results[key] = {'seats': int(seats[i]), 'its': its[i], 'uts': uts[i], 'msd': msd[i], 'signal': signal}
+    return batch.collect(results)
+
+
+__all__ = [
+    'PositionBatch',
+    'RETAIL_COLUMNS',
+    'SPIDER_WEB_COLUMNS',
+    'STRATEGY_COLUMNS',
+    'TOTAL_COLUMNS',
+    'position_totals',
+    'require_result',
+    'retail_seat_stats',
+    'spider_web_msd'
+]
@@ -19,6 +19,7 @@ import os
 from datetime import datetime, timedelta
 from futures_analyzer import FuturesAnalysisEngine, validate_trade_date, get_recent_trade_date
 from config import STRATEGY_CONFIG, SYSTEM_CONFIG
+from prewarm_scheduler import load_prewarmed_results
 
 # 导入性能优化模块
 try:
@@ -302,6 +303,15 @@ class StreamlitApp:
             st.error("无效的日期格式")
             return
         
+        # 预热调度已完成的分析结果（所有进程共享）直接读取
+        prewarmed = load_prewarmed_results(trade_date_str, st.session_state.retail_seats)
+        if prewarmed:
+            st.session_state.analysis_results = prewarmed
+            st.session_state.last_analysis_date = trade_date_str
+            st.success(f"✅ 已读取预热的分析结果（{prewarmed['metadata']['analysis_time'][:16]}）")
+            st.rerun()
+            return
+        
         # 更新分析引擎的家人席位配置
         self.engine.update_retail_seats(st.session_state.retail_seats)
         
@@ -325,6 +335,7 @@ class StreamlitApp:
                     # 使用云端数据获取器的自动跳过功能
                     progress_callback("正在使用云端优化获取数据（自动跳过超时交易所）...", 0.1)
                     
+                    fetch_started = time.time()
                     position_success = cloud_fetcher.fetch_position_data_with_auto_skip(
                         trade_date_str, progress_callback
                     )
@@ -347,7 +358,13 @@ class StreamlitApp:
                     
                     # 加载已获取的持仓数据
                     try:
-                        position_data = self.engine.data_manager.load_position_data()
+                        # 只读取结算后的数据和本次获取写入的数据（结算前的旧数据视为不完整）
+                        position_data = self.engine.data_manager.load_position_data(
+                            trade_date_str, since=fetch_started)
+                        incomplete_exchanges = self.engine.data_manager.incomplete_positions(
+                            trade_date_str, since=fetch_started)
+                        if incomplete_exchanges:
+                            st.warning(f"⚠️ {'、'.join(incomplete_exchanges)} 本次获取失败，已存储的数据在结算前写入，可能不完整，未参与分析")
                         st.info(f"🔍 调试：持仓数据加载完成，合约数量: {len(position_data)}")
                     except Exception as e:
                         st.error(f"❌ 持仓数据加载失败: {str(e)}")
@@ -391,7 +408,8 @@ class StreamlitApp:
                             'trade_date': trade_date_str,
                             'analysis_time': datetime.now().isoformat(),
                             'include_term_structure': True,
-                            'retail_seats': st.session_state.retail_seats
+                            'retail_seats': st.session_state.retail_seats,
+                            'incomplete_exchanges': incomplete_exchanges
                         }
                     }
                     
@@ -256,23 +256,20 @@ def load_from_excel(filename: str) -> Dict[str, pd.DataFrame]:
         return {}
 
 def retry_on_failure(func, max_retries: int = 3, delay: float = 1.0):
-    """重试装饰器"""
+    """重试装饰器（统一重试策略：指数退避+随机抖动，delay为首次重试的退避上限）"""
+    from retry_policy import RetryPolicy
+    
+    policy = RetryPolicy(max_attempts=max_retries, base_delay=delay)
+    
+    def on_retry(attempt, error, wait):
+        logging.warning(f"第{attempt}次尝试失败，{wait:.1f}秒后重试: {str(error)}")
+    
     def wrapper(*args, **kwargs):
-        last_exception = None
-        
-        for attempt in range(max_retries):
-            try:
-                return func(*args, **kwargs)
-            except Exception as e:
-                last_exception = e
-                if attempt < max_retries - 1:
-                    logging.warning(f"第{attempt + 1}次尝试失败，{delay}秒后重试: {str(e)}")
-                    import time
-                    time.sleep(delay)
-                else:
-                    logging.error(f"所有重试都失败了: {str(e)}")
-        
-        raise last_exception
+        try:
+            return policy.call(func, *args, on_retry=on_retry, **kwargs)
+        except Exception as e:
+            logging.error(f"所有重试都失败了: {str(e)}")
+            raise
     
     return wrapper
 